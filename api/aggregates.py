@@ -0,0 +1,55 @@
+from django.db.models import Aggregate, TextField, Value
+
+# ASCII unit separator, cannot appear in a name typed into the UI
+NAME_SEPARATOR = '\x1f'
+# ASCII record separator, between a name and its ordering value where the
+# database cannot order the aggregate itself
+ORDER_SEPARATOR = '\x1e'
+
+
+class ConcatNames(Aggregate):
+    """
+    Concatenate a text column across a group, joined by NAME_SEPARATOR and
+    ordered by the integer column `ordering`. Compiles to STRING_AGG(...
+    ORDER BY) on PostgreSQL and GROUP_CONCAT(... ORDER BY) on SQLite 3.44+.
+    Older SQLite has no ordered aggregates, there each name carries its
+    ordering value and split_names() sorts them.
+    """
+    function = 'GROUP_CONCAT'
+    name = 'ConcatNames'
+    output_field = TextField()
+
+    def __init__(self, expression, ordering='id', **extra):
+        super().__init__(expression, Value(NAME_SEPARATOR), ordering, **extra)
+
+    def as_sql(self, compiler, connection, function=None, **extra_context):
+        (expression, expression_params), (separator, separator_params), (ordering, ordering_params) = (
+            compiler.compile(source) for source in self.source_expressions
+        )
+        sql = f'{function or self.function}({expression}, {separator} ORDER BY {ordering})'
+        return sql, (*expression_params, *separator_params, *ordering_params)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        if connection.Database.sqlite_version_info >= (3, 44, 0):
+            return self.as_sql(compiler, connection, **extra_context)
+        (expression, expression_params), (separator, separator_params), (ordering, ordering_params) = (
+            compiler.compile(source) for source in self.source_expressions
+        )
+        sql = f'GROUP_CONCAT(CAST({ordering} AS TEXT) || %s || {expression}, {separator})'
+        return sql, (*ordering_params, ORDER_SEPARATOR, *expression_params, *separator_params)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, function='STRING_AGG', **extra_context)
+
+
+def split_names(value):
+    """
+    Split a ConcatNames() value into the names, in order.
+    """
+    if not value:
+        return []
+    names = value.split(NAME_SEPARATOR)
+    if ORDER_SEPARATOR not in value:
+        return names
+    pairs = (name.partition(ORDER_SEPARATOR) for name in names)
+    return [name for _, _, name in sorted(pairs, key=lambda pair: int(pair[0]))]
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class ApiConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'api'
+
+    def ready(self):
+        # Register the signal handlers that keep derived leaderboard data in sync
+        from . import signals  # noqa: F401
+        # Time the database statements of the requests sampled for /metrics
+        from django.db.backends.signals import connection_created
+        from .metrics import install_execute_wrapper
+        connection_created.connect(install_execute_wrapper, dispatch_uid='api.metrics.install_execute_wrapper')
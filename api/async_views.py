@@ -0,0 +1,109 @@
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import MethodNotAllowed, NotFound
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import exception_handler
+from .pagination import KeysetPagination
+from .ranking import get_rank_store, leaderboard_index
+from .renderers import FastJSONRenderer
+from .response_cache import acache_response
+from .scores import change_score, project_points, write_behind_enabled
+from .serializers import USER_FIELDS, UpdateScoreSerializer, UserSerializer, sparse_rows, user_rows
+from .views import (
+    UserViewSet, declare_winner, grouped_buckets, grouped_data, grouped_names, grouped_params,
+    ranked_page, sparse_fields,
+)
+
+# The synchronous viewset routes for the methods the async views do not serve
+sync_user_list = UserViewSet.as_view({'get': 'list', 'post': 'create'})
+
+
+def async_api_view(methods, fallback=None):
+    """
+    Serve an async view with the same JSON responses and error bodies as
+    the DRF views it replaces. Requests for other methods go to the sync
+    `fallback` view, or get a 405.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods and fallback is not None:
+                return await sync_to_async(fallback)(request, *args, **kwargs)
+            request = Request(request, parsers=[JSONParser()])
+            try:
+                if request.method not in methods:
+                    raise MethodNotAllowed(request.method)
+                response = await view(request, *args, **kwargs)
+            except Exception as exc:
+                response = exception_handler(exc, {})
+                if response is None:
+                    raise
+            response.accepted_renderer = FastJSONRenderer()
+            response.accepted_media_type = FastJSONRenderer.media_type
+            response.renderer_context = {}
+            return response
+        return wrapper
+    return decorator
+
+
+@async_api_view(['GET'], fallback=sync_user_list)
+@acache_response
+async def user_list(request):
+    """
+    Users list by points, fetched with the async ORM. The Redis ranking and
+    legacy page-number paths use the sync Redis client and run in a thread.
+    """
+    fields = sparse_fields(request, USER_FIELDS)
+    store = get_rank_store()
+    if store is not leaderboard_index:
+        return Response(await sync_to_async(ranked_page)(store, request, UserViewSet, fields))
+    paginator = KeysetPagination()
+    page = await paginator.apaginate_queryset(user_rows(UserViewSet.queryset.all(), fields), request, UserViewSet)
+    if write_behind_enabled():
+        page = await sync_to_async(project_points)(list(page))
+    return paginator.get_paginated_response(sparse_rows(list(page), fields))
+
+
+@async_api_view(['GET'])
+@acache_response
+async def grouped_by_score(request):
+    """
+    Users grouped by score, with both queries run through the async ORM.
+    """
+    params = grouped_params(request)
+    buckets = [bucket async for bucket in grouped_buckets(params)]
+    names = grouped_names(params, buckets)
+    name_rows = [row async for row in names] if names is not None else []
+    return Response(grouped_data(params, buckets, name_rows))
+
+
+@async_api_view(['PATCH'])
+async def update_score(request, pk):
+    """
+    Add or subtract points. The single-statement UPDATE needs a transaction,
+    which the async ORM does not offer, so it runs in a thread.
+    """
+    serializer = UpdateScoreSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            "validation_errors": serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+    user = await sync_to_async(change_score)(pk, serializer.validated_data['change'])
+    if user is None:
+        raise NotFound()
+    return Response(UserSerializer(user).data)
+
+
+@async_api_view(['POST'])
+async def update_winners(request):
+    """
+    Select the winner. The selection runs under a transaction-scoped lock,
+    which the async ORM does not offer, so it runs in a thread.
+    """
+    data, status_code = await sync_to_async(declare_winner)()
+    return Response(data, status=status_code)
@@ -0,0 +1,515 @@
+import json
+import math
+import platform
+import random
+import subprocess
+import time
+import django
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.db.models import Max
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from .buckets import rebuild_buckets
+from .models import (
+    BoardScore, BoardWinner, Leaderboard, ScoreEvent, ScoreFlush, ScoreSnapshot, User, WindowArchive, WindowScore,
+    Winner, WinnerArchive,
+)
+from .ranking import get_rank_store
+from rest_framework.renderers import JSONRenderer
+from .pagination import KeysetPagination
+from .renderers import FastJSONRenderer
+from .response_cache import bump_version
+from .scores import flush_score_buffer, write_behind_enabled
+from .serializers import UserSerializer, WinnerSerializer, user_rows, winner_data, winner_rows
+from .views import update_winners
+
+SCENARIOS = {}
+
+# The API's default page size, as used by the list cases
+PAGE_SIZE = 20
+
+
+def scenario(name):
+    """
+    Register a benchmark scenario. A scenario takes the parsed command
+    options and returns a list of result dicts from measure().
+    """
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def measure(name, func, iterations, warmup=3):
+    """
+    Call `func` `iterations` times and return latency percentiles in ms.
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - call_started) * 1000)
+    elapsed = time.perf_counter() - started
+    return {
+        'name': name,
+        'iterations': iterations,
+        'mean_ms': round(sum(samples) / len(samples), 3),
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'ops_per_sec': round(iterations / elapsed, 1),
+    }
+
+
+def _cursor_params(queryset, ordering, page):
+    """
+    Return the query params of the keyset cursor that opens page `page`: the
+    position of the last row of the page before it.
+    """
+    offset = (page - 1) * PAGE_SIZE
+    if not offset:
+        return {}
+    fields = [field.lstrip('-') for field in ordering]
+    before = queryset.order_by(*ordering).values(*fields)[offset - 1]
+    position = [
+        before[field].isoformat() if hasattr(before[field], 'isoformat') else before[field]
+        for field in fields
+    ]
+    return {'cursor': KeysetPagination.encode_position(position)}
+
+
+def environment():
+    """
+    Describe what a run measured: the commit, the database and the versions,
+    so saved results are only compared like for like.
+    """
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('SELECT sqlite_version()')
+        else:
+            cursor.execute('SELECT version()')
+        database_version = cursor.fetchone()[0]
+    return {
+        'commit': commit,
+        'created_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'database_version': database_version,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+    }
+
+
+def compare(baseline, current, threshold):
+    """
+    Match the cases of two saved runs by scenario and name and return
+    (scenario, name, baseline p50, current p50, change %, regressed) rows.
+    A case regressed if its p50 grew by more than `threshold` percent.
+    """
+    rows = []
+    for scenario_name, results in current['scenarios'].items():
+        before = {result['name']: result for result in baseline['scenarios'].get(scenario_name, [])}
+        for result in results:
+            old = before.get(result['name'])
+            if old is None or not old['p50_ms']:
+                continue
+            change = (result['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100
+            rows.append((scenario_name, result['name'], old['p50_ms'], result['p50_ms'], change, change > threshold))
+    return rows
+
+
+# Tables a run adds rows to, dependents first; remove_seeded() deletes the
+# rows past each table's mark. ScoreBucket is rebuilt instead
+_SEEDED_MODELS = (
+    BoardWinner, BoardScore, Leaderboard, Winner, WinnerArchive, WindowScore, WindowArchive,
+    ScoreEvent, ScoreSnapshot, ScoreFlush, User,
+)
+
+
+def seeded_marks():
+    """
+    Return {model: highest primary key} of the tables a run writes to, taken
+    before seeding. The rows the run adds are the ones past the marks.
+    """
+    return {model: model.objects.aggregate(mark=Max('pk'))['mark'] or 0 for model in _SEEDED_MODELS}
+
+
+def remove_seeded(marks):
+    """
+    Delete the rows added since seeded_marks() with one DELETE per table,
+    skipping the per-row signals, then rebuild the derived data.
+    """
+    if write_behind_enabled():
+        flush_score_buffer()
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for model in _SEEDED_MODELS:
+            cursor.execute(
+                f'DELETE FROM {qn(model._meta.db_table)} WHERE {qn(model._meta.pk.column)} > %s', [marks[model]]
+            )
+    rebuild_buckets()
+    get_rank_store().reset()
+    bump_version()
+
+
+def seeded_users(options):
+    """
+    The users seeded for this run, the only ones the write cases change.
+    """
+    return User.objects.filter(pk__gt=options.get('user_mark', 0))
+
+
+def _crown_seeded_user(options):
+    """
+    Give one seeded user the top score by a wide margin, so every
+    update_winners call declares a winner instead of a tie.
+    """
+    top = User.objects.aggregate(top=Max('points'))['top']
+    leader = seeded_users(options).order_by('id').first()
+    User.objects.filter(pk=leader.pk).update(points=top + 1_000_000)
+
+
+def _get(client, url, params=None):
+    def call():
+        response = client.get(url, params or {})
+        if response.status_code != 200:
+            raise RuntimeError(f'GET {url} returned {response.status_code}')
+    return call
+
+
+@scenario('pagination')
+def pagination(options):
+    """
+    Users list latency at page 1 and a deep page, keyset cursor vs legacy
+    page numbers (COUNT(*) + OFFSET).
+    """
+    client = APIClient()
+    url = reverse('api:user-list')
+    deep_page = min(options['deep_page'], max(User.objects.count() // PAGE_SIZE, 1))
+    cursor = _cursor_params(User.objects.all(), ('-points', 'id'), deep_page)
+
+    iterations = options['iterations']
+    with override_settings(LEADERBOARD_CACHE_ENABLED=False):
+        return [
+            measure('cursor page 1', _get(client, url), iterations),
+            measure(f'cursor page {deep_page}', _get(client, url, cursor), iterations),
+            measure('page-number page 1', _get(client, url, {'page': 1}), iterations),
+            measure(f'page-number page {deep_page}', _get(client, url, {'page': deep_page}), iterations),
+        ]
+
+
+def _seed_winners(count, options):
+    """
+    Insert winners until there are at least `count`, drawn from random
+    seeded users with the snapshot fields filled in as declare_winner() would.
+    """
+    missing = count - Winner.objects.count()
+    if missing <= 0:
+        return
+    users = list(seeded_users(options).order_by('?').values('id', 'name', 'points')[:min(missing, 1000)])
+    Winner.objects.bulk_create([
+        Winner(
+            user_id=user['id'], points_at_win=user['points'], user_name=user['name'],
+            runner_up_points=user['points'] - 1, players=len(users),
+        )
+        for user in (users[i % len(users)] for i in range(missing))
+    ], batch_size=1000)
+
+
+@scenario('hot_paths')
+def hot_paths(options):
+    """
+    The leaderboard hot paths with the response cache off: update_score,
+    the users list at pages 1, 10, 100 and --deep-page, grouped_by_score,
+    update_winners and the winners list at its first and last page.
+    """
+    client = APIClient()
+    iterations = options['iterations']
+    user_ids = list(seeded_users(options).order_by('?').values_list('id', flat=True)[:5000])
+    rng = random.Random(0)
+    results = []
+
+    def run(name, call, items=None):
+        queries = _count_queries(call)
+        result = dict(measure(name, call, iterations), queries=queries)
+        if items:
+            result['items_per_sec'] = round(result['ops_per_sec'] * items, 1)
+        results.append(result)
+
+    def update_score():
+        user_id = rng.choice(user_ids)
+        response = client.patch(reverse('api:user-update-score', args=[user_id]), {'change': 1}, format='json')
+        if response.status_code != 200:
+            raise RuntimeError(f'PATCH update_score returned {response.status_code}')
+
+    def update_winners():
+        response = client.post(reverse('api:update-winners'))
+        if response.status_code != 201:
+            raise RuntimeError(f'POST update-winners returned {response.status_code}')
+
+    with override_settings(LEADERBOARD_CACHE_ENABLED=False, WINNER_MIN_INTERVAL_SECONDS=0):
+        run('update_score', update_score)
+
+        users_url = reverse('api:user-list')
+        last_page = max(User.objects.count() // PAGE_SIZE, 1)
+        for page in sorted({1, 10, 100, options['deep_page']}):
+            if page <= last_page:
+                params = _cursor_params(User.objects.all(), ('-points', 'id'), page)
+                run(f'users page {page}', _get(client, users_url, params), items=PAGE_SIZE)
+        run('users page 1 fields=id,name,points', _get(client, users_url, {'fields': 'id,name,points'}), items=PAGE_SIZE)
+
+        grouped_url = reverse('api:user-grouped-by-score')
+        run('grouped_by_score', _get(client, grouped_url))
+        run('grouped_by_score names_limit=10', _get(client, grouped_url, {'names_limit': 10}))
+
+        _crown_seeded_user(options)
+        run('update_winners', update_winners)
+
+        _seed_winners(options['winners'], options)
+        winners_url = reverse('api:winner-list')
+        last_page = max(Winner.objects.count() // PAGE_SIZE, 1)
+        run('winners page 1', _get(client, winners_url), items=PAGE_SIZE)
+        if last_page > 1:
+            params = _cursor_params(Winner.objects.all(), ('-timestamp', 'id'), last_page)
+            run(f'winners page {last_page}', _get(client, winners_url, params), items=PAGE_SIZE)
+    return results
+
+
+@api_view(['POST'])
+def legacy_update_winners(request):
+    """
+    The previous winner selection, kept as a baseline: MAX, then a filtered
+    COUNT, then a filtered first row, then the insert.
+    """
+    max_points = User.objects.aggregate(Max('points'))['points__max']
+    top_users = User.objects.filter(points=max_points)
+    if top_users.count() == 1:
+        top_user = top_users.first()
+        winner = Winner.objects.create(user=top_user, points_at_win=top_user.points)
+        return Response({'status': 'success', 'winner': WinnerSerializer(winner).data}, status=status.HTTP_201_CREATED)
+    return Response({'status': 'tie', 'message': 'No winner declared due to a tie'})
+
+
+def _post_view(view):
+    factory = APIRequestFactory()
+
+    def call():
+        response = view(factory.post('/api/update-winners/'))
+        if response.status_code != 201:
+            raise RuntimeError(f'update_winners returned {response.status_code}')
+    return call
+
+
+def _count_queries(func):
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    return len([q for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']])
+
+
+@scenario('winners')
+def winners(options):
+    """
+    update_winners round trips and latency, single top-two query vs the
+    previous MAX/COUNT/first sequence.
+    """
+    _crown_seeded_user(options)
+
+    results = []
+    with override_settings(WINNER_MIN_INTERVAL_SECONDS=0):
+        for name, view in (('top-two query', update_winners), ('previous max/count/first', legacy_update_winners)):
+            call = _post_view(view)
+            queries = _count_queries(call)
+            results.append(dict(measure(name, call, options['iterations']), queries=queries))
+    return results
+
+
+@scenario('bulk_scores')
+def bulk_scores(options):
+    """
+    Score ingestion throughput, one bulk POST of 500 deltas vs the same
+    deltas sent as individual PATCHes to update_score.
+    """
+    client = APIClient()
+    user_ids = list(seeded_users(options).values_list('id', flat=True)[:5000])
+    rng = random.Random(0)
+    batch = 500
+    body = json.dumps([{'id': rng.choice(user_ids), 'change': rng.randint(-5, 5)} for _ in range(batch)])
+    bulk_url = reverse('api:user-bulk-update-scores')
+
+    def bulk():
+        response = client.post(bulk_url, data=body, content_type='application/json')
+        if response.status_code != 200:
+            raise RuntimeError(f'POST {bulk_url} returned {response.status_code}')
+
+    def single():
+        user_id = rng.choice(user_ids)
+        response = client.patch(reverse('api:user-update-score', args=[user_id]), {'change': 1}, format='json')
+        if response.status_code != 200:
+            raise RuntimeError(f'PATCH update_score returned {response.status_code}')
+
+    iterations = options['iterations']
+    bulk_result = measure(f'bulk POST x{batch}', bulk, max(iterations // 10, 1))
+    single_result = measure('single PATCH', single, iterations)
+    return [
+        dict(bulk_result, items_per_sec=round(bulk_result['ops_per_sec'] * batch, 1)),
+        dict(single_result, items_per_sec=single_result['ops_per_sec']),
+    ]
+
+
+@scenario('cache')
+def response_cache(options):
+    """
+    Leaderboard read latency with the response cache off, on (a hit) and
+    revalidated with If-None-Match (a 304).
+    """
+    client = APIClient()
+    results = []
+    bump_version()
+    for name in ('user-list', 'user-grouped-by-score', 'winner-list'):
+        url = reverse(f'api:{name}')
+        with override_settings(LEADERBOARD_CACHE_ENABLED=False):
+            results.append(measure(f'{name} uncached', _get(client, url), options['iterations']))
+        with override_settings(LEADERBOARD_CACHE_ENABLED=True):
+            results.append(measure(f'{name} cached', _get(client, url), options['iterations']))
+            etag = client.get(url)['ETag']
+
+            def revalidate():
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                if response.status_code != 304:
+                    raise RuntimeError(f'GET {url} returned {response.status_code}')
+            results.append(measure(f'{name} 304', revalidate, options['iterations']))
+    return results
+
+
+@scenario('serializers')
+def serializers(options):
+    """
+    Fetch + serialize + render a 20-row page, DRF serializers and
+    JSONRenderer vs .values() rows and FastJSONRenderer.
+    """
+    if Winner.objects.count() < PAGE_SIZE:
+        for user in seeded_users(options).order_by('?')[:PAGE_SIZE]:
+            Winner.objects.create(user=user, points_at_win=user.points)
+    users = User.objects.order_by('-points', 'id')[:PAGE_SIZE]
+    winners = Winner.objects.order_by('-timestamp', 'id')[:PAGE_SIZE]
+    drf, fast = JSONRenderer(), FastJSONRenderer()
+
+    cases = {
+        'users DRF': lambda: drf.render(UserSerializer(users.all(), many=True).data),
+        'users fast': lambda: fast.render(list(user_rows(users.all()))),
+        'winners DRF (N+1)': lambda: drf.render(WinnerSerializer(winners.all(), many=True).data),
+        'winners DRF select_related': lambda: drf.render(
+            WinnerSerializer(winners.select_related('user'), many=True).data
+        ),
+        'winners fast': lambda: fast.render([winner_data(row) for row in winner_rows(winners.all())]),
+    }
+    results = []
+    for name, call in cases.items():
+        queries = _count_queries(call)
+        results.append(dict(measure(name, call, options['iterations']), queries=queries))
+    return results
+
+
+def _seed_boards(first, count, user_ids, board_users, rng):
+    """
+    Insert boards `first`..`first + count - 1` with `board_users` random
+    users each, returning their ids.
+    """
+    boards = Leaderboard.objects.bulk_create(
+        [Leaderboard(slug=f'bench-{i}', name=f'Benchmark board {i}') for i in range(first, first + count)],
+        batch_size=1000,
+    )
+    qn = connection.ops.quote_name
+    sql = (
+        f'INSERT INTO {qn(BoardScore._meta.db_table)} ({qn("board_id")}, {qn("user_id")}, {qn("points")}) '
+        'VALUES (%s, %s, %s)'
+    )
+
+    def insert(rows):
+        # One transaction per batch, in autocommit every row would commit
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+
+    rows = []
+    for board in boards:
+        rows += [(board.id, user_id, rng.randint(0, 10000)) for user_id in rng.sample(user_ids, board_users)]
+        if len(rows) >= 50000:
+            insert(rows)
+            rows = []
+    if rows:
+        insert(rows)
+    return [board.id for board in boards]
+
+
+@scenario('boards')
+def boards(options):
+    """
+    Per-board reads and writes on a small deployment, then again once
+    --boards boards of --board-users users each exist. Each board reads its
+    own index range, so the latency should not grow with the row count.
+    """
+    client = APIClient()
+    rng = random.Random(0)
+    user_ids = list(seeded_users(options).values_list('id', flat=True))
+    board_users = min(options['board_users'], len(user_ids))
+    iterations = options['iterations']
+
+    def cases(label, slug):
+        board_id = Leaderboard.objects.get(slug=slug).id
+        user_id = BoardScore.objects.filter(board_id=board_id).values_list('user_id', flat=True).first()
+
+        def update_score():
+            response = client.patch(
+                reverse('api:board-update-score', kwargs={'slug': slug, 'user_id': user_id}),
+                {'change': 1}, format='json',
+            )
+            if response.status_code != 200:
+                raise RuntimeError(f'PATCH board update_score returned {response.status_code}')
+
+        return [
+            measure(f'{label} top 10', _get(client, reverse('api:board-top', kwargs={'slug': slug})), iterations),
+            measure(f'{label} users page 1', _get(client, reverse('api:board-users', kwargs={'slug': slug})), iterations),
+            measure(
+                f'{label} user rank',
+                _get(client, reverse('api:board-user-rank', kwargs={'slug': slug, 'user_id': user_id})),
+                iterations,
+            ),
+            measure(f'{label} update_score', update_score, iterations),
+        ]
+
+    small = min(10, options['boards'])
+    _seed_boards(0, small, user_ids, board_users, rng)
+    results = cases(f'{small} boards', 'bench-0')
+    started = time.perf_counter()
+    _seed_boards(small, options['boards'] - small, user_ids, board_users, rng)
+    seeded = time.perf_counter() - started
+    results += cases(f"{options['boards']} boards", 'bench-0')
+    rows = (options['boards'] - small) * board_users
+    results.append({
+        'name': f"seed {options['boards'] - small} boards x {board_users}",
+        'iterations': 1, 'mean_ms': round(seeded * 1000, 3), 'p50_ms': round(seeded * 1000, 3),
+        'p99_ms': round(seeded * 1000, 3), 'ops_per_sec': round(1 / seeded, 3) if seeded else 0.0,
+        'items_per_sec': round(rows / seeded, 1) if seeded else 0.0,
+    })
+    return results
@@ -0,0 +1,123 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, IntegerField, Subquery, Value
+from django.utils import timezone
+from .models import BoardScore, BoardWinner, Leaderboard
+
+
+def _supports_upsert_returning():
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35, 0)
+    return False
+
+
+def change_board_score(board_id, user_id, change):
+    """
+    Atomically add `change` to a user's points on a board, creating the
+    user's entry on the first change. Returns the new points.
+    """
+    if _supports_upsert_returning():
+        qn = connection.ops.quote_name
+        table = qn(BoardScore._meta.db_table)
+        board, user, points = (qn(name) for name in ('board_id', 'user_id', 'points'))
+        sql = (
+            f'INSERT INTO {table} ({board}, {user}, {points}) VALUES (%s, %s, %s) '
+            f'ON CONFLICT ({board}, {user}) DO UPDATE SET {points} = {table}.{points} + excluded.{points} '
+            f'RETURNING {points}'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [board_id, user_id, change])
+            return cursor.fetchone()[0]
+
+    with transaction.atomic():
+        score, created = BoardScore.objects.select_for_update().get_or_create(
+            board_id=board_id, user_id=user_id, defaults={'points': change},
+        )
+        if not created:
+            BoardScore.objects.filter(pk=score.pk).update(points=F('points') + change)
+            score.refresh_from_db(fields=['points'])
+        return score.points
+
+
+def board_rows(board_id):
+    """
+    Return a board's (user_id, name, points) rows, for ordering by
+    (-points, user_id) over board_score_rank_idx.
+    """
+    return BoardScore.objects.filter(board_id=board_id).values('user_id', 'points', name=F('user__name'))
+
+
+def board_rank(board_id, user_id):
+    """
+    Return (points, rank) of a user on a board, or None if the user has no
+    score there. The rank counts the board's rows ahead in the index.
+    """
+    points = (
+        BoardScore.objects
+        .filter(board_id=board_id, user_id=user_id)
+        .values_list('points', flat=True)
+        .first()
+    )
+    if points is None:
+        return None
+    ahead = BoardScore.objects.filter(board_id=board_id, points__gte=points).exclude(
+        points=points, user_id__gte=user_id,
+    ).count()
+    return points, ahead + 1
+
+
+def declare_board_winner(board_id):
+    """
+    Select and record a board's winner, like declare_winner() for the global
+    leaderboard. Returns the new BoardWinner, or None on a tie, an empty
+    board, or a winner declared less than WINNER_MIN_INTERVAL_SECONDS ago.
+    """
+    with transaction.atomic():
+        # Locks the board row (and takes SQLite's write lock) so concurrent
+        # selections for the same board run one after the other
+        if not Leaderboard.objects.filter(pk=board_id).update(winner_checked_at=timezone.now()):
+            return None
+        last_win = BoardWinner.objects.filter(board_id=board_id).order_by('-timestamp', 'id').values('timestamp')[:1]
+        players = (
+            BoardScore.objects.filter(board_id=board_id).order_by()
+            .annotate(all=Value(1, output_field=IntegerField())).values('all')
+            .annotate(players=Count('id')).values('players')
+        )
+        top = list(
+            BoardScore.objects.filter(board_id=board_id)
+            .order_by('-points', 'user_id')
+            .annotate(last_win=Subquery(last_win), players=Subquery(players), user_name=F('user__name'))
+            [:2]
+        )
+        if not top or (len(top) == 2 and top[0].points == top[1].points):
+            return None
+        leader = top[0]
+        min_interval = timedelta(seconds=settings.WINNER_MIN_INTERVAL_SECONDS)
+        if leader.last_win is not None and timezone.now() - leader.last_win < min_interval:
+            return None
+        return BoardWinner.objects.create(
+            board_id=board_id,
+            user_id=leader.user_id,
+            points_at_win=leader.points,
+            user_name=leader.user_name,
+            runner_up_points=top[1].points if len(top) == 2 else None,
+            players=leader.players,
+        )
+
+
+def board_id_batches(batch_size):
+    """
+    Yield the ids of all boards in lists of `batch_size`.
+    """
+    batch = []
+    for board_id in Leaderboard.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=2000):
+        batch.append(board_id)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
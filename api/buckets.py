@@ -0,0 +1,86 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from .models import ScoreBucket, User
+
+
+def adjust_buckets(changes):
+    """
+    Apply {points: (count_delta, age_delta)} to the score buckets.
+
+    Rows are touched in points order so concurrent transactions moving users
+    between the same buckets always lock them in the same order.
+    """
+    for points in sorted(changes):
+        count, age = changes[points]
+        if not count and not age:
+            continue
+        updated = ScoreBucket.objects.filter(points=points).update(
+            count=F('count') + count,
+            age_sum=F('age_sum') + age,
+        )
+        if updated:
+            continue
+        try:
+            with transaction.atomic():
+                ScoreBucket.objects.create(points=points, count=count, age_sum=age)
+        except IntegrityError:
+            # Another transaction created the bucket first
+            ScoreBucket.objects.filter(points=points).update(
+                count=F('count') + count,
+                age_sum=F('age_sum') + age,
+            )
+
+
+def move_user(old_points, new_points, old_age, new_age):
+    """
+    Move one user between buckets. Pass None as the old values for a new
+    user, or None as the new values for a deleted one.
+    """
+    changes = {}
+    if old_points is not None:
+        changes[old_points] = (-1, -old_age)
+    if new_points is not None:
+        count, age = changes.get(new_points, (0, 0))
+        changes[new_points] = (count + 1, age + new_age)
+    adjust_buckets(changes)
+
+
+def live_buckets():
+    """
+    Aggregate the User table into {points: (count, age_sum)}.
+    """
+    rows = User.objects.values('points').annotate(count=Count('id'), age_sum=Sum('age'))
+    return {row['points']: (row['count'], row['age_sum']) for row in rows}
+
+
+def rebuild_buckets():
+    """
+    Replace the score buckets with a fresh aggregation of the User table.
+    """
+    with transaction.atomic():
+        ScoreBucket.objects.all().delete()
+        ScoreBucket.objects.bulk_create(
+            [ScoreBucket(points=points, count=count, age_sum=age_sum)
+             for points, (count, age_sum) in live_buckets().items()],
+            batch_size=1000,
+        )
+    return ScoreBucket.objects.count()
+
+
+def verify_buckets():
+    """
+    Compare the score buckets against the live aggregation.
+    Returns a list of human readable mismatches, empty when consistent.
+    """
+    expected = live_buckets()
+    stored = {
+        bucket.points: (bucket.count, bucket.age_sum)
+        for bucket in ScoreBucket.objects.filter(count__gt=0)
+    }
+    mismatches = []
+    for points in sorted(set(expected) | set(stored), reverse=True):
+        if expected.get(points) != stored.get(points):
+            mismatches.append(
+                f'{points} points: bucket has {stored.get(points)}, users have {expected.get(points)}'
+            )
+    return mismatches
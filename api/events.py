@@ -0,0 +1,139 @@
+import asyncio
+import json
+import logging
+import threading
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.db import transaction
+from . import redis_store
+from .ranking import get_rank_store
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBroker:
+    """
+    In-process fan-out of events to the streams served by this process.
+    Used when LEADERBOARD_REDIS_URL is unset, so it only reaches clients
+    connected to the worker that made the change.
+    """
+    max_queued = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def publish(self, frame):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._put, queue, frame)
+
+    @classmethod
+    def _put(cls, queue, frame):
+        if queue.full():
+            # A client this far behind only needs the newest state
+            queue.get_nowait()
+        queue.put_nowait(frame)
+
+    async def frames(self, heartbeat):
+        """
+        Yield published frames, or None after `heartbeat` idle seconds.
+        """
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.max_queued))
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscriber[1].get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+
+local_broker = LocalBroker()
+
+
+def format_event(event, data):
+    """
+    Return a Server-Sent Events frame for `event` with compact JSON `data`.
+    """
+    return f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+def publish(event, data):
+    """
+    Send an event to every connected stream, through Redis pub/sub when the
+    Redis leaderboard is configured. Best effort: a failure is logged and
+    clients catch up on their next full load.
+    """
+    frame = format_event(event, data)
+    client = redis_store.get_redis()
+    if client is None:
+        local_broker.publish(frame)
+        return
+    try:
+        client.publish(settings.LEADERBOARD_EVENTS_CHANNEL, frame)
+    except redis.RedisError as e:
+        logger.warning(f"Leaderboard event publish failed: {str(e)}")
+
+
+def publish_on_commit(event, data):
+    transaction.on_commit(lambda: publish(event, data))
+
+
+def publish_scores(changes):
+    """
+    Publish {user_id: points} score changes on commit as compact
+    [id, points, rank] deltas, ranked after the rank store has been updated.
+    """
+    def send():
+        try:
+            ranks = get_rank_store().ranks(list(changes))
+        except redis.RedisError:
+            ranks = [None] * len(changes)
+        publish('scores', [[user_id, points, rank] for (user_id, points), rank in zip(changes.items(), ranks)])
+    transaction.on_commit(send)
+
+
+def publish_user(row):
+    """
+    Publish a created or edited user (a UserSerializer-shaped dict) on
+    commit, with its rank.
+    """
+    def send():
+        try:
+            rank = get_rank_store().rank(row['id'])
+        except redis.RedisError:
+            rank = None
+        publish('user', dict(row, rank=rank))
+    transaction.on_commit(send)
+
+
+async def _redis_frames(heartbeat):
+    client = redis.asyncio.Redis.from_url(settings.LEADERBOARD_REDIS_URL, decode_responses=True)
+    pubsub = client.pubsub()
+    await pubsub.subscribe(settings.LEADERBOARD_EVENTS_CHANNEL)
+    try:
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat)
+            yield message['data'] if message else None
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+
+
+async def event_stream():
+    """
+    Yield the SSE body for one client: published frames, with a comment
+    line as a heartbeat while idle so proxies keep the connection open.
+    """
+    heartbeat = settings.LEADERBOARD_STREAM_HEARTBEAT_SECONDS
+    frames = _redis_frames(heartbeat) if settings.LEADERBOARD_REDIS_URL else local_broker.frames(heartbeat)
+    yield 'retry: 3000\n\n'
+    async for frame in frames:
+        yield ': ping\n\n' if frame is None else frame
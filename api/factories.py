@@ -1,22 +1,122 @@
-import factory
+import io
 import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from django.db import connection, transaction
+from faker import Faker
 from .models import User
 
-class UserFactory(factory.django.DjangoModelFactory):
-    class Meta:
-        model = User
+try:
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+except ImportError:
+    # No PostgreSQL driver, only the SQLite INSERT path is used
+    is_psycopg3 = False
 
-    name = factory.Faker('name')
-    age = factory.LazyFunction(lambda: random.randint(18, 65))
-    address = factory.Faker('address')
-    points = factory.LazyFunction(lambda: random.randint(0, 100))
+# Size of the Faker-generated pools that seeded rows draw from
+POOL_SIZE = 1000
 
-def create_initial_users(count=10):
+_pools = {}
+
+
+def _get_pools(seed):
+    """
+    Build (first names, last names, addresses) pools for a seed, once per process.
+    """
+    pools = _pools.get(seed)
+    if pools is None:
+        fake = Faker()
+        fake.seed_instance(seed)
+        pools = _pools[seed] = (
+            [fake.first_name() for _ in range(POOL_SIZE)],
+            [fake.last_name() for _ in range(POOL_SIZE)],
+            [fake.address() for _ in range(POOL_SIZE)],
+        )
+    return pools
+
+
+def _generate_chunk(seed, index, size):
+    """
+    Generate one chunk of (name, age, address, points) rows.
+    Each chunk has its own RNG, so output does not depend on worker count.
+    """
+    first_names, last_names, addresses = _get_pools(seed)
+    rng = random.Random(f'{seed}:{index}')
+    names = map(' '.join, zip(rng.choices(first_names, k=size), rng.choices(last_names, k=size)))
+    ages = rng.choices(range(18, 66), k=size)
+    points = rng.choices(range(0, 101), k=size)
+    return list(zip(names, ages, rng.choices(addresses, k=size), points))
+
+
+def generate_user_chunks(count, batch_size=5000, seed=0, workers=1):
+    """
+    Stream `count` deterministic user rows in chunks of `batch_size`.
+
+    With several workers the chunks are generated in a process pool, with at
+    most two chunks per worker in flight so memory stays bounded.
     """
-    Create initial users with random values.
-    
-    Args:
-        count (int): Number of users to create. Default is 10.
+    tasks = [
+        (seed, index, min(batch_size, count - start))
+        for index, start in enumerate(range(0, count, batch_size))
+    ]
+    if workers <= 1:
+        for task in tasks:
+            yield _generate_chunk(*task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_generate_chunk, *task))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _copy_escape(value):
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def insert_user_rows(rows):
+    """
+    Insert (name, age, address, points) rows: COPY FROM STDIN on PostgreSQL,
+    with psycopg 3 or psycopg2, a single executemany INSERT elsewhere. Both
+    skip model instantiation.
+    """
+    table = connection.ops.quote_name(User._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            sql = f'COPY {table} (name, age, address, points) FROM STDIN'
+            if is_psycopg3:
+                with cursor.cursor.copy(sql) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+                return
+            buffer = io.StringIO()
+            for row in rows:
+                buffer.write('\t'.join(_copy_escape(value) for value in row))
+                buffer.write('\n')
+            buffer.seek(0)
+            cursor.cursor.copy_expert(sql, buffer)
+        else:
+            cursor.executemany(
+                f'INSERT INTO {table} (name, age, address, points) VALUES (%s, %s, %s, %s)',
+                rows
+            )
+
+
+def seed_users(count, batch_size=5000, seed=0, workers=1, progress=None):
+    """
+    Bulk insert `count` generated users, one transaction per chunk.
+
+    The per-row signals are skipped, so callers must rebuild the derived
+    leaderboard data (score buckets, rank store) afterwards.
     """
-    for _ in range(count):
-        UserFactory.create() 
\ No newline at end of file
+    inserted = 0
+    for chunk in generate_user_chunks(count, batch_size, seed, workers):
+        with transaction.atomic():
+            insert_user_rows(chunk)
+        inserted += len(chunk)
+        if progress:
+            progress(inserted)
+    return inserted
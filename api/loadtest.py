@@ -0,0 +1,145 @@
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlsplit
+from .benchmarks import percentile
+
+# (weight, method, path) of the simulated client mix; {user_id} is filled
+# with a random existing user
+WORKLOAD = (
+    (70, 'GET', '/api/users/'),
+    (10, 'GET', '/api/users/grouped_by_score/?limit=20&names_limit=5'),
+    (20, 'PATCH', '/api/users/{user_id}/update_score/'),
+)
+
+
+class HTTPConnection:
+    """
+    Minimal keep-alive HTTP/1.1 client, enough to drive the API with
+    thousands of concurrent connections from one process.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        """
+        Send a request and return (status, body bytes).
+        """
+        if self.writer is None:
+            await self._connect()
+        payload = json.dumps(body).encode() if body is not None else b''
+        head = (
+            f'{method} {path} HTTP/1.1\r\n'
+            f'Host: {self.host}:{self.port}\r\n'
+            'Accept: application/json\r\n'
+            'Content-Type: application/json\r\n'
+            f'Content-Length: {len(payload)}\r\n'
+            '\r\n'
+        )
+        self.writer.write(head.encode() + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            await self.close()
+            raise ConnectionError('connection closed by server')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            content = b''
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                content += chunk[:-2]
+        elif 'content-length' in headers:
+            content = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            content = await self.reader.read()
+            await self.close()
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, content
+
+
+def _pick_request(rng, user_ids):
+    total = sum(weight for weight, _, _ in WORKLOAD)
+    roll = rng.uniform(0, total)
+    for weight, method, path in WORKLOAD:
+        roll -= weight
+        if roll <= 0:
+            break
+    user_id = rng.choice(user_ids)
+    body = {'change': rng.choice((-1, 1))} if method == 'PATCH' else None
+    return method, path.format(user_id=user_id), body
+
+
+async def _client(index, url, user_ids, started, deadline, ramp, results):
+    parts = urlsplit(url)
+    connection = HTTPConnection(parts.hostname, parts.port or 80)
+    rng = random.Random(index)
+    # Spread the connection opening over the ramp-up period
+    await asyncio.sleep(ramp * rng.random())
+    try:
+        while time.perf_counter() < deadline:
+            method, path, body = _pick_request(rng, user_ids)
+            call_started = time.perf_counter()
+            try:
+                status, _ = await connection.request(method, path, body)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+                results['errors'][type(e).__name__] = results['errors'].get(type(e).__name__, 0) + 1
+                await connection.close()
+                await asyncio.sleep(0.1)
+                continue
+            if call_started - started >= ramp:
+                results['latencies'].append((time.perf_counter() - call_started) * 1000)
+                results['statuses'][status] = results['statuses'].get(status, 0) + 1
+    finally:
+        await connection.close()
+
+
+async def run_load(url, user_ids, concurrency, duration, ramp):
+    """
+    Drive `url` with `concurrency` keep-alive clients for `ramp` + `duration`
+    seconds and return throughput and latency, measured after the ramp-up.
+    """
+    results = {'latencies': [], 'statuses': {}, 'errors': {}}
+    started = time.perf_counter()
+    deadline = started + ramp + duration
+    await asyncio.gather(*(
+        _client(index, url, user_ids, started, deadline, ramp, results)
+        for index in range(concurrency)
+    ))
+    latencies = results['latencies']
+    return {
+        'requests': len(latencies),
+        'requests_per_sec': round(len(latencies) / duration, 1),
+        'p50_ms': round(percentile(latencies, 50), 1) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 1) if latencies else None,
+        'statuses': dict(sorted(results['statuses'].items())),
+        'errors': results['errors'],
+    }
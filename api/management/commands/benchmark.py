@@ -0,0 +1,160 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from api.benchmarks import SCENARIOS, compare, environment, remove_seeded, seeded_marks
+from api.buckets import rebuild_buckets
+from api.factories import seed_users
+from api.models import User
+
+class Command(BaseCommand):
+    help = 'Seed users and measure latency and throughput of the leaderboard hot paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenarios',
+            nargs='*',
+            help=f"Scenarios to run: {', '.join(sorted(SCENARIOS))} (default: all)"
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=100000,
+            help='Number of users to seed before measuring'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help='Measured calls per case'
+        )
+        parser.add_argument(
+            '--deep-page',
+            type=int,
+            default=5000,
+            help='Page number used for the deep pagination cases'
+        )
+        parser.add_argument(
+            '--boards',
+            type=int,
+            default=10000,
+            help='Boards seeded by the boards scenario'
+        )
+        parser.add_argument(
+            '--board-users',
+            type=int,
+            default=1000,
+            help='Users scored on each board by the boards scenario'
+        )
+        parser.add_argument(
+            '--winners',
+            type=int,
+            default=2000,
+            help='Winners in the table when the hot_paths scenario lists them'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Seed of the generated users, keep it fixed to compare runs'
+        )
+        parser.add_argument(
+            '--output',
+            help='Save the results and the environment as JSON to this file'
+        )
+        parser.add_argument(
+            '--compare',
+            metavar='BASELINE',
+            help='Compare p50 latencies with a saved JSON run and fail on regressions'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=20.0,
+            help='p50 growth in percent that --compare reports as a regression'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the seeded rows instead of deleting them afterwards'
+        )
+
+    def handle(self, *args, **options):
+        scenarios = options['scenarios'] or sorted(SCENARIOS)
+        unknown = sorted(set(scenarios) - set(SCENARIOS))
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(unknown)}")
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline {options['compare']}: {e}")
+
+        report = {
+            'environment': environment(),
+            'options': {
+                name: options[name]
+                for name in ('users', 'iterations', 'deep_page', 'winners', 'boards', 'board_users', 'seed')
+            },
+            'scenarios': {},
+        }
+        # Autocommit, so the write cases pay for their commit and on_commit
+        # work (rank store, version bump, events) like real requests
+        marks = seeded_marks()
+        options['user_mark'] = marks[User]
+        try:
+            started = time.perf_counter()
+            seed_users(options['users'], seed=options['seed'])
+            rebuild_buckets()
+            self.stdout.write(f"Seeded {options['users']} users in {time.perf_counter() - started:.1f}s")
+            report['environment']['total_users'] = User.objects.count()
+            if report['environment']['total_users'] > options['users']:
+                self.stderr.write(
+                    f"The database already had users, measuring {report['environment']['total_users']}: "
+                    'runs are only comparable on the same data'
+                )
+
+            for name in scenarios:
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                results = report['scenarios'][name] = SCENARIOS[name](options)
+                for result in results:
+                    line = (
+                        f"  {result['name']:<32} p50 {result['p50_ms']:>9.3f} ms"
+                        f"  p99 {result['p99_ms']:>9.3f} ms  {result['ops_per_sec']:>9.1f} ops/s"
+                    )
+                    if 'items_per_sec' in result:
+                        line += f"  {result['items_per_sec']:>10.1f} items/s"
+                    if 'queries' in result:
+                        line += f"  {result['queries']} queries"
+                    self.stdout.write(line)
+        finally:
+            if not options['keep']:
+                remove_seeded(marks)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+                f.write('\n')
+            self.stdout.write(f"Saved results to {options['output']}")
+
+        if baseline is not None:
+            self.compare(baseline, report, options['threshold'])
+
+    def compare(self, baseline, report, threshold):
+        before, now = baseline.get('environment', {}), report['environment']
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"compared with {before.get('commit') or 'baseline'} ({before.get('database')})"
+        ))
+        if before.get('database') != now['database']:
+            self.stderr.write(f"Baseline ran on {before.get('database')}, this run on {now['database']}")
+        regressions = 0
+        for scenario_name, name, old_p50, p50, change, regressed in compare(baseline, report, threshold):
+            line = f"  {scenario_name}: {name:<32} p50 {old_p50:>9.3f} -> {p50:>9.3f} ms  {change:>+7.1f}%"
+            if regressed:
+                regressions += 1
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+        if regressions:
+            raise CommandError(f'{regressions} cases are more than {threshold:g}% slower than the baseline')
+        self.stdout.write(self.style.SUCCESS(f'No case is more than {threshold:g}% slower than the baseline'))
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.loadtest import run_load
+from api.models import User
+
+# The same gunicorn process manager for both, only the worker class differs
+SERVERS = {
+    'wsgi': ['config.wsgi'],
+    'asgi': ['--worker-class', 'uvicorn.workers.UvicornWorker', 'config.asgi:application'],
+}
+
+
+class Command(BaseCommand):
+    help = 'Load test the API under many concurrent clients, WSGI vs ASGI workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--servers',
+            nargs='+',
+            choices=sorted(SERVERS),
+            default=['wsgi', 'asgi'],
+            help='Server modes to start and compare (default: both)'
+        )
+        parser.add_argument(
+            '--url',
+            help='Load test an already running server instead of starting one'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1000,
+            help='Number of concurrent keep-alive clients'
+        )
+        parser.add_argument(
+            '--duration',
+            type=int,
+            default=30,
+            help='Seconds measured after the ramp-up'
+        )
+        parser.add_argument(
+            '--ramp',
+            type=int,
+            default=5,
+            help='Seconds over which the clients connect, not measured'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=3,
+            help='gunicorn worker processes per server'
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=8765,
+            help='Port for the servers started by the command'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = list(User.objects.values_list('id', flat=True)[:10000])
+        if not user_ids:
+            raise CommandError('No users to load test with, run populate_db first')
+        self._raise_file_limit(options['concurrency'])
+
+        if options['url']:
+            self._report(options['url'], self._run(options['url'], user_ids, options))
+            return
+        for mode in options['servers']:
+            url = f"http://127.0.0.1:{options['port']}"
+            server = self._start(mode, options)
+            try:
+                self._report(mode, self._run(url, user_ids, options))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+    def _run(self, url, user_ids, options):
+        return asyncio.run(run_load(url, user_ids, options['concurrency'], options['duration'], options['ramp']))
+
+    def _raise_file_limit(self, concurrency):
+        # One socket per client, plus headroom
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        wanted = concurrency + 256
+        if soft < wanted:
+            if hard != resource.RLIM_INFINITY and hard < wanted:
+                raise CommandError(f'Open file limit {hard} is too low for {concurrency} clients, raise ulimit -n')
+            resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+    def _start(self, mode, options):
+        env = dict(os.environ, LEADERBOARD_ASYNC_VIEWS=str(mode == 'asgi'))
+        command = [
+            sys.executable, '-m', 'gunicorn',
+            '--bind', f"127.0.0.1:{options['port']}",
+            '--workers', str(options['workers']),
+            '--backlog', str(max(options['concurrency'], 2048)),
+            '--log-level', 'warning',
+        ] + SERVERS[mode]
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Starting {mode}: {' '.join(command[2:])}"))
+        server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'{mode} server exited with code {server.returncode}')
+            try:
+                socket.create_connection(('127.0.0.1', options['port']), timeout=1).close()
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f'{mode} server did not start listening within 30s')
+
+    def _report(self, name, result):
+        self.stdout.write(
+            f"  {name:<6} {result['requests_per_sec']:>9.1f} req/s"
+            f"  p50 {result['p50_ms'] or 0:>8.1f} ms  p99 {result['p99_ms'] or 0:>8.1f} ms"
+            f"  {result['requests']} requests  statuses {result['statuses']}"
+        )
+        if result['errors']:
+            self.stdout.write(self.style.WARNING(f"  errors {result['errors']}"))
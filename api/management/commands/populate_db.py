@@ -1,5 +1,11 @@
+import random
+import time
 from django.core.management.base import BaseCommand
-from api.factories import create_initial_users
+from api.buckets import rebuild_buckets
+from api.factories import seed_users
+from api.ranking import get_rank_store
+from api.response_cache import bump_version
+from api.score_log import snapshot_unlogged_users
 
 class Command(BaseCommand):
     help = 'Populate the database with initial users'
@@ -11,8 +17,44 @@ class Command(BaseCommand):
             default=10,
             help='Number of users to create'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Users generated and inserted per batch'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Processes generating user rows in parallel'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Random seed; the same seed always creates the same users'
+        )
 
     def handle(self, *args, **options):
         count = options['count']
-        create_initial_users(count)
-        self.stdout.write(self.style.SUCCESS(f'Successfully created {count} users')) 
\ No newline at end of file
+        seed = options['seed'] if options['seed'] is not None else random.randrange(2 ** 32)
+        started = time.perf_counter()
+
+        def progress(inserted):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{inserted}/{count} users inserted')
+
+        seed_users(count, options['batch_size'], seed, options['workers'], progress)
+        elapsed = time.perf_counter() - started
+
+        # Bulk inserts skip the per-row signals, refresh the derived data
+        rebuild_buckets()
+        snapshot_unlogged_users()
+        get_rank_store().reset()
+        bump_version()
+
+        rate = count / elapsed if elapsed else count
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully created {count} users in {elapsed:.1f}s ({rate:,.0f} rows/sec, seed {seed})'
+        ))
@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from api.ranking import get_rank_store
+
+class Command(BaseCommand):
+    help = 'Rebuild the leaderboard rank index (or Redis sorted set) from the database and check it against the User table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-check',
+            action='store_true',
+            help='Only rebuild the index, skip the consistency check'
+        )
+
+    def handle(self, *args, **options):
+        store = get_rank_store()
+        started = time.perf_counter()
+        count = store.rebuild()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'Indexed {count} users in {elapsed:.2f}s')
+
+        if options['no_check']:
+            return
+        mismatches = store.verify()
+        if mismatches:
+            for mismatch in mismatches:
+                self.stderr.write(mismatch)
+            raise CommandError('Rank index is inconsistent with the User table')
+        self.stdout.write(self.style.SUCCESS('Rank index is consistent with the User table'))
@@ -0,0 +1,55 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from api.buckets import rebuild_buckets
+from api.ranking import get_rank_store
+from api.response_cache import bump_version
+from api.score_log import replay_scores
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild User.points from the score snapshots plus the event log tail, then the '
+        'score buckets and rank index. Stop the write-behind flush while it runs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report the users whose points differ from the log, change nothing'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Users read, checked and updated per transaction'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        shown = 0
+
+        def report(user_id, points, logged_points):
+            nonlocal shown
+            if shown < 20 or options['verbosity'] > 1:
+                self.stderr.write(f'user {user_id}: points {points}, log has {logged_points}')
+            shown += 1
+
+        started = time.perf_counter()
+        result = replay_scores(options['batch_size'], apply=not dry_run, on_mismatch=report)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Replayed {result['users']} users in {elapsed:.2f}s: {result['mismatched']} differ from the log, "
+            f"{result['unlogged']} have no score history"
+        )
+
+        if dry_run:
+            if result['mismatched']:
+                raise CommandError('User points are inconsistent with the score event log')
+            self.stdout.write(self.style.SUCCESS('User points are consistent with the score event log'))
+            return
+
+        if result['mismatched']:
+            rebuild_buckets()
+            get_rank_store().rebuild()
+            bump_version()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the points of {result['mismatched']} users"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.buckets import rebuild_buckets, verify_buckets
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed score buckets and verify them against the User table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='Only compare the buckets with the live aggregation, do not rebuild'
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            count = rebuild_buckets()
+            self.stdout.write(f'Rebuilt {count} score buckets')
+
+        mismatches = verify_buckets()
+        if mismatches:
+            for mismatch in mismatches:
+                self.stderr.write(mismatch)
+            raise CommandError('Score buckets are inconsistent with the User table')
+        self.stdout.write(self.style.SUCCESS('Score buckets are consistent with the User table'))
@@ -0,0 +1,390 @@
+import contextvars
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+WORKERS_KEY = 'leaderboard:metrics:workers'
+
+# Upper bounds of the histogram buckets, +Inf is implied
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+TASK_SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# name: (type, help, histogram buckets) of every exported metric
+METRICS = {
+    'leaderboard_requests_total': (
+        'counter', 'Requests by view, method and status code.', None,
+    ),
+    'leaderboard_request_duration_seconds': (
+        'histogram', 'Wall time of the requests, from the middleware in and back out.', SECONDS_BUCKETS,
+    ),
+    'leaderboard_requests_sampled_total': (
+        'counter', 'Requests instrumented for database and rendering time (METRICS_SAMPLE_RATE).', None,
+    ),
+    'leaderboard_request_db_queries': (
+        'histogram', 'Database statements per sampled request.', QUERY_BUCKETS,
+    ),
+    'leaderboard_request_db_duration_seconds': (
+        'histogram', 'Time spent executing database statements per sampled request.', SECONDS_BUCKETS,
+    ),
+    'leaderboard_request_render_duration_seconds': (
+        'histogram', 'Time spent rendering the response body per sampled request.', SECONDS_BUCKETS,
+    ),
+    'leaderboard_n_plus_one_total': (
+        'counter', 'Sampled requests that ran one statement METRICS_N_PLUS_ONE_THRESHOLD times or more.', None,
+    ),
+    'leaderboard_task_runs_total': (
+        'counter', 'Celery task runs by task and outcome, the status the task returned or error.', None,
+    ),
+    'leaderboard_task_duration_seconds': (
+        'histogram', 'Run time of the Celery tasks.', TASK_SECONDS_BUCKETS,
+    ),
+    'leaderboard_task_queue_lag_seconds': (
+        'histogram', 'Time from when a Celery task was due (sent, or its ETA) to when it started.',
+        TASK_SECONDS_BUCKETS,
+    ),
+    'leaderboard_task_last_completed_timestamp_seconds': (
+        'gauge', 'Unix time of the last run of each Celery task that did not fail.', None,
+    ),
+}
+
+
+class Sample:
+    """
+    Database and rendering measurements of one sampled request.
+    """
+    __slots__ = ('queries', 'db_seconds', 'statements', 'render_started', 'render_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = {}
+        self.render_started = None
+        self.render_seconds = 0.0
+
+
+# The Sample of the request being served, None when it is not sampled.
+# A context variable, so it follows async views into sync_to_async threads.
+_sample = contextvars.ContextVar('leaderboard_metrics_sample', default=None)
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """
+    Database execute wrapper timing the statements of sampled requests.
+    Unsampled requests only pay for the context variable lookup.
+    """
+    sample = _sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.db_seconds += time.perf_counter() - started
+        sample.queries += 1
+        # `sql` still has its placeholders, so repeats of one query match
+        sample.statements[sql] = sample.statements.get(sql, 0) + 1
+
+
+def install_execute_wrapper(sender, connection, **kwargs):
+    """
+    connection_created handler adding execute_wrapper() to every connection.
+    It goes first in the list, so it times the other wrappers too and is
+    never popped by a temporary connection.execute_wrapper() block.
+    """
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, execute_wrapper)
+
+
+class Registry:
+    """
+    The counters, histograms and gauges of this process, keyed by (name, labels)
+    with labels a tuple of (label, value) pairs.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.published_at = 0.0
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts, the overflow bucket, then the sum
+                histogram = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            histogram[bisect_left(buckets, value)] += 1
+            histogram[-1] += value
+
+    def set_max(self, name, labels, value):
+        """
+        Set a gauge that only moves up, such as a timestamp, so the workers'
+        values merge by taking the largest.
+        """
+        key = (name, labels)
+        with self.lock:
+            self.gauges[key] = max(self.gauges.get(key, value), value)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': dict(self.counters),
+                'histograms': {key: list(values) for key, values in self.histograms.items()},
+                'gauges': dict(self.gauges),
+            }
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.gauges.clear()
+            self.published_at = 0.0
+
+    def publish_due(self):
+        return time.monotonic() - self.published_at >= settings.METRICS_PUBLISH_SECONDS
+
+    def publish(self):
+        """
+        Store this process's snapshot in the cache, where /metrics served by
+        any worker adds it to its own.
+        """
+        self.published_at = time.monotonic()
+        timeout = settings.METRICS_WORKER_EXPIRY_SECONDS
+        try:
+            cache.set(f'{WORKERS_KEY}:{self.worker}', self.snapshot(), timeout)
+            workers = cache.get(WORKERS_KEY) or {}
+            now = time.time()
+            workers = {worker: seen for worker, seen in workers.items() if now - seen < timeout}
+            workers[self.worker] = now
+            cache.set(WORKERS_KEY, workers, None)
+        except Exception as e:
+            logger.warning(f"Metrics publish failed: {str(e)}")
+
+    def collect(self):
+        """
+        Return the snapshot of this process plus the ones published by the
+        other workers.
+        """
+        snapshots = [self.snapshot()]
+        try:
+            workers = cache.get(WORKERS_KEY) or {}
+            keys = [f'{WORKERS_KEY}:{worker}' for worker in workers if worker != self.worker]
+            snapshots += cache.get_many(keys).values()
+        except Exception as e:
+            logger.warning(f"Metrics collection failed: {str(e)}")
+        merged = {'counters': {}, 'histograms': {}, 'gauges': {}}
+        for snapshot in snapshots:
+            for key, value in snapshot.get('gauges', {}).items():
+                merged['gauges'][key] = max(merged['gauges'].get(key, value), value)
+            for key, value in snapshot['counters'].items():
+                merged['counters'][key] = merged['counters'].get(key, 0) + value
+            for key, values in snapshot['histograms'].items():
+                total = merged['histograms'].get(key)
+                merged['histograms'][key] = values if total is None else [a + b for a, b in zip(total, values)]
+        return merged
+
+
+registry = Registry()
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics(snapshot):
+    """
+    Format a collected snapshot in the Prometheus text exposition format.
+    """
+    series = {}
+    for (name, labels), value in list(snapshot['counters'].items()) + list(snapshot['gauges'].items()):
+        series.setdefault(name, []).append((labels, [f'{name}{_labels(labels)} {_number(value)}']))
+    for (name, labels), values in snapshot['histograms'].items():
+        lines = []
+        buckets = METRICS[name][2]
+        cumulative = 0
+        for bound, count in zip(buckets + ('+Inf',), values):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels(labels, le=bound)} {cumulative}')
+        lines.append(f'{name}_sum{_labels(labels)} {_number(values[-1])}')
+        lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+        series.setdefault(name, []).append((labels, lines))
+
+    output = []
+    for name, (kind, help_text, _) in METRICS.items():
+        output.append(f'# HELP {name} {help_text}')
+        output.append(f'# TYPE {name} {kind}')
+        # Series in label order, the buckets of a histogram in bound order
+        for _, lines in sorted(series.get(name, []), key=lambda item: [(k, str(v)) for k, v in item[0]]):
+            output.extend(lines)
+    return '\n'.join(output) + '\n'
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    # Unresolved paths share one label, so scanners cannot blow up the series
+    return match.view_name if match is not None else '<unresolved>'
+
+
+def record_request(request, response, seconds, sample):
+    """
+    Add a finished request to the registry and flag its N+1 pattern, if any.
+    """
+    view = (('view', _view_name(request)),)
+    registry.inc('leaderboard_requests_total', view + (('method', request.method), ('status', response.status_code)))
+    registry.observe('leaderboard_request_duration_seconds', view, seconds)
+    if sample is None:
+        return
+    registry.inc('leaderboard_requests_sampled_total', view)
+    registry.observe('leaderboard_request_db_queries', view, sample.queries)
+    registry.observe('leaderboard_request_db_duration_seconds', view, sample.db_seconds)
+    registry.observe('leaderboard_request_render_duration_seconds', view, sample.render_seconds)
+    if sample.statements:
+        sql, repeats = max(sample.statements.items(), key=lambda item: item[1])
+        if repeats >= settings.METRICS_N_PLUS_ONE_THRESHOLD:
+            registry.inc('leaderboard_n_plus_one_total', view)
+            logger.warning(f"Possible N+1 in {view[0][1]}: {repeats} runs of {sql[:200]}")
+
+
+class InstrumentationMiddleware:
+    """
+    Record the view, wall time and status of every request, and for a
+    METRICS_SAMPLE_RATE share of them the database statements, database
+    time and rendering time, for the Prometheus /metrics endpoint.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _start():
+        rate = settings.METRICS_SAMPLE_RATE
+        sample = Sample() if rate >= 1 or (rate > 0 and random.random() < rate) else None
+        return sample, _sample.set(sample)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        sample, token = self._start()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _sample.reset(token)
+        record_request(request, response, time.perf_counter() - started, sample)
+        if registry.publish_due():
+            registry.publish()
+        return response
+
+    async def __acall__(self, request):
+        sample, token = self._start()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _sample.reset(token)
+        record_request(request, response, time.perf_counter() - started, sample)
+        if registry.publish_due():
+            await sync_to_async(registry.publish)()
+        return response
+
+    def process_template_response(self, request, response):
+        # Called just before DRF renders the response body
+        sample = _sample.get()
+        if sample is not None:
+            sample.render_started = time.perf_counter()
+
+            def rendered(response):
+                sample.render_seconds = time.perf_counter() - sample.render_started
+            response.add_post_render_callback(rendered)
+        return response
+
+
+# perf_counter() at the start of the Celery tasks running in this process
+_task_started = {}
+
+
+def task_published(sender=None, headers=None, **kwargs):
+    """
+    before_task_publish handler stamping the message with the time the task
+    is due, its ETA if it has one, for the queue lag.
+    """
+    if headers is None:
+        return
+    due_at = time.time()
+    if headers.get('eta'):
+        try:
+            due_at = max(due_at, datetime.fromisoformat(headers['eta']).timestamp())
+        except (TypeError, ValueError):
+            pass
+    headers['due_at'] = due_at
+
+
+def task_started(task_id=None, task=None, **kwargs):
+    """
+    task_prerun handler recording the queue lag of a task. The lag compares
+    the publisher's and the worker's clocks, keep them in sync.
+    """
+    _task_started[task_id] = time.perf_counter()
+    # A worker gets the custom headers as request attributes and in
+    # request.headers, an eager apply() only in the latter
+    due_at = (task.request.headers or {}).get('due_at', getattr(task.request, 'due_at', None))
+    if due_at is not None:
+        registry.observe('leaderboard_task_queue_lag_seconds', (('task', task.name),), max(time.time() - due_at, 0.0))
+
+
+def task_finished(task_id=None, task=None, retval=None, state=None, **kwargs):
+    """
+    task_postrun handler recording the run time and outcome of a task, then
+    publishing the worker's metrics: tasks run too rarely to wait for the
+    next publish.
+    """
+    labels = (('task', task.name),)
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        registry.observe('leaderboard_task_duration_seconds', labels, time.perf_counter() - started)
+    if state == 'FAILURE':
+        outcome = 'error'
+    elif isinstance(retval, dict) and retval.get('status'):
+        outcome = str(retval['status'])
+    else:
+        outcome = 'success'
+    registry.inc('leaderboard_task_runs_total', labels + (('outcome', outcome),))
+    if outcome != 'error':
+        registry.set_max('leaderboard_task_last_completed_timestamp_seconds', labels, time.time())
+    registry.publish()
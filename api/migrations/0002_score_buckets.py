@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:59
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_buckets(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    ScoreBucket = apps.get_model('api', 'ScoreBucket')
+    rows = User.objects.values('points').annotate(count=Count('id'), age_sum=Sum('age'))
+    ScoreBucket.objects.bulk_create(
+        [ScoreBucket(points=row['points'], count=row['count'], age_sum=row['age_sum']) for row in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.IntegerField(unique=True)),
+                ('count', models.IntegerField(default=0)),
+                ('age_sum', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_buckets, migrations.RunPython.noop),
+    ]
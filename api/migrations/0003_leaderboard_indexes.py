@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_score_buckets'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-points', 'id'], name='user_points_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='winner',
+            index=models.Index(fields=['-timestamp', 'id'], name='winner_timestamp_id_idx'),
+        ),
+    ]
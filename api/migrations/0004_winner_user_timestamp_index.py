@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_leaderboard_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='winner',
+            index=models.Index(fields=['user', 'timestamp'], name='winner_user_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_score_flush'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WindowArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('rank', models.IntegerField()),
+                ('name', models.CharField(max_length=100)),
+                ('points', models.IntegerField()),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='window_archives', to='api.user')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('window', 'period_start', 'rank'), name='window_archive_rank_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WindowScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('points', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='window_scores', to='api.user')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['window', 'period_start', '-points', 'user'], name='window_score_rank_idx')],
+                'constraints': [models.UniqueConstraint(fields=('window', 'period_start', 'user'), name='window_score_user_unique')],
+            },
+        ),
+    ]
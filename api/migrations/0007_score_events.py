@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def snapshot_existing_users(apps, schema_editor):
+    # The log starts now, existing points become each user's baseline
+    User = apps.get_model('api', 'User')
+    ScoreSnapshot = apps.get_model('api', 'ScoreSnapshot')
+    rows = User.objects.values_list('id', 'points').iterator(chunk_size=2000)
+    ScoreSnapshot.objects.bulk_create(
+        (ScoreSnapshot(user_id=user_id, points=points) for user_id, points in rows),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_window_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreSnapshot',
+            fields=[
+                ('user', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='score_snapshot', serialize=False, to='api.user')),
+                ('points', models.IntegerField(default=0)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ScoreEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('change', models.IntegerField()),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='score_events', to='api.user')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'id'], name='score_event_user_id_idx')],
+            },
+        ),
+        migrations.RunPython(snapshot_existing_users, migrations.RunPython.noop),
+    ]
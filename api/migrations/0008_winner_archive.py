@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_score_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WinnerArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('points_at_win', models.IntegerField()),
+                ('timestamp', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_winners', to='api.user')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-timestamp', 'id'], name='winner_archive_timestamp_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:44
+
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Subquery
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_user_names(apps, schema_editor):
+    # Only the name can be recovered for past winners, the runner-up points
+    # and player count stay empty. One UPDATE per batch of ids, each
+    # committed on its own so a large winners table is never locked whole.
+    User = apps.get_model('api', 'User')
+    name = Subquery(User.objects.filter(pk=OuterRef('user_id')).values('name')[:1])
+    for model_name in ('Winner', 'WinnerArchive'):
+        model = apps.get_model('api', model_name)
+        last_id = 0
+        while True:
+            ids = list(
+                model.objects.filter(id__gt=last_id, user_name='')
+                .order_by('id').values_list('id', flat=True)[:BACKFILL_BATCH_SIZE]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                model.objects.filter(id__in=ids).update(user_name=name)
+            last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0008_winner_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='winner',
+            name='players',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='winner',
+            name='runner_up_points',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='winner',
+            name='user_name',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='winnerarchive',
+            name='players',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='winnerarchive',
+            name='runner_up_points',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='winnerarchive',
+            name='user_name',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RunPython(backfill_user_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_winner_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Leaderboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('winner_checked_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BoardWinner',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points_at_win', models.IntegerField()),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('user_name', models.CharField(blank=True, default='', max_length=100)),
+                ('runner_up_points', models.IntegerField(blank=True, null=True)),
+                ('players', models.IntegerField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='board_wins', to='api.user')),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='winners', to='api.leaderboard')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['board', '-timestamp', 'id'], name='board_winner_timestamp_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BoardScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='board_scores', to='api.user')),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scores', to='api.leaderboard')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['board', '-points', 'user'], name='board_score_rank_idx')],
+                'constraints': [models.UniqueConstraint(fields=('board', 'user'), name='board_score_user_unique')],
+            },
+        ),
+    ]
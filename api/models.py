@@ -1,5 +1,6 @@
 import random
 from django.db import models
+from django.utils import timezone
 
 class User(models.Model):
     name = models.CharField(max_length=100)
@@ -7,6 +8,12 @@ class User(models.Model):
     address = models.TextField()
     points = models.IntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            # Serves the leaderboard ordering and keyset pagination
+            models.Index(fields=['-points', 'id'], name='user_points_id_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -14,6 +21,212 @@ class Winner(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="winners")
     points_at_win = models.IntegerField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Snapshot taken when the winner is declared, so the winners feed can be
+    # served without joining api_user: the name at win time, the points of
+    # the runner-up and the number of ranked users
+    user_name = models.CharField(max_length=100, blank=True, default='')
+    runner_up_points = models.IntegerField(null=True, blank=True)
+    players = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Serves the winners history ordering and keyset pagination
+            models.Index(fields=['-timestamp', 'id'], name='winner_timestamp_id_idx'),
+            # Serves a user's win history, newest first
+            models.Index(fields=['user', 'timestamp'], name='winner_user_timestamp_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.name} - {self.points_at_win} points at {self.timestamp}"
+
+class WinnerArchive(models.Model):
+    """
+    Winners older than WINNER_HOT_DAYS, moved out of the Winner table and
+    downsampled to the last winner of every WINNER_ARCHIVE_RESOLUTION_MINUTES.
+    Rows keep their Winner id and are all older than any remaining Winner,
+    so the winners list pages on from one table into the other.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_winners")
+    points_at_win = models.IntegerField()
+    timestamp = models.DateTimeField()
+    user_name = models.CharField(max_length=100, blank=True, default='')
+    runner_up_points = models.IntegerField(null=True, blank=True)
+    players = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Serves the archived winners history ordering and keyset pagination
+            models.Index(fields=['-timestamp', 'id'], name='winner_archive_timestamp_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.name} - {self.points_at_win} points at {self.timestamp} (archived)"
+
+class ScoreBucket(models.Model):
+    """
+    Precomputed per-score summary of users, maintained on every score change
+    so the grouped_by_score endpoint never aggregates the whole User table.
+    """
+    points = models.IntegerField(unique=True)
+    count = models.IntegerField(default=0)
+    age_sum = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.points} points: {self.count} users"
+
+class ScoreFlush(models.Model):
+    """
+    Record of an applied write-behind buffer claim. It is written in the same
+    transaction as the claim's score changes, so a claim retried after a
+    crashed flush is never applied twice.
+    """
+    token = models.CharField(max_length=32, unique=True)
+    users = models.IntegerField(default=0)
+    flushed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.token}: {self.users} users at {self.flushed_at}"
+
+class WindowScore(models.Model):
+    """
+    Points a user gained within one period of a time window (a day, ISO week
+    or calendar month), added to by every score change. Only the open
+    periods are kept here; closed ones are moved to WindowArchive.
+    """
+    WINDOWS = [
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+    ]
+    window = models.CharField(max_length=10, choices=WINDOWS)
+    period_start = models.DateField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="window_scores")
+    points = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['window', 'period_start', 'user'], name='window_score_user_unique'),
+        ]
+        indexes = [
+            # Serves the window leaderboard ordering, keyset pagination and rank counts
+            models.Index(fields=['window', 'period_start', '-points', 'user'], name='window_score_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.window} {self.period_start}: user {self.user_id} {self.points} points"
+
+class WindowArchive(models.Model):
+    """
+    Final standings of a closed window period, the top WINDOW_ARCHIVE_SIZE
+    users with their rank. The name is copied so the standings survive the
+    user being deleted.
+    """
+    window = models.CharField(max_length=10, choices=WindowScore.WINDOWS)
+    period_start = models.DateField()
+    rank = models.IntegerField()
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="window_archives")
+    name = models.CharField(max_length=100)
+    points = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['window', 'period_start', 'rank'], name='window_archive_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.window} {self.period_start} #{self.rank}: {self.name} {self.points} points"
+
+class ScoreEvent(models.Model):
+    """
+    Append-only log of score changes, one row per user per applied change.
+    Rows older than SCORE_EVENT_RETENTION_HOURS are folded into the user's
+    ScoreSnapshot. The rows outlive a deleted user, hence no FK constraint.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, related_name="score_events",
+    )
+    change = models.IntegerField()
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Serves a user's history and the per-user sums of the event tail
+            models.Index(fields=['user', 'id'], name='score_event_user_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"user {self.user_id} {self.change:+d} at {self.created_at}"
+
+class ScoreSnapshot(models.Model):
+    """
+    A user's points summed over the compacted part of the score event log,
+    up to and including event `last_event_id`. Snapshot plus the remaining
+    events of the user give the user's points.
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, primary_key=True, related_name="score_snapshot",
+    )
+    points = models.IntegerField(default=0)
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"user {self.user_id}: {self.points} points up to event {self.last_event_id}"
+
+class Leaderboard(models.Model):
+    """
+    An independent board (a game or a tenant) with its own scores, ranks
+    and winners. Users play on any number of boards.
+    """
+    slug = models.SlugField(max_length=50, unique=True)
+    name = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Touched by every winner selection, which serializes them per board
+    winner_checked_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.name
+
+class BoardScore(models.Model):
+    """
+    A user's points on one board. Created by the user's first score change
+    on the board.
+    """
+    board = models.ForeignKey(Leaderboard, on_delete=models.CASCADE, related_name="scores")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="board_scores")
+    points = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'user'], name='board_score_user_unique'),
+        ]
+        indexes = [
+            # Serves each board's ordering, keyset pagination, top-N and rank
+            # counts without touching the other boards' rows
+            models.Index(fields=['board', '-points', 'user'], name='board_score_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.board_id}: user {self.user_id} {self.points} points"
+
+class BoardWinner(models.Model):
+    """
+    A winner declared on one board, with the same snapshot as Winner.
+    """
+    board = models.ForeignKey(Leaderboard, on_delete=models.CASCADE, related_name="winners")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="board_wins")
+    points_at_win = models.IntegerField()
+    timestamp = models.DateTimeField(auto_now_add=True)
+    user_name = models.CharField(max_length=100, blank=True, default='')
+    runner_up_points = models.IntegerField(null=True, blank=True)
+    players = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Serves a board's winners history, newest first
+            models.Index(fields=['board', '-timestamp', 'id'], name='board_winner_timestamp_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.board_id}: {self.user_name} - {self.points_at_win} points at {self.timestamp}"
@@ -0,0 +1,294 @@
+import base64
+import binascii
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on the view's full ordering, e.g. (points, id).
+
+    Each page is fetched with a WHERE on the last row seen instead of an
+    OFFSET, and no COUNT(*) is issued, so page 5000 costs the same as page 1
+    and pages do not shift while scores change. The view declares its order
+    with `keyset_ordering`; its last field must be unique.
+
+    Passing `?page=` (or setting LEADERBOARD_PAGINATION = 'page') switches
+    back to the legacy page-number pagination with a `count`.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    legacy_class = PageNumberPagination
+    invalid_cursor_message = 'Invalid cursor'
+
+    def _use_legacy(self, request):
+        return (
+            settings.LEADERBOARD_PAGINATION == 'page'
+            or self.legacy_class.page_query_param in request.query_params
+        )
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value:
+            try:
+                size = int(value)
+            except ValueError:
+                size = 0
+            if size > 0:
+                return min(size, self.max_page_size)
+        return self.page_size
+
+    @staticmethod
+    def get_ordering(view):
+        return tuple(view.keyset_ordering)
+
+    @staticmethod
+    def encode_position(position, reverse=False):
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position, reverse = payload['p'], bool(payload['r'])
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if (not isinstance(position, list) or len(position) != len(self.ordering)
+                or not all(isinstance(value, (str, int, float)) for value in position)):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    @staticmethod
+    def _value(obj, field):
+        return obj[field] if isinstance(obj, dict) else getattr(obj, field)
+
+    def _position(self, obj):
+        position = []
+        for field in self.ordering:
+            value = self._value(obj, field.lstrip('-'))
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return position
+
+    def _seek(self, queryset, position, reverse):
+        """
+        Filter to the rows after `position`. For (-points, id) that is
+        points <= p AND (points < p OR (points = p AND id > i)); the leading
+        inclusive range lets the database start an index range scan at the
+        cursor instead of walking the index from the top.
+        """
+        model = queryset.model
+        condition = Q()
+        equal = Q()
+        leading = None
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            value = model._meta.get_field(name).to_python(value)
+            descending = field.startswith('-') != reverse
+            if leading is None:
+                leading = Q(**{f'{name}__lte' if descending else f'{name}__gte': value})
+            condition |= equal & Q(**{f'{name}__lt' if descending else f'{name}__gt': value})
+            equal &= Q(**{name: value})
+        return queryset.filter(leading & condition)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.legacy = None
+        if self._use_legacy(request):
+            self.legacy = self.legacy_class()
+            return self.legacy.paginate_queryset(queryset, request, view)
+        return self._page(list(self._page_queryset(queryset, request, view)))
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        Page through several querysets as one, in the view's ordering, where
+        every row of a queryset sorts before every row of the next one (the
+        winners table, then its archive). A later queryset is only queried
+        when the page runs past the earlier ones.
+        """
+        self.request = request
+        self.legacy = None
+        if self._use_legacy(request):
+            self.legacy = self.legacy_class()
+            return self.legacy.paginate_queryset(ChainedQuerysets(querysets), request, view)
+        querysets = list(querysets)
+        # Only builds the query, which reads the cursor's direction
+        first = self._page_queryset(querysets[0], request, view)
+        if self.reverse:
+            # Walking backwards the last queryset comes first
+            querysets.reverse()
+            first = self._page_queryset(querysets[0], request, view)
+        rows = list(first)
+        for queryset in querysets[1:]:
+            if len(rows) > self.page_size:
+                break
+            rows += self._page_queryset(queryset, request, view)[:self.page_size + 1 - len(rows)]
+        return self._page(rows)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset() for async views, fetching the page with the
+        async ORM. The legacy page-number path runs in a thread.
+        """
+        self.request = request
+        self.legacy = None
+        if self._use_legacy(request):
+            self.legacy = self.legacy_class()
+            return await sync_to_async(self.legacy.paginate_queryset)(queryset, request, view)
+        return self._page([row async for row in self._page_queryset(queryset, request, view)])
+
+    def _page_queryset(self, queryset, request, view):
+        """
+        Return the unevaluated query for the page plus one row, which tells
+        whether there is another page.
+        """
+        self.ordering = self.get_ordering(view)
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        self.position, self.reverse = cursor if cursor else (None, False)
+
+        order = self.ordering
+        if self.reverse:
+            order = [field[1:] if field.startswith('-') else f'-{field}' for field in order]
+        if self.position is not None:
+            try:
+                queryset = self._seek(queryset, self.position, self.reverse)
+            except (ValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+        return queryset.order_by(*order)[:self.page_size + 1]
+
+    def _page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            has_next, has_previous = self.position is not None, has_more
+        else:
+            has_next, has_previous = has_more, self.position is not None
+
+        self.next_position = self._position(rows[-1]) if has_next and rows else None
+        self.previous_position = self._position(rows[0]) if has_previous and rows else None
+        return rows
+
+    def _link(self, position, reverse):
+        if position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_position(position, reverse))
+
+    def get_next_link(self):
+        return self._link(self.next_position, False)
+
+    def get_previous_link(self):
+        return self._link(self.previous_position, True)
+
+    def get_paginated_response(self, data):
+        if self.legacy is not None:
+            return self.legacy.get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class RankPagination(KeysetPagination):
+    """
+    KeysetPagination's contract for a page read from a ranking store: the
+    same `cursor` parameter and response, `?page_size=` and the `?page=`
+    switch. The store reads any rank offset directly, so the cursor holds
+    the offset of the page instead of a position, and a page may repeat or
+    skip users whose rank changed since the previous one. Cursors of the
+    keyset pagination are rejected as invalid, like any other bad cursor.
+    """
+
+    @staticmethod
+    def encode_position(position, reverse=False):
+        payload = json.dumps({'o': position}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            offset = json.loads(base64.urlsafe_b64decode(encoded.encode()))['o']
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if type(offset) is not int or offset < 0:
+            raise NotFound(self.invalid_cursor_message)
+        return offset
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Page through `queryset`, any sliceable sequence in rank order.
+        """
+        self.request = request
+        self.legacy = None
+        if self._use_legacy(request):
+            self.legacy = self.legacy_class()
+            return self.legacy.paginate_queryset(queryset, request, view)
+        self.page_size = self.get_page_size(request)
+        offset = self.decode_cursor(request) or 0
+        rows = list(queryset[offset:offset + self.page_size + 1])
+        self.next_position = offset + self.page_size if len(rows) > self.page_size else None
+        self.previous_position = max(offset - self.page_size, 0) if offset else None
+        return rows[:self.page_size]
+
+
+class ChainedQuerysets:
+    """
+    Sliceable concatenation of ordered querysets for the legacy page-number
+    pagination of KeysetPagination.paginate_querysets().
+    """
+
+    def __init__(self, querysets):
+        self.querysets = list(querysets)
+        self._counts = None
+
+    def counts(self):
+        if self._counts is None:
+            self._counts = [queryset.count() for queryset in self.querysets]
+        return self._counts
+
+    def count(self):
+        return sum(self.counts())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = index.stop if index.stop is not None else self.count()
+        rows = []
+        for queryset, count in zip(self.querysets, self.counts()):
+            if start < count and stop > 0:
+                rows += queryset[max(start, 0):min(stop, count)]
+            start -= count
+            stop -= count
+        return rows
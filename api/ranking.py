@@ -0,0 +1,298 @@
+import random
+import threading
+from . import redis_store
+from .models import User
+
+_MAX_LEVEL = 32
+
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, level):
+        self.key = key
+        self.next = [None] * level
+        # width[i] is the number of positions between this node and next[i]
+        self.width = [1] * level
+
+
+class SortedKeyList:
+    """
+    Indexable skip list of unique, comparable keys.
+
+    Insert, remove, position lookup and access by position all run in
+    O(log n) expected time, which is what lets the leaderboard answer rank
+    queries without sorting or scanning the user table.
+    """
+
+    def __init__(self):
+        self._head = _Node(None, _MAX_LEVEL)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def _random_level():
+        level = 1
+        while level < _MAX_LEVEL and random.random() < 0.5:
+            level += 1
+        return level
+
+    def insert(self, key):
+        update = [None] * _MAX_LEVEL
+        steps = [0] * _MAX_LEVEL
+        node = self._head
+        position = 0
+        for i in reversed(range(_MAX_LEVEL)):
+            while node.next[i] is not None and node.next[i].key < key:
+                position += node.width[i]
+                node = node.next[i]
+            update[i] = node
+            steps[i] = position
+
+        level = self._random_level()
+        new = _Node(key, level)
+        for i in range(_MAX_LEVEL):
+            prev = update[i]
+            if i < level:
+                new.next[i] = prev.next[i]
+                new.width[i] = prev.width[i] - (position - steps[i])
+                prev.next[i] = new
+                prev.width[i] = position + 1 - steps[i]
+            else:
+                prev.width[i] += 1
+        self._size += 1
+
+    def remove(self, key):
+        update = [None] * _MAX_LEVEL
+        node = self._head
+        for i in reversed(range(_MAX_LEVEL)):
+            while node.next[i] is not None and node.next[i].key < key:
+                node = node.next[i]
+            update[i] = node
+
+        target = node.next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        for i in range(_MAX_LEVEL):
+            prev = update[i]
+            if prev.next[i] is target:
+                prev.width[i] += target.width[i] - 1
+                prev.next[i] = target.next[i]
+            else:
+                prev.width[i] -= 1
+        self._size -= 1
+
+    def index(self, key):
+        """
+        Return the 0-based position of `key`, raising KeyError if it is missing.
+        """
+        node = self._head
+        position = 0
+        for i in reversed(range(_MAX_LEVEL)):
+            while node.next[i] is not None and node.next[i].key <= key:
+                position += node.width[i]
+                node = node.next[i]
+        if node is self._head or node.key != key:
+            raise KeyError(key)
+        return position - 1
+
+    def _node_at(self, index):
+        node = self._head
+        remaining = index + 1
+        for i in reversed(range(_MAX_LEVEL)):
+            while node.next[i] is not None and node.width[i] <= remaining:
+                remaining -= node.width[i]
+                node = node.next[i]
+        return node
+
+    def __getitem__(self, index):
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        return self._node_at(index).key
+
+    def slice(self, start, stop):
+        """
+        Return the keys at positions [start, stop) in O(log n + k).
+        """
+        start = max(start, 0)
+        stop = min(stop, self._size)
+        if start >= stop:
+            return []
+        node = self._node_at(start)
+        keys = []
+        for _ in range(stop - start):
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+    def __iter__(self):
+        node = self._head.next[0]
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+
+class LeaderboardIndex:
+    """
+    Process-local ranking of users by (points desc, id asc).
+
+    The index is built lazily from the database on first use and then kept
+    in sync by the score update path and the User save/delete signals.
+    Each gunicorn worker holds its own copy, so writes made by other
+    workers are only picked up on rebuild(); configure LEADERBOARD_REDIS_URL
+    to share one ranking between workers instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys = None
+        self._points = {}
+
+    @staticmethod
+    def _key(user_id, points):
+        return (-points, user_id)
+
+    @staticmethod
+    def _entry(key):
+        return key[1], -key[0]
+
+    def _ensure_built(self):
+        if self._keys is None:
+            self.rebuild()
+
+    def rebuild(self):
+        """
+        Rebuild the index from the User table.
+        """
+        keys = SortedKeyList()
+        points = {}
+        for user_id, user_points in User.objects.values_list('id', 'points').iterator(chunk_size=2000):
+            keys.insert(self._key(user_id, user_points))
+            points[user_id] = user_points
+        with self._lock:
+            self._keys = keys
+            self._points = points
+        return len(keys)
+
+    def reset(self):
+        """
+        Drop the index; it is rebuilt from the database on next use.
+        """
+        with self._lock:
+            self._keys = None
+            self._points = {}
+
+    def update(self, user_id, points):
+        with self._lock:
+            if self._keys is None:
+                # Not built yet, the next build reads the committed value
+                return
+            old_points = self._points.get(user_id)
+            if old_points == points:
+                return
+            if old_points is not None:
+                self._keys.remove(self._key(user_id, old_points))
+            self._keys.insert(self._key(user_id, points))
+            self._points[user_id] = points
+
+    def increment(self, user_id, change, points):
+        self.update(user_id, points)
+
+    def increment_many(self, changes):
+        with self._lock:
+            for user_id, change, points in changes:
+                self.update(user_id, points)
+
+    def discard(self, user_id):
+        with self._lock:
+            if self._keys is None:
+                return
+            old_points = self._points.pop(user_id, None)
+            if old_points is not None:
+                self._keys.remove(self._key(user_id, old_points))
+
+    def count(self):
+        with self._lock:
+            self._ensure_built()
+            return len(self._keys)
+
+    def rank(self, user_id):
+        """
+        Return the 1-based rank of a user, or None if the user is not ranked.
+        """
+        with self._lock:
+            self._ensure_built()
+            points = self._points.get(user_id)
+            if points is None:
+                return None
+            return self._keys.index(self._key(user_id, points)) + 1
+
+    def ranks(self, user_ids):
+        with self._lock:
+            return [self.rank(user_id) for user_id in user_ids]
+
+    def top(self, n):
+        """
+        Return the first `n` entries as (user_id, points) tuples.
+        """
+        with self._lock:
+            self._ensure_built()
+            return [self._entry(key) for key in self._keys.slice(0, n)]
+
+    def page(self, offset, limit):
+        with self._lock:
+            self._ensure_built()
+            return [self._entry(key) for key in self._keys.slice(offset, offset + limit)]
+
+    def around(self, user_id, radius):
+        """
+        Return (first_rank, entries) for the users ranked within `radius`
+        places of `user_id`, or None if the user is not ranked.
+        """
+        with self._lock:
+            self._ensure_built()
+            points = self._points.get(user_id)
+            if points is None:
+                return None
+            position = self._keys.index(self._key(user_id, points))
+            start = max(position - radius, 0)
+            keys = self._keys.slice(start, position + radius + 1)
+            return start + 1, [self._entry(key) for key in keys]
+
+    def verify(self, limit=20):
+        """
+        Compare the index against the User table ordering.
+        Returns a list of human readable mismatches, empty when consistent.
+        """
+        with self._lock:
+            self._ensure_built()
+            indexed = iter(self._keys)
+            mismatches = []
+            rows = User.objects.order_by('-points', 'id').values_list('id', 'points')
+            rank = 0
+            for rank, (user_id, points) in enumerate(rows.iterator(chunk_size=2000), start=1):
+                key = next(indexed, None)
+                expected = self._key(user_id, points)
+                if key != expected:
+                    mismatches.append(f'rank {rank}: index has {key and self._entry(key)}, database has {(user_id, points)}')
+                    if len(mismatches) >= limit:
+                        return mismatches
+            if len(self._keys) != rank:
+                mismatches.append(f'index holds {len(self._keys)} users, database holds {rank}')
+            return mismatches
+
+
+leaderboard_index = LeaderboardIndex()
+
+
+def get_rank_store():
+    """
+    Return the active ranking store: the shared Redis sorted set when
+    LEADERBOARD_REDIS_URL is configured, otherwise the process-local index.
+    """
+    client = redis_store.get_redis()
+    if client is not None:
+        return redis_store.RedisLeaderboard(client)
+    return leaderboard_index
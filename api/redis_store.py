@@ -0,0 +1,335 @@
+import logging
+import uuid
+import redis
+from django.conf import settings
+from .models import ScoreFlush, User
+
+logger = logging.getLogger(__name__)
+
+_clients = {}
+
+# Members are the complement of the user id, zero padded, so that ZREVRANGE
+# (which orders equal scores by member, descending) breaks ties by id ascending
+# exactly like ORDER BY points DESC, id ASC
+_MAX_ID = 2 ** 63 - 1
+_MEMBER_WIDTH = len(str(_MAX_ID))
+
+
+def get_redis():
+    """
+    Return a shared Redis client for LEADERBOARD_REDIS_URL, or None if unset.
+    """
+    url = settings.LEADERBOARD_REDIS_URL
+    if not url:
+        return None
+    client = _clients.get(url)
+    if client is None:
+        client = _clients[url] = redis.Redis.from_url(url, decode_responses=True)
+    return client
+
+
+def _member(user_id):
+    return str(_MAX_ID - user_id).zfill(_MEMBER_WIDTH)
+
+
+def _user_id(member):
+    return _MAX_ID - int(member)
+
+
+class RedisLeaderboard:
+    """
+    Leaderboard ranking stored in a Redis sorted set, shared by every worker.
+
+    Implements the same interface as ranking.LeaderboardIndex. Like the
+    in-memory index, the set is built from the database the first time it
+    is read and writes are skipped while it does not exist. Writes are best
+    effort: a Redis failure is logged and left for the reconcile task to
+    repair, so it never fails a score update that already committed.
+    """
+
+    def __init__(self, client, key=None):
+        self.client = client
+        self.key = key or settings.LEADERBOARD_REDIS_KEY
+
+    def _ensure_built(self):
+        if not self.client.exists(self.key):
+            self.rebuild()
+
+    def _write(self, build):
+        try:
+            if not self.client.exists(self.key):
+                # Not built yet, the next read builds it from committed data
+                return
+            pipeline = self.client.pipeline()
+            build(pipeline)
+            pipeline.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Leaderboard sorted set write failed: {str(e)}")
+
+    def update(self, user_id, points):
+        self._write(lambda pipeline: pipeline.zadd(self.key, {_member(user_id): points}))
+
+    def increment(self, user_id, change, points):
+        """
+        Apply a score change. ZINCRBY semantics keep concurrent changes from
+        different workers commutative; `points` seeds users not yet in the set.
+        """
+        self.increment_many([(user_id, change, points)])
+
+    def increment_many(self, changes):
+        """
+        Apply (user_id, change, points) score changes in one pipeline.
+        """
+        def build(pipeline):
+            for user_id, change, points in changes:
+                member = _member(user_id)
+                pipeline.zadd(self.key, {member: change}, xx=True, incr=True)
+                pipeline.zadd(self.key, {member: points}, nx=True)
+        self._write(build)
+
+    def discard(self, user_id):
+        self._write(lambda pipeline: pipeline.zrem(self.key, _member(user_id)))
+
+    def rebuild(self):
+        """
+        Rebuild the sorted set from the User table and swap it in atomically.
+        Each rebuild fills its own staging key, so workers rebuilding at the
+        same time (the first reads after a flush) each swap in a complete set.
+        """
+        staging = f'{self.key}:rebuild:{uuid.uuid4().hex}'
+        count = 0
+        batch = {}
+        try:
+            for user_id, points in User.objects.values_list('id', 'points').iterator(chunk_size=2000):
+                batch[_member(user_id)] = points
+                if len(batch) >= 2000:
+                    self.client.zadd(staging, batch)
+                    count += len(batch)
+                    batch = {}
+            if batch:
+                self.client.zadd(staging, batch)
+                count += len(batch)
+            # Changes still waiting in the write-behind buffer are part of the score
+            pending = ScoreBuffer(self.client).pending()
+            if count and pending:
+                pipeline = self.client.pipeline()
+                for user_id, change in pending.items():
+                    pipeline.zadd(staging, {_member(user_id): change}, xx=True, incr=True)
+                pipeline.execute()
+            if count:
+                self.client.rename(staging, self.key)
+            else:
+                self.client.delete(self.key)
+        finally:
+            # Left behind only if the rebuild failed part way
+            self.client.delete(staging)
+        return count
+
+    def reset(self):
+        self.client.delete(self.key)
+
+    def count(self):
+        self._ensure_built()
+        return self.client.zcard(self.key)
+
+    def rank(self, user_id):
+        self._ensure_built()
+        rank = self.client.zrevrank(self.key, _member(user_id))
+        return None if rank is None else rank + 1
+
+    def ranks(self, user_ids):
+        """
+        Return the 1-based ranks of `user_ids` (None if unranked) in one pipeline.
+        """
+        self._ensure_built()
+        pipeline = self.client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipeline.zrevrank(self.key, _member(user_id))
+        return [None if rank is None else rank + 1 for rank in pipeline.execute()]
+
+    def _entries(self, start, stop):
+        if stop <= start:
+            return []
+        self._ensure_built()
+        rows = self.client.zrevrange(self.key, start, stop - 1, withscores=True)
+        return [(_user_id(member), int(score)) for member, score in rows]
+
+    def top(self, n):
+        return self._entries(0, n)
+
+    def page(self, offset, limit):
+        return self._entries(offset, offset + limit)
+
+    def around(self, user_id, radius):
+        rank = self.rank(user_id)
+        if rank is None:
+            return None
+        start = max(rank - 1 - radius, 0)
+        return start + 1, self._entries(start, rank + radius)
+
+    def verify(self, limit=20):
+        """
+        Compare the sorted set against the User table ordering.
+        Returns a list of human readable mismatches, empty when consistent.
+        """
+        mismatches = []
+        rows = User.objects.order_by('-points', 'id').values_list('id', 'points')
+        chunk = []
+        offset = 0
+        for row in rows.iterator(chunk_size=2000):
+            chunk.append(row)
+            if len(chunk) == 2000:
+                mismatches += self._compare(offset, chunk)
+                offset += len(chunk)
+                chunk = []
+            if len(mismatches) >= limit:
+                return mismatches[:limit]
+        mismatches += self._compare(offset, chunk)
+        offset += len(chunk)
+        total = self.count()
+        if total != offset:
+            mismatches.append(f'sorted set holds {total} users, database holds {offset}')
+        return mismatches[:limit]
+
+    def _compare(self, offset, chunk):
+        mismatches = []
+        for rank, (stored, expected) in enumerate(zip(self.page(offset, len(chunk)), chunk), start=offset + 1):
+            if stored != expected:
+                mismatches.append(f'rank {rank}: sorted set has {stored}, database has {expected}')
+        return mismatches
+
+    def reconcile(self, batch_size=2000):
+        """
+        Repair drift between the sorted set and the User table without a
+        full rebuild: fix wrong or missing scores and drop deleted users.
+        Buffered write-behind changes count towards the expected score.
+        """
+        repaired = 0
+        checked = 0
+        pending = ScoreBuffer(self.client).pending()
+        rows = User.objects.values_list('id', 'points').iterator(chunk_size=batch_size)
+        chunk = []
+        for user_id, points in rows:
+            chunk.append((user_id, points + pending.get(user_id, 0)))
+            if len(chunk) == batch_size:
+                repaired += self._repair(chunk)
+                checked += len(chunk)
+                chunk = []
+        repaired += self._repair(chunk)
+        checked += len(chunk)
+
+        removed = 0
+        cursor = 0
+        while True:
+            cursor, members = self.client.zscan(self.key, cursor, count=batch_size)
+            if members:
+                ids = {_user_id(member): member for member, _ in members}
+                existing = set(User.objects.filter(id__in=list(ids)).values_list('id', flat=True))
+                stale = [member for user_id, member in ids.items() if user_id not in existing]
+                if stale:
+                    removed += self.client.zrem(self.key, *stale)
+            if cursor == 0:
+                break
+        return {'checked': checked, 'repaired': repaired, 'removed': removed}
+
+    def _repair(self, chunk):
+        if not chunk:
+            return 0
+        members = [_member(user_id) for user_id, _ in chunk]
+        scores = self.client.zmscore(self.key, members)
+        fixes = {
+            member: points
+            for member, (_, points), score in zip(members, chunk, scores)
+            if score is None or int(score) != points
+        }
+        if fixes:
+            self.client.zadd(self.key, fixes)
+        return len(fixes)
+
+
+class ScoreBuffer:
+    """
+    Write-behind buffer of score changes not yet applied to the database.
+
+    Changes are summed per user in a Redis hash with HINCRBY. A flush first
+    renames the hash to a claim key recorded in a claims set, so changes
+    buffered while it runs land in a fresh hash, and a claim left behind by
+    a crashed flush is found and retried by the next one. Enable Redis AOF
+    persistence for the buffer to survive a Redis restart.
+    """
+
+    def __init__(self, client, key=None):
+        self.client = client
+        self.key = key or settings.SCORE_BUFFER_KEY
+        self.claims_key = f'{self.key}:claims'
+
+    def _claim_key(self, token):
+        return f'{self.key}:claim:{token}'
+
+    def add(self, user_id, change):
+        self.client.hincrby(self.key, user_id, change)
+
+    def claim(self):
+        """
+        Move the buffered changes to a new claim, returning its token, or
+        None when nothing is buffered.
+        """
+        if not self.client.exists(self.key):
+            return None
+        token = uuid.uuid4().hex
+        pipeline = self.client.pipeline()
+        pipeline.sadd(self.claims_key, token)
+        pipeline.rename(self.key, self._claim_key(token))
+        try:
+            pipeline.execute()
+        except redis.ResponseError:
+            # Another flush claimed the hash first
+            self.client.srem(self.claims_key, token)
+            return None
+        return token
+
+    def claims(self):
+        return sorted(self.client.smembers(self.claims_key))
+
+    def changes(self, token):
+        return {int(user_id): int(change) for user_id, change in self.client.hgetall(self._claim_key(token)).items()}
+
+    def release(self, token):
+        pipeline = self.client.pipeline()
+        pipeline.delete(self._claim_key(token))
+        pipeline.srem(self.claims_key, token)
+        pipeline.execute()
+
+    def unapplied_claims(self):
+        """
+        Return the claims whose changes are not in the database yet. A claim
+        stays in Redis until released after its flush committed (or after a
+        crash, until the next flush), but its ScoreFlush row is committed
+        with the changes.
+        """
+        tokens = self.claims()
+        if not tokens:
+            return tokens
+        applied = set(ScoreFlush.objects.filter(token__in=tokens).values_list('token', flat=True))
+        return [token for token in tokens if token not in applied]
+
+    def pending(self, user_ids=None):
+        """
+        Return {user_id: change} summed over the buffer and unapplied claims,
+        for `user_ids` or for every buffered user.
+        """
+        keys = [self.key] + [self._claim_key(token) for token in self.unapplied_claims()]
+        totals = {}
+        if user_ids is None:
+            for key in keys:
+                for user_id, change in self.client.hgetall(key).items():
+                    totals[int(user_id)] = totals.get(int(user_id), 0) + int(change)
+        else:
+            user_ids = list(user_ids)
+            if not user_ids:
+                return totals
+            for key in keys:
+                for user_id, change in zip(user_ids, self.client.hmget(key, user_ids)):
+                    if change is not None:
+                        totals[user_id] = totals.get(user_id, 0) + int(change)
+        return {user_id: change for user_id, change in totals.items() if change}
@@ -0,0 +1,165 @@
+import hashlib
+import time
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_KEY = 'leaderboard:version'
+STATS_KEY = 'leaderboard:stats'
+STATS = ('hits', 'misses', 'not_modified', 'age_ms')
+NOT_MODIFIED = object()
+
+
+def get_version():
+    """
+    Return the current leaderboard version. Every cached response is keyed
+    by it, so bumping it invalidates them all at once.
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a counter lost to eviction or a restart
+        # never comes back at a version that still has cached responses
+        cache.add(VERSION_KEY, time.time_ns() // 1000, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _bump():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        get_version()
+
+
+def bump_version():
+    """
+    Invalidate the cached leaderboard responses after a write. The version
+    is bumped now and again on commit, so a response cached from
+    pre-commit data in between is dropped as well.
+    """
+    if not settings.LEADERBOARD_CACHE_ENABLED:
+        return
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def _record(name, amount=1):
+    key = f'{STATS_KEY}:{name}'
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        if not cache.add(key, amount, timeout=None):
+            cache.incr(key, amount)
+
+
+def get_stats():
+    """
+    Return hit/miss counters, the hit ratio and the mean age of the
+    responses served from the cache (how stale a hit is on average).
+    """
+    counters = cache.get_many([f'{STATS_KEY}:{name}' for name in STATS])
+    hits, misses, not_modified, age_ms = (counters.get(f'{STATS_KEY}:{name}', 0) for name in STATS)
+    served = hits + not_modified
+    requests = served + misses
+    return {
+        'version': get_version(),
+        'hits': hits,
+        'misses': misses,
+        'not_modified': not_modified,
+        'hit_ratio': round(served / requests, 4) if requests else None,
+        'mean_age_seconds': round(age_ms / hits / 1000, 3) if hits else None,
+    }
+
+
+def reset_stats():
+    cache.delete_many([f'{STATS_KEY}:{name}' for name in STATS])
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get('If-None-Match', '')
+    return any(tag.strip() in (etag, f'W/{etag}', '*') for tag in header.split(','))
+
+
+def _response_key(version, request, renderer_format):
+    url = request.build_absolute_uri()
+    digest = hashlib.sha1(f'{renderer_format}:{url}'.encode()).hexdigest()
+    return f'leaderboard:response:{version}:{digest}'
+
+
+def _lookup(request, renderer_format):
+    """
+    Return (etag, key, hit) for a request, where hit is NOT_MODIFIED when
+    the client's copy is current, the cached data, or None on a miss.
+    """
+    version = get_version()
+    etag = f'"{version}"'
+    if _etag_matches(request, etag):
+        _record('not_modified')
+        return etag, None, NOT_MODIFIED
+    key = _response_key(version, request, renderer_format)
+    cached = cache.get(key)
+    if cached is None:
+        return etag, key, None
+    data, stored_at = cached
+    _record('hits')
+    _record('age_ms', int((time.time() - stored_at) * 1000))
+    return etag, key, data
+
+
+def _store(key, data):
+    _record('misses')
+    cache.set(key, (data, time.time()), settings.LEADERBOARD_CACHE_TIMEOUT)
+
+
+def cache_response(method):
+    """
+    Serve a read-only view method from the cache.
+
+    The response data is stored per URL and renderer under the current
+    leaderboard version, and sent with the version as its ETag so clients
+    revalidating with If-None-Match get a 304 while nothing has changed.
+    """
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if not settings.LEADERBOARD_CACHE_ENABLED:
+            return method(self, request, *args, **kwargs)
+        etag, key, hit = _lookup(request, request.accepted_renderer.format)
+        if hit is NOT_MODIFIED:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        if hit is not None:
+            response = Response(hit)
+        else:
+            response = method(self, request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            _store(key, response.data)
+        response['ETag'] = etag
+        return response
+    return wrapper
+
+
+def acache_response(view):
+    """
+    cache_response() for the async JSON views in api/async_views.py.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if not settings.LEADERBOARD_CACHE_ENABLED:
+            return await view(request, *args, **kwargs)
+        etag, key, hit = await sync_to_async(_lookup)(request, 'json')
+        if hit is NOT_MODIFIED:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        if hit is not None:
+            response = Response(hit)
+        else:
+            response = await view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            await sync_to_async(_store)(key, response.data)
+        response['ETag'] = etag
+        return response
+    return wrapper
@@ -0,0 +1,159 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, Max, Min, OuterRef, Sum
+from django.utils import timezone
+from .models import ScoreEvent, ScoreSnapshot, User
+
+
+def record_score_events(deltas):
+    """
+    Append {user_id: change} to the score event log with one INSERT. Call it
+    in the transaction that applies the changes.
+    """
+    now = timezone.now()
+    ScoreEvent.objects.bulk_create(
+        [ScoreEvent(user_id=user_id, change=change, created_at=now) for user_id, change in deltas.items() if change],
+        batch_size=1000,
+    )
+
+
+def snapshot_unlogged_users():
+    """
+    Give every user with no snapshot and no events a snapshot of their
+    current points, so users bulk inserted without signals (populate_db)
+    replay to the points they were created with. Returns the number added.
+    """
+    snapshots = ScoreSnapshot.objects.filter(user_id=OuterRef('pk'))
+    events = ScoreEvent.objects.filter(user_id=OuterRef('pk'))
+    users = User.objects.filter(~Exists(snapshots), ~Exists(events)).values_list('id', 'points')
+    added = 0
+    batch = []
+    for user_id, points in users.iterator(chunk_size=2000):
+        batch.append(ScoreSnapshot(user_id=user_id, points=points))
+        if len(batch) == 1000:
+            added += len(ScoreSnapshot.objects.bulk_create(batch, ignore_conflicts=True))
+            batch = []
+    added += len(ScoreSnapshot.objects.bulk_create(batch, ignore_conflicts=True))
+    return added
+
+
+def _supports_delete_returning():
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35, 0)
+    return False
+
+
+def _take_events(first_id, last_id):
+    """
+    Delete the events with ids in [first_id, last_id] and return them as
+    (id, user_id, change) rows. A concurrent compaction of the same range
+    gets no rows, so no event is ever folded into a snapshot twice.
+    """
+    if _supports_delete_returning():
+        table = connection.ops.quote_name(ScoreEvent._meta.db_table)
+        pk, user, change = (connection.ops.quote_name(name) for name in ('id', 'user_id', 'change'))
+        sql = f'DELETE FROM {table} WHERE {pk} BETWEEN %s AND %s RETURNING {pk}, {user}, {change}'
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [first_id, last_id])
+            return cursor.fetchall()
+
+    events = ScoreEvent.objects.select_for_update().filter(id__gte=first_id, id__lte=last_id)
+    rows = list(events.values_list('id', 'user_id', 'change'))
+    ScoreEvent.objects.filter(id__in=[row[0] for row in rows]).delete()
+    return rows
+
+
+def compact_score_events(before=None, batch_size=None):
+    """
+    Fold the events logged before `before` (default: older than
+    SCORE_EVENT_RETENTION_HOURS) into the users' snapshots and delete them.
+    Works through the log in id ranges of `batch_size`, one transaction
+    each. Returns {'events': folded, 'users': snapshots updated}.
+    """
+    before = before or timezone.now() - timedelta(hours=settings.SCORE_EVENT_RETENTION_HOURS)
+    batch_size = batch_size or settings.SCORE_EVENT_COMPACT_BATCH_SIZE
+    bounds = ScoreEvent.objects.filter(created_at__lt=before).aggregate(first=Min('id'), last=Max('id'))
+    events, users = 0, set()
+    if bounds['last'] is None:
+        return {'events': events, 'users': 0}
+
+    first_id = bounds['first']
+    while first_id <= bounds['last']:
+        last_id = min(first_id + batch_size - 1, bounds['last'])
+        with transaction.atomic():
+            totals = {}
+            for event_id, user_id, change in _take_events(first_id, last_id):
+                points, last_event_id = totals.get(user_id, (0, 0))
+                totals[user_id] = (points + change, max(last_event_id, event_id))
+                events += 1
+            if totals:
+                now = timezone.now()
+                snapshots = ScoreSnapshot.objects.select_for_update().in_bulk(list(totals))
+                created, updated = [], []
+                for user_id, (points, last_event_id) in totals.items():
+                    snapshot = snapshots.get(user_id)
+                    if snapshot is None:
+                        created.append(ScoreSnapshot(user_id=user_id, points=points, last_event_id=last_event_id))
+                        continue
+                    snapshot.points += points
+                    snapshot.last_event_id = max(snapshot.last_event_id, last_event_id)
+                    snapshot.updated_at = now
+                    updated.append(snapshot)
+                ScoreSnapshot.objects.bulk_create(created, batch_size=1000)
+                ScoreSnapshot.objects.bulk_update(updated, ['points', 'last_event_id', 'updated_at'], batch_size=1000)
+                users.update(totals)
+        first_id = last_id + 1
+    return {'events': events, 'users': len(users)}
+
+
+def replay_scores(batch_size=2000, apply=True, on_mismatch=None):
+    """
+    Recompute every logged user's points as snapshot plus event tail and,
+    if `apply`, write back the ones that differ. Users are streamed in id
+    order `batch_size` at a time, each batch locked in its own transaction
+    so no score change slips in between the read and the write. Users with
+    no snapshot and no events are left as they are.
+
+    `on_mismatch(user_id, points, logged_points)` is called for each
+    difference. Returns {'users', 'mismatched', 'unlogged'} counts.
+    """
+    result = {'users': 0, 'mismatched': 0, 'unlogged': 0}
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                User.objects.select_for_update()
+                .filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', 'points')[:batch_size]
+            )
+            if not rows:
+                break
+            user_ids = [user_id for user_id, _ in rows]
+            snapshots = dict(ScoreSnapshot.objects.filter(user_id__in=user_ids).values_list('user_id', 'points'))
+            tails = dict(
+                ScoreEvent.objects.filter(user_id__in=user_ids)
+                .values('user_id')
+                .annotate(total=Sum('change'))
+                .order_by()
+                .values_list('user_id', 'total')
+            )
+            fixed = []
+            for user_id, points in rows:
+                if user_id not in snapshots and user_id not in tails:
+                    result['unlogged'] += 1
+                    continue
+                logged_points = snapshots.get(user_id, 0) + tails.get(user_id, 0)
+                if logged_points != points:
+                    result['mismatched'] += 1
+                    if on_mismatch is not None:
+                        on_mismatch(user_id, points, logged_points)
+                    fixed.append(User(id=user_id, points=logged_points))
+            if apply and fixed:
+                User.objects.bulk_update(fixed, ['points'], batch_size=1000)
+        result['users'] += len(rows)
+        last_id = user_ids[-1]
+    return result
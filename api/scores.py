@@ -0,0 +1,228 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from . import redis_store
+from .buckets import adjust_buckets, move_user
+from .events import publish_scores
+from .models import ScoreFlush, User
+from .ranking import get_rank_store
+from .response_cache import bump_version
+from .score_log import record_score_events
+from .windows import add_window_points
+
+USER_COLUMNS = ('id', 'name', 'age', 'address', 'points')
+
+
+def _supports_update_returning():
+    """
+    Return True if the active database can run UPDATE ... RETURNING.
+    PostgreSQL always can, SQLite only from 3.35 onwards.
+    """
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35, 0)
+    return False
+
+
+def apply_score_change(user_id, change):
+    """
+    Atomically add `change` to a user's points in a single statement.
+
+    The increment is done by the database (points = points + change), so
+    concurrent callers never lose updates and the other columns are never
+    rewritten. Returns the updated User, or None if no such user exists.
+    """
+    with transaction.atomic():
+        user = _update_points(user_id, change)
+        if user is not None:
+            move_user(user.points - change, user.points, user.age, user.age)
+            add_window_points({user.pk: change})
+            record_score_events({user.pk: change})
+    if user is not None:
+        user_id, points = user.pk, user.points
+        transaction.on_commit(lambda: get_rank_store().increment(user_id, change, points))
+        bump_version()
+        publish_scores({user_id: points})
+    return user
+
+
+def _update_points(user_id, change):
+    if _supports_update_returning():
+        table = connection.ops.quote_name(User._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(c) for c in USER_COLUMNS)
+        points = connection.ops.quote_name('points')
+        pk = connection.ops.quote_name('id')
+        sql = (
+            f'UPDATE {table} SET {points} = {points} + %s '
+            f'WHERE {pk} = %s RETURNING {columns}'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [change, user_id])
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return User.from_db(connection.alias, USER_COLUMNS, row)
+
+    # Fallback for backends without RETURNING: the F() update is still a
+    # single atomic statement, the read-back happens in the same transaction.
+    with transaction.atomic():
+        updated = User.objects.filter(pk=user_id).update(points=F('points') + change)
+        if not updated:
+            return None
+        return User.objects.get(pk=user_id)
+
+
+def coalesce_changes(items):
+    """
+    Sum (user_id, change) pairs into {user_id: total change}.
+    """
+    deltas = {}
+    for user_id, change in items:
+        deltas[user_id] = deltas.get(user_id, 0) + change
+    return deltas
+
+
+def apply_score_changes(deltas, update_rank_store=True):
+    """
+    Apply {user_id: change} with one UPDATE ... CASE statement per batch of
+    BULK_SCORE_BATCH_SIZE users, each batch in its own transaction together
+    with its score bucket, window score and score event log updates.
+    Returns {user_id: new points} for the users that exist.
+    """
+    results = {}
+    user_ids = sorted(deltas)
+    batch_size = settings.BULK_SCORE_BATCH_SIZE
+    for start in range(0, len(user_ids), batch_size):
+        batch = {user_id: deltas[user_id] for user_id in user_ids[start:start + batch_size]}
+        with transaction.atomic():
+            rows = _bulk_update_points(batch)
+            buckets = {}
+            for user_id, (points, age) in rows.items():
+                for bucket, count in ((points - batch[user_id], -1), (points, 1)):
+                    total_count, total_age = buckets.get(bucket, (0, 0))
+                    buckets[bucket] = (total_count + count, total_age + count * age)
+            adjust_buckets(buckets)
+            applied = {user_id: batch[user_id] for user_id in rows}
+            add_window_points(applied)
+            record_score_events(applied)
+        if update_rank_store:
+            changes = [(user_id, batch[user_id], points) for user_id, (points, _) in rows.items()]
+            transaction.on_commit(lambda changes=changes: get_rank_store().increment_many(changes))
+        results.update((user_id, points) for user_id, (points, _) in rows.items())
+    if results:
+        bump_version()
+        publish_scores(results)
+    return results
+
+
+def _bulk_update_points(deltas):
+    """
+    Add each user's change in a single statement, returning {user_id: (points, age)}.
+    """
+    user_ids = list(deltas)
+    if _supports_update_returning():
+        table = connection.ops.quote_name(User._meta.db_table)
+        points = connection.ops.quote_name('points')
+        age = connection.ops.quote_name('age')
+        pk = connection.ops.quote_name('id')
+        whens = ' '.join(['WHEN %s THEN %s'] * len(user_ids))
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        sql = (
+            f'UPDATE {table} SET {points} = {points} + CASE {pk} {whens} END '
+            f'WHERE {pk} IN ({placeholders}) RETURNING {pk}, {points}, {age}'
+        )
+        params = [value for user_id in user_ids for value in (user_id, deltas[user_id])] + user_ids
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return {user_id: (points, age) for user_id, points, age in cursor.fetchall()}
+
+    with transaction.atomic():
+        change = Case(
+            *[When(pk=user_id, then=Value(deltas[user_id])) for user_id in user_ids],
+            output_field=IntegerField(),
+        )
+        User.objects.filter(pk__in=user_ids).update(points=F('points') + change)
+        rows = User.objects.filter(pk__in=user_ids).values_list('id', 'points', 'age')
+        return {user_id: (points, age) for user_id, points, age in rows}
+
+
+def change_score(user_id, change):
+    """
+    Apply a score change, or buffer it in write-behind mode. Returns the
+    User with its (projected) points, or None if no such user exists.
+    """
+    if write_behind_enabled():
+        return buffer_score_change(user_id, change)
+    return apply_score_change(user_id, change)
+
+
+def write_behind_enabled():
+    return settings.SCORE_WRITE_BEHIND and redis_store.get_redis() is not None
+
+
+def buffer_score_change(user_id, change):
+    """
+    Add `change` to the write-behind buffer instead of the database and
+    return the User with its projected points, or None if no such user
+    exists. The rank store is updated at once so rankings include the change.
+    """
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return None
+    buffer = redis_store.ScoreBuffer(redis_store.get_redis())
+    buffer.add(user_id, change)
+    project_points([user], buffer)
+    get_rank_store().increment(user_id, change, user.points)
+    bump_version()
+    publish_scores({user_id: user.points})
+    return user
+
+
+def project_points(users, buffer=None):
+    """
+    Add unflushed write-behind changes to the points of `users`, User
+    instances or value rows, in place. The result is for display only and
+    must never be saved.
+    """
+    if not users or not write_behind_enabled():
+        return users
+    buffer = buffer or redis_store.ScoreBuffer(redis_store.get_redis())
+    rows = [user if isinstance(user, dict) else user.__dict__ for user in users]
+    pending = buffer.pending(row['id'] for row in rows)
+    for row in rows:
+        row['points'] += pending.get(row['id'], 0)
+    return users
+
+
+def flush_score_buffer():
+    """
+    Apply the write-behind buffer to the database in bulk.
+
+    Claims left behind by a crashed flush are retried along with the new
+    one. Each claim is applied in one transaction together with its
+    ScoreFlush row, so a claim that was already applied is only released.
+    """
+    client = redis_store.get_redis()
+    if client is None:
+        return {'claims': 0, 'users': 0}
+    buffer = redis_store.ScoreBuffer(client)
+    buffer.claim()
+    claims = users = 0
+    for token in buffer.claims():
+        deltas = {user_id: change for user_id, change in buffer.changes(token).items() if change}
+        try:
+            with transaction.atomic():
+                ScoreFlush.objects.create(token=token, users=len(deltas))
+                # The rank store already holds these changes, added when buffered
+                apply_score_changes(deltas, update_rank_store=False)
+        except IntegrityError:
+            pass
+        else:
+            claims += 1
+            users += len(deltas)
+        buffer.release(token)
+    ScoreFlush.objects.filter(flushed_at__lt=timezone.now() - timedelta(days=1)).delete()
+    return {'claims': claims, 'users': users}
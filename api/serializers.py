@@ -1,5 +1,12 @@
+from django.db.backends.base.operations import BaseDatabaseOperations
 from rest_framework import serializers
-from .models import User, Winner
+from .models import BoardWinner, Leaderboard, User, Winner
+
+# Ranges of the points and id columns, checked before the values reach the
+# database. SQLite would store wider integers, the portable limits keep
+# every backend to the same contract.
+CHANGE_MIN, CHANGE_MAX = BaseDatabaseOperations.integer_field_ranges['IntegerField']
+USER_ID_MAX = BaseDatabaseOperations.integer_field_ranges['BigAutoField'][1]
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -12,5 +19,121 @@ class WinnerSerializer(serializers.ModelSerializer):
         model = Winner
         fields = '__all__'
 
+class LeaderboardSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Leaderboard
+        fields = ('id', 'slug', 'name', 'created_at')
+
+class BoardWinnerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BoardWinner
+        fields = ('id', 'user', 'user_name', 'points_at_win', 'runner_up_points', 'players', 'timestamp')
+
 class UpdateScoreSerializer(serializers.Serializer):
-    change = serializers.IntegerField(required=True)
+    change = serializers.IntegerField(required=True, min_value=CHANGE_MIN, max_value=CHANGE_MAX)
+
+class BulkScoreItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=True, min_value=1, max_value=USER_ID_MAX)
+    change = serializers.IntegerField(required=True, min_value=CHANGE_MIN, max_value=CHANGE_MAX)
+
+
+# Read-optimized path for the list endpoints: rows are fetched with
+# .values() and shaped into exactly what the serializers above produce,
+# skipping DRF's per-object field machinery
+USER_FIELDS = ('id', 'name', 'age', 'address', 'points')
+# Columns every users query selects, whatever ?fields= asks for: the keyset
+# position and what the write-behind projection reads
+USER_KEY_FIELDS = ('id', 'points')
+WINNER_SNAPSHOT_FIELDS = ('user_name', 'runner_up_points', 'players')
+WINNER_ROW_FIELDS = (
+    ('id', 'points_at_win', 'timestamp') + WINNER_SNAPSHOT_FIELDS + tuple(f'user__{field}' for field in USER_FIELDS)
+)
+# The ?fields= choices of the winners list: its top-level keys, and the
+# keys of the nested user as user.<field>
+WINNER_FIELDS = ('id', 'user', 'points_at_win', 'timestamp') + WINNER_SNAPSHOT_FIELDS
+WINNER_SPARSE_FIELDS = WINNER_FIELDS + tuple(f'user.{field}' for field in USER_FIELDS)
+WINNER_KEY_FIELDS = ('id', 'timestamp')
+
+_timestamp_field = serializers.DateTimeField()
+
+
+def user_rows(queryset, fields=None):
+    """
+    Select the users' columns, or only those of the sparse fieldset
+    `fields` plus USER_KEY_FIELDS; sparse_rows() trims the extra keys.
+    """
+    if fields is None:
+        return queryset.values(*USER_FIELDS)
+    return queryset.values(*dict.fromkeys(fields + USER_KEY_FIELDS))
+
+
+def sparse_rows(rows, fields):
+    """
+    Trim user_rows() rows to the sparse fieldset `fields`, if any.
+    """
+    if fields is None:
+        return rows
+    return [{field: row[field] for field in fields} for row in rows]
+
+
+def winner_rows(queryset, fields=None):
+    """
+    Select the winners' columns and their user's, or only the columns the
+    sparse fieldset `fields` needs; api_user is only joined for user fields.
+    """
+    if fields is None:
+        return queryset.values(*WINNER_ROW_FIELDS)
+    columns = dict.fromkeys(WINNER_KEY_FIELDS)
+    for field in fields:
+        if field == 'user':
+            columns.update(dict.fromkeys(f'user__{user_field}' for user_field in USER_FIELDS))
+        elif field.startswith('user.'):
+            columns[f'user__{field[5:]}'] = None
+        else:
+            columns[field] = None
+    return queryset.values(*columns)
+
+
+def winner_data(row, fields=None):
+    """
+    Shape a winner_rows() row like WinnerSerializer(winner).data, or with
+    only the keys of the sparse fieldset `fields`.
+    """
+    if fields is None:
+        return {
+            'id': row['id'],
+            'user': {field: row[f'user__{field}'] for field in USER_FIELDS},
+            'points_at_win': row['points_at_win'],
+            'timestamp': _timestamp_field.to_representation(row['timestamp']),
+            **{field: row[field] for field in WINNER_SNAPSHOT_FIELDS},
+        }
+    data = {}
+    for field in fields:
+        if field == 'user':
+            data['user'] = {user_field: row[f'user__{user_field}'] for user_field in USER_FIELDS}
+        elif field.startswith('user.'):
+            data.setdefault('user', {})[field[5:]] = row[f'user__{field[5:]}']
+        elif field == 'timestamp':
+            data['timestamp'] = _timestamp_field.to_representation(row['timestamp'])
+        else:
+            data[field] = row[field]
+    return data
+
+
+def snapshot_rows(queryset):
+    """
+    Return the winners' own columns only, the ?view=snapshot feed needs no join.
+    """
+    return queryset.values('id', 'user_id', 'points_at_win', 'timestamp', *WINNER_SNAPSHOT_FIELDS)
+
+
+def snapshot_data(row):
+    return {
+        'id': row['id'],
+        'user_id': row['user_id'],
+        'name': row['user_name'],
+        'points_at_win': row['points_at_win'],
+        'runner_up_points': row['runner_up_points'],
+        'players': row['players'],
+        'timestamp': _timestamp_field.to_representation(row['timestamp']),
+    }
@@ -0,0 +1,63 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from .buckets import move_user
+from .events import publish_on_commit, publish_user
+from .models import User, Winner
+from .ranking import get_rank_store
+from .response_cache import bump_version
+from .score_log import record_score_events
+from .serializers import USER_FIELDS, WinnerSerializer
+
+
+@receiver(post_init, sender=User)
+def remember_bucket(sender, instance, **kwargs):
+    """
+    Remember the loaded points and age so a later save can move the user
+    between score buckets without re-reading the row. Read through __dict__
+    so deferred fields are not fetched.
+    """
+    instance._bucket = (instance.__dict__.get('points'), instance.__dict__.get('age'))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    """
+    Keep the score buckets, rank index and score event log in sync with
+    creates and full updates (POST/PUT/admin).
+    """
+    old_points, old_age = (None, None) if kwargs['created'] else instance._bucket
+    if kwargs['created'] or None not in (old_points, old_age):
+        if (old_points, old_age) != (instance.points, instance.age):
+            move_user(old_points, instance.points, old_age, instance.age)
+        record_score_events({instance.pk: instance.points - (old_points or 0)})
+    instance._bucket = (instance.points, instance.age)
+
+    user_id, points = instance.pk, instance.points
+    transaction.on_commit(lambda: get_rank_store().update(user_id, points))
+    bump_version()
+    publish_user({field: getattr(instance, field) for field in USER_FIELDS})
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    old_points, old_age = instance._bucket
+    if None not in (old_points, old_age):
+        move_user(old_points, None, old_age, None)
+
+    user_id = instance.pk
+    transaction.on_commit(lambda: get_rank_store().discard(user_id))
+    bump_version()
+    publish_on_commit('user_deleted', {'id': user_id})
+
+
+@receiver(post_save, sender=Winner)
+def winner_saved(sender, instance, **kwargs):
+    bump_version()
+    if kwargs['created']:
+        publish_on_commit('winner', WinnerSerializer(instance).data)
+
+
+@receiver(post_delete, sender=Winner)
+def winner_deleted(sender, instance, **kwargs):
+    bump_version()
@@ -1,7 +1,13 @@
 import logging
 from celery import shared_task
-from .views import update_winners
-from django.http import HttpRequest
+from . import redis_store
+from .response_cache import bump_version
+from .boards import board_id_batches, declare_board_winner
+from .scores import flush_score_buffer, write_behind_enabled
+from .score_log import compact_score_events
+from .windows import rollover_windows
+from .winners import archive_winners, single_flight_winner
+from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
@@ -9,26 +15,142 @@ logger = logging.getLogger(__name__)
 def update_winners_task():
     """
     Celery task to identify the user with the highest points.
-    This task is scheduled to run every 5 minutes.
+    This task is scheduled to run every 5 minutes, and fans the per-board
+    winner selections out to update_board_winners_task.
     """
+    _fan_out_board_winners()
     try:
-        # Create a dummy request object - use HttpRequest directly
-        dummy_request = HttpRequest()
-        dummy_request.method = 'POST'
-        
-        # Call the view function directly with the HttpRequest
-        response = update_winners(dummy_request)
-        
-        # Log the result
-        if response.status_code == 201:  # Created
-            data = response.data
-            winner_data = data.get('winner', {})
-            user_data = winner_data.get('user', {})
-            logger.info(f"Winner declared: {user_data.get('name')} with {winner_data.get('points_at_win')} points")
-            return {'status': 'success', 'winner': user_data.get('name'), 'points': winner_data.get('points_at_win')}
-        else:
-            logger.info(f"No winner declared: {response.data.get('message')}")
-            return {'status': 'tie', 'message': response.data.get('message')}
+        outcome, winner = single_flight_winner()
     except Exception as e:
         logger.error(f"Error updating winners: {str(e)}")
-        return {'status': 'error', 'message': str(e)} 
\ No newline at end of file
+        return {'status': 'error', 'message': str(e)}
+    if outcome == 'tie':
+        logger.info("No winner declared due to a tie")
+        return {'status': 'tie', 'message': 'No winner declared due to a tie'}
+    if outcome == 'recent':
+        logger.info(f"Winner already declared at {winner.timestamp.isoformat()}")
+        return {'status': 'skipped', 'message': 'A winner was declared moments ago'}
+    logger.info(f"Winner declared: {winner.user_name} with {winner.points_at_win} points")
+    return {'status': 'success', 'winner': winner.user_name, 'points': winner.points_at_win}
+
+
+def _fan_out_board_winners():
+    try:
+        batches = 0
+        for board_ids in board_id_batches(settings.BOARD_WINNER_BATCH_SIZE):
+            update_board_winners_task.delay(board_ids)
+            batches += 1
+        if batches:
+            logger.info(f"Board winner selection queued in {batches} batches")
+    except Exception as e:
+        logger.error(f"Error queueing board winners: {str(e)}")
+
+
+@shared_task
+def update_board_winners_task(board_ids):
+    """
+    Celery task to select the winners of a batch of boards. A failing board
+    is logged and skipped, the others in the batch still run.
+    """
+    declared = errors = 0
+    for board_id in board_ids:
+        try:
+            if declare_board_winner(board_id) is not None:
+                declared += 1
+        except Exception as e:
+            errors += 1
+            logger.error(f"Error updating winner of board {board_id}: {str(e)}")
+    return {'status': 'success' if not errors else 'error', 'boards': len(board_ids), 'declared': declared, 'errors': errors}
+
+
+@shared_task
+def reconcile_leaderboard_task():
+    """
+    Celery task to repair drift between the Redis leaderboard sorted set
+    and the User table. Does nothing when the Redis leaderboard is disabled.
+    """
+    client = redis_store.get_redis()
+    if client is None:
+        return {'status': 'disabled'}
+    try:
+        result = redis_store.RedisLeaderboard(client).reconcile()
+        if result['repaired'] or result['removed']:
+            bump_version()
+        logger.info(f"Leaderboard reconciled: {result['repaired']} repaired, {result['removed']} removed")
+        return dict(result, status='success')
+    except Exception as e:
+        logger.error(f"Error reconciling leaderboard: {str(e)}")
+        return {'status': 'error', 'message': str(e)}
+
+
+
+@shared_task
+def flush_score_buffer_task():
+    """
+    Celery task to apply the write-behind score buffer to the database.
+    Does nothing unless SCORE_WRITE_BEHIND is enabled; a failed flush keeps
+    its claim in Redis and is retried by the next run.
+    """
+    if not write_behind_enabled():
+        return {'status': 'disabled'}
+    try:
+        result = flush_score_buffer()
+        if result['users']:
+            logger.info(f"Score buffer flushed: {result['users']} users from {result['claims']} claims")
+        return dict(result, status='success')
+    except Exception as e:
+        logger.error(f"Error flushing score buffer: {str(e)}")
+        return {'status': 'error', 'message': str(e)}
+
+
+@shared_task
+def rollover_windows_task():
+    """
+    Celery task to archive the daily, weekly and monthly leaderboard periods
+    that have closed. Runs hourly so a missed run is caught up on the next.
+    """
+    try:
+        closed = rollover_windows()
+        periods = sum(len(starts) for starts in closed.values())
+        if periods:
+            bump_version()
+            logger.info(f"Leaderboard windows rolled over: {periods} periods archived")
+        return {'status': 'success', 'archived': {window: [start.isoformat() for start in starts] for window, starts in closed.items()}}
+    except Exception as e:
+        logger.error(f"Error rolling over leaderboard windows: {str(e)}")
+        return {'status': 'error', 'message': str(e)}
+
+
+@shared_task
+def compact_score_events_task():
+    """
+    Celery task to fold score events older than SCORE_EVENT_RETENTION_HOURS
+    into the per-user snapshots, keeping the event log short.
+    """
+    try:
+        result = compact_score_events()
+        if result['events']:
+            logger.info(f"Score events compacted: {result['events']} events into {result['users']} snapshots")
+        return dict(result, status='success')
+    except Exception as e:
+        logger.error(f"Error compacting score events: {str(e)}")
+        return {'status': 'error', 'message': str(e)}
+
+
+@shared_task
+def archive_winners_task():
+    """
+    Celery task to apply the winner retention policy: move old winners to
+    the downsampled archive and expire the oldest archived ones.
+    """
+    try:
+        result = archive_winners()
+        if result['moved'] or result['expired']:
+            bump_version()
+            logger.info(
+                f"Winners archived: {result['moved']} moved, {result['archived']} kept, {result['expired']} expired"
+            )
+        return dict(result, status='success')
+    except Exception as e:
+        logger.error(f"Error archiving winners: {str(e)}")
+        return {'status': 'error', 'message': str(e)}
@@ -1,12 +1,85 @@
-from django.test import TestCase
-from django.urls import reverse
+from django.apps import apps as django_apps
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.db import connection, transaction
+from django.db.models import Q, Subquery
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import resolve, reverse
 from rest_framework import status
-from rest_framework.test import APIClient
-from .models import User, Winner
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.utils.urls import replace_query_param
+from . import async_views, metrics
+from .aggregates import NAME_SEPARATOR, ORDER_SEPARATOR, split_names
+from .buckets import rebuild_buckets, verify_buckets
+from .events import format_event, local_broker
+from .factories import generate_user_chunks, insert_user_rows
+from .models import (
+    BoardScore, BoardWinner, Leaderboard, ScoreBucket, ScoreEvent, ScoreFlush, ScoreSnapshot, User, WindowArchive, WindowScore,
+    Winner, WinnerArchive,
+)
+from .pagination import KeysetPagination
+from .ranking import SortedKeyList, leaderboard_index
+from .redis_store import RedisLeaderboard, ScoreBuffer
+from .response_cache import reset_stats
+from .scores import apply_score_change, flush_score_buffer
+from .windows import add_window_points, current_periods, period_start
+from .score_log import compact_score_events, snapshot_unlogged_users
+from .views import grouped_buckets, grouped_names
+from .tasks import (
+    archive_winners_task, compact_score_events_task, flush_score_buffer_task, reconcile_leaderboard_task,
+    rollover_windows_task, update_board_winners_task, update_winners_task,
+)
+from .winners import FLIGHT_KEY, archive_winners, select_winner, single_flight_winner
+from .renderers import FastJSONRenderer
 from .serializers import UserSerializer, WinnerSerializer
+from rest_framework.renderers import JSONRenderer
+import asyncio
+import importlib
+import io
 import json
+import os
+import random
+import tempfile
+import threading
+import time
 from django.utils import timezone
-from datetime import timedelta
+from datetime import timedelta, timezone as dt_timezone
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from asgiref.sync import sync_to_async
+import redis
+
+
+def _test_redis():
+    """Return fakeredis if installed, else a local redis-server, else None"""
+    try:
+        import fakeredis
+        return fakeredis.FakeRedis(decode_responses=True)
+    except ImportError:
+        pass
+    client = redis.Redis.from_url('redis://localhost:6379/15', decode_responses=True)
+    try:
+        client.ping()
+    except redis.RedisError:
+        return None
+    return client
+
+
+class RedisTestMixin:
+    """Point the app at a clean test Redis, skipping the test if there is none"""
+
+    def setUp(self):
+        super().setUp()
+        self.redis = _test_redis()
+        if self.redis is None:
+            self.skipTest('fakeredis is not installed and no local redis-server is running')
+        self.redis.flushdb()
+        patcher = mock.patch('api.redis_store.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
 class UserViewSetTests(TestCase):
     """Test cases for the UserViewSet"""
@@ -136,6 +209,54 @@ class UserViewSetTests(TestCase):
         self.user1.refresh_from_db()
         self.assertEqual(self.user1.points, initial_points + 5)
     
+    def test_update_score_negative(self):
+        """Test subtracting points only touches the points column"""
+        response = self.client.patch(
+            reverse('api:user-update-score', kwargs={'pk': self.user2.pk}),
+            data=json.dumps({'change': -20}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['points'], -5)
+        self.assertEqual(response.data['name'], self.user2.name)
+        self.assertEqual(response.data['address'], self.user2.address)
+
+    def test_update_score_invalid_change(self):
+        """Test a non-integer change is rejected without touching the user"""
+        response = self.client.patch(
+            reverse('api:user-update-score', kwargs={'pk': self.user1.pk}),
+            data=json.dumps({'change': 'abc'}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('validation_errors', response.data)
+        self.user1.refresh_from_db()
+        self.assertEqual(self.user1.points, 10)
+
+    def test_update_score_change_out_of_range(self):
+        """Test a change beyond the points column range is rejected"""
+        response = self.client.patch(
+            reverse('api:user-update-score', kwargs={'pk': self.user1.pk}),
+            data=json.dumps({'change': 10**20}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.user1.refresh_from_db()
+        self.assertEqual(self.user1.points, 10)
+
+    def test_update_score_missing_user(self):
+        """Test updating the score of a user that does not exist"""
+        response = self.client.patch(
+            reverse('api:user-update-score', kwargs={'pk': 999999}),
+            data=json.dumps({'change': 1}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_grouped_by_score(self):
         """Test getting users grouped by score"""
         # Create another user with the same score as user1 to test grouping
@@ -309,116 +430,2155 @@ class UserViewSetTests(TestCase):
         self.assertIn("Group B User 2", response.data[score_key_b]['names'])
         self.assertEqual(response.data[score_key_b]['average_age'], 30)  # (25+35)/2 = 30
 
+    def test_grouped_by_score_reads_buckets(self):
+        """Test the grouping reads the score buckets plus one names query"""
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('api:user-grouped-by-score'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data.keys()), [15, 10, 5])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('api:user-grouped-by-score'), {'names_limit': 0})
+        self.assertEqual(response.data[15], {'names': [], 'average_age': 25, 'count': 1})
+
+    def test_grouped_by_score_filters(self):
+        """Test min_score and max_score restrict the score buckets"""
+        response = self.client.get(reverse('api:user-grouped-by-score'), {'min_score': 6, 'max_score': 14})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data.keys()), [10])
+
+    def test_grouped_by_score_pagination(self):
+        """Test limit and offset page through buckets highest first"""
+        response = self.client.get(reverse('api:user-grouped-by-score'), {'limit': 1, 'offset': 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data.keys()), [10])
+        self.assertEqual(response.data[10]['names'], [self.user1.name])
+
+    def test_grouped_by_score_names_limit(self):
+        """Test names_limit caps the names and reports the bucket size"""
+        User.objects.create(name="Test User 4", age=40, address="101 Test Lane", points=10)
+
+        response = self.client.get(reverse('api:user-grouped-by-score'), {'names_limit': 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data[10]['names']), 1)
+        self.assertEqual(response.data[10]['count'], 2)
+        self.assertEqual(response.data[10]['average_age'], 35)
+
+    def test_grouped_by_score_names_in_id_order(self):
+        """Test names come back in id order and names_limit keeps the first ones"""
+        for name in ("Zed", "Amy", "Mia"):
+            User.objects.create(name=name, age=40, address="101 Test Lane", points=10)
+
+        response = self.client.get(reverse('api:user-grouped-by-score'))
+        self.assertEqual(response.data[10]['names'], [self.user1.name, "Zed", "Amy", "Mia"])
+
+        response = self.client.get(reverse('api:user-grouped-by-score'), {'names_limit': 2})
+        self.assertEqual(response.data[10]['names'], [self.user1.name, "Zed"])
+
+    def test_grouped_names_capped_in_query(self):
+        """Test names_limit caps the aggregated names, not just the response"""
+        for name in ("Zed", "Amy", "Mia"):
+            User.objects.create(name=name, age=40, address="101 Test Lane", points=10)
+        params = {'min_score': None, 'max_score': None, 'offset': 0, 'limit': None, 'names_limit': 2}
+        buckets = list(grouped_buckets(params))
+
+        rows = {row['points']: split_names(row['names']) for row in grouped_names(params, buckets)}
+
+        self.assertEqual(rows[10], [self.user1.name, "Zed"])
+
+    def test_split_names(self):
+        """Test split_names reads both ordered and id-tagged aggregates"""
+        self.assertEqual(split_names(NAME_SEPARATOR.join(["Zed", "Amy"])), ["Zed", "Amy"])
+        tagged = NAME_SEPARATOR.join([f"12{ORDER_SEPARATOR}Amy", f"3{ORDER_SEPARATOR}Zed"])
+        self.assertEqual(split_names(tagged), ["Zed", "Amy"])
+        self.assertEqual(split_names(None), [])
+
+    def test_grouped_by_score_invalid_param(self):
+        """Test malformed bucket parameters are rejected"""
+        response = self.client.get(reverse('api:user-grouped-by-score'), {'limit': 0})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class KeysetPaginationTests(TestCase):
+    """Test cases for cursor pagination on the users and winners lists"""
 
-class WinnerViewSetTests(TestCase):
-    """Test cases for the WinnerViewSet"""
-    
     def setUp(self):
         """Set up test data and client"""
         self.client = APIClient()
-        
-        # Create test users
-        self.user1 = User.objects.create(
-            name="Winner Test User 1",
-            age=30,
-            address="123 Winner St",
-            points=20
-        )
-        
-        self.user2 = User.objects.create(
-            name="Winner Test User 2",
-            age=25,
-            address="456 Winner Ave",
-            points=15
-        )
-        
-        # Create test winners
-        self.winner1 = Winner.objects.create(
-            user=self.user1,
-            points_at_win=20,
-            timestamp=timezone.now() - timedelta(minutes=30)
-        )
-        
-        self.winner2 = Winner.objects.create(
-            user=self.user2,
-            points_at_win=15,
-            timestamp=timezone.now() - timedelta(hours=1)
-        )
-    
-    def test_get_all_winners(self):
-        """Test retrieving all winners"""
-        response = self.client.get(reverse('api:winner-list'))
-        
+        self.users = [
+            User.objects.create(name=f"Page User {i}", age=30, address="1 Page Rd", points=points)
+            for i, points in enumerate([9, 7, 7, 7, 5, 3, 1])
+        ]
+        self.expected = [u.pk for u in sorted(self.users, key=lambda u: (-u.points, u.pk))]
+
+    def walk(self, url, key):
+        ids = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data[key]
+            pages += 1
+        return ids, pages, response
+
+    def test_walk_forward_and_back(self):
+        """Test next links visit every user once, ties ordered by id"""
+        ids, pages, last = self.walk(reverse('api:user-list') + '?page_size=2', 'next')
+
+        self.assertEqual(ids, self.expected)
+        self.assertEqual(pages, 4)
+        self.assertNotIn('count', last.data)
+
+        back, pages, _ = self.walk(last.data['previous'], 'previous')
+        self.assertEqual(pages, 3)
+        self.assertEqual(sorted(back, key=self.expected.index), self.expected[:6])
+
+    def test_previous_page_matches(self):
+        """Test a previous link returns exactly the page before"""
+        first = self.client.get(reverse('api:user-list'), {'page_size': 3})
+        second = self.client.get(first.data['next'])
+        previous = self.client.get(second.data['previous'])
+
+        self.assertEqual(previous.data['results'], first.data['results'])
+        self.assertIsNone(previous.data['previous'])
+        self.assertIsNone(first.data['previous'])
+
+    def test_pages_stable_under_score_changes(self):
+        """Test rows moving above the cursor do not shift the next page"""
+        first = self.client.get(reverse('api:user-list'), {'page_size': 3})
+        User.objects.filter(pk=self.expected[-1]).update(points=100)
+
+        second = self.client.get(first.data['next'])
+        self.assertEqual([row['id'] for row in second.data['results']], self.expected[3:6])
+
+    def test_legacy_page_numbers(self):
+        """Test ?page= keeps the page-number response with a count"""
+        response = self.client.get(reverse('api:user-list'), {'page': 1})
+
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data['results']), 2)
-        
-        # Get the IDs of the winners in the response
-        winner_ids = [winner['id'] for winner in response.data['results']]
-        
-        # Check that both winners are in the response
-        self.assertIn(self.winner1.id, winner_ids)
-        self.assertIn(self.winner2.id, winner_ids)
-        
-        # Verify the order of winners in the response
-        # Get the timestamps from the response
-        timestamps = [winner['timestamp'] for winner in response.data['results']]
-        
-        # Check that timestamps are in descending order (most recent first)
-        self.assertTrue(timestamps[0] > timestamps[1], 
-                       f"First timestamp {timestamps[0]} should be more recent than second timestamp {timestamps[1]}")
-    
-    def test_get_single_winner(self):
-        """Test retrieving a single winner"""
-        response = self.client.get(reverse('api:winner-detail', kwargs={'pk': self.winner1.pk}))
-        
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual([row['id'] for row in response.data['results']], self.expected)
+
+    def test_invalid_cursor(self):
+        """Test a garbled cursor is a 404"""
+        response = self.client.get(reverse('api:user-list'), {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_null_positions(self):
+        """Test a well-formed cursor holding null or nested positions is a 404"""
+        for position in ([None, None], [[1], {'id': 2}]):
+            cursor = KeysetPagination.encode_position(position)
+            response = self.client.get(reverse('api:user-list'), {'cursor': cursor})
+
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_winners_cursor(self):
+        """Test winners are paged newest first by (timestamp, id)"""
+        now = timezone.now()
+        winners = [Winner.objects.create(user=self.users[0], points_at_win=i) for i in range(5)]
+        # timestamp is auto_now_add, so set it afterwards; the last two tie
+        for i, winner in enumerate(winners):
+            Winner.objects.filter(pk=winner.pk).update(timestamp=now - timedelta(minutes=min(i, 3)))
+
+        ids, pages, _ = self.walk(reverse('api:winner-list') + '?page_size=2', 'next')
+
+        self.assertEqual(ids, [w.pk for w in winners])
+        self.assertEqual(pages, 3)
+
+
+class QueryPlanTests(TestCase):
+    """Fail if the hot leaderboard queries stop using their indexes"""
+
+    def setUp(self):
+        user = User.objects.create(name="Plan User", age=30, address="1 Plan St", points=10)
+        Winner.objects.create(user=user, points_at_win=10)
+        if connection.vendor == 'postgresql':
+            # The test tables are tiny, make the planner show the index it would use
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        elif connection.vendor != 'sqlite':
+            self.skipTest(f'No query plan checks for {connection.vendor}')
+
+    def plan(self, sql, params=()):
+        prefix = 'EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite' else 'EXPLAIN'
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+    def assertIndexed(self, query, index):
+        """Check the plan uses `index` with no full scan or sort step"""
+        if isinstance(query, str):
+            plan = self.plan(query)
+        else:
+            plan = self.plan(*query.query.sql_with_params())
+        self.assertIn(index, plan)
+        if connection.vendor == 'sqlite':
+            self.assertNotIn('TEMP B-TREE', plan)
+            for line in plan.splitlines():
+                if line.startswith('SCAN'):
+                    self.assertIn('USING', line, plan)
+        else:
+            self.assertNotIn('Seq Scan', plan)
+            self.assertNotRegex(plan, r'(?m)^\s*(->\s*)?(Incremental )?Sort\b')
+
+    def test_users_list(self):
+        """Test the leaderboard page walks the (points desc, id) index"""
+        self.assertIndexed(User.objects.order_by('-points', 'id')[:21], 'user_points_id_idx')
+
+    def test_users_list_cursor(self):
+        """Test a keyset page seeks into the (points desc, id) index"""
+        queryset = User.objects.filter(
+            Q(points__lte=10) & (Q(points__lt=10) | Q(points=10, id__gt=5))
+        ).order_by('-points', 'id')[:21]
+        self.assertIndexed(queryset, 'user_points_id_idx')
+
+    def test_top_two_users(self):
+        """Test the winner job's top-two query reads both indexes"""
+        last_win = Winner.objects.order_by('-timestamp', 'id').values('timestamp')[:1]
+        queryset = User.objects.order_by('-points', 'id').annotate(last_win=Subquery(last_win))[:2]
+        self.assertIndexed(queryset, 'user_points_id_idx')
+        self.assertIndexed(queryset, 'winner_timestamp_id_idx')
+
+    def test_users_at_points(self):
+        """Test an equality filter on points uses the index"""
+        self.assertIndexed(User.objects.filter(points=10), 'user_points_id_idx')
+
+    def test_winners_history(self):
+        """Test the winners page walks the (timestamp desc, id) index"""
+        self.assertIndexed(Winner.objects.order_by('-timestamp', 'id')[:21], 'winner_timestamp_id_idx')
+
+    def test_user_win_history(self):
+        """Test one user's wins come from the (user_id, timestamp) index"""
+        queryset = Winner.objects.filter(user_id=1).order_by('-timestamp')[:21]
+        self.assertIndexed(queryset, 'winner_user_timestamp_idx')
+
+    def test_archived_winners_history(self):
+        """Test the archived winners page walks the (timestamp desc, id) index"""
+        queryset = WinnerArchive.objects.order_by('-timestamp', 'id')[:21]
+        self.assertIndexed(queryset, 'winner_archive_timestamp_idx')
+
+    def test_board_top(self):
+        """Test a board's top-N walks only that board's (points desc, user) index range"""
+        board = Leaderboard.objects.create(slug='plan', name='Plan')
+        queryset = BoardScore.objects.filter(board=board).order_by('-points', 'user_id')[:10]
+        self.assertIndexed(queryset, 'board_score_rank_idx')
+
+    def test_window_leaderboard(self):
+        """Test a window period page walks the (window, period, points desc, user) index"""
+        queryset = WindowScore.objects.filter(
+            window='daily', period_start=timezone.localdate(),
+        ).order_by('-points', 'user_id')[:21]
+        self.assertIndexed(queryset, 'window_score_rank_idx')
+
+
+class PopulateDbTests(TestCase):
+    """Test cases for the bulk seeding engine behind populate_db"""
+
+    def test_chunks_are_deterministic(self):
+        """Test a seed always produces the same rows, whatever the worker count"""
+        chunks = list(generate_user_chunks(25, batch_size=10, seed=3))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+        self.assertEqual(chunks, list(generate_user_chunks(25, batch_size=10, seed=3)))
+        self.assertEqual(chunks, list(generate_user_chunks(25, batch_size=10, seed=3, workers=2)))
+        self.assertNotEqual(chunks, list(generate_user_chunks(25, batch_size=10, seed=4)))
+
+    def test_populate_db(self):
+        """Test the command inserts the users and refreshes the score buckets"""
+        out = io.StringIO()
+        call_command('populate_db', count=30, batch_size=7, seed=3, stdout=out)
+
+        self.assertEqual(User.objects.count(), 30)
+        self.assertIn('rows/sec', out.getvalue())
+        self.assertEqual(verify_buckets(), [])
+
+    def test_copy_with_either_driver(self):
+        """Test the PostgreSQL COPY path with psycopg 3 and with psycopg2"""
+        rows = [("Tab\tName", 30, "1 Line\nRd", 5)]
+        fake = mock.MagicMock(vendor='postgresql')
+        raw = fake.cursor.return_value.__enter__.return_value.cursor
+
+        with mock.patch('api.factories.connection', fake), mock.patch('api.factories.is_psycopg3', True):
+            insert_user_rows(rows)
+        raw.copy.return_value.__enter__.return_value.write_row.assert_called_once_with(rows[0])
+
+        with mock.patch('api.factories.connection', fake), mock.patch('api.factories.is_psycopg3', False):
+            insert_user_rows(rows)
+        self.assertEqual(raw.copy_expert.call_args[0][1].getvalue(), 'Tab\\tName\t30\t1 Line\\nRd\t5\n')
+
+
+class BulkUpdateScoresTests(TestCase):
+    """Test cases for the bulk score ingestion endpoint"""
+
+    def setUp(self):
+        """Set up test data and client"""
+        self.client = APIClient()
+        self.user1 = User.objects.create(name="Bulk User 1", age=20, address="1 Bulk Rd", points=10)
+        self.user2 = User.objects.create(name="Bulk User 2", age=40, address="2 Bulk Rd", points=5)
+        self.url = reverse('api:user-bulk-update-scores')
+
+    def test_json_list(self):
+        """Test deltas are coalesced per user and reported per item"""
+        items = [
+            {'id': self.user1.pk, 'change': 3},
+            {'id': self.user2.pk, 'change': -2},
+            {'id': self.user1.pk, 'change': 4},
+            {'id': 999999, 'change': 1},
+            {'id': self.user2.pk, 'change': 'lots'},
+        ]
+        response = self.client.post(self.url, data=json.dumps(items), content_type='application/json')
+
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data['user']['name'], self.user1.name)
-        self.assertEqual(response.data['points_at_win'], 20)
+        self.assertEqual(response.data['applied'], 3)
+        self.assertEqual(response.data['users'], 2)
+        results = response.data['results']
+        self.assertEqual([r['status'] for r in results], ['ok', 'ok', 'ok', 'not_found', 'invalid'])
+        self.assertEqual(results[0]['points'], 17)
+        self.assertEqual(results[2]['points'], 17)
+        self.assertEqual(results[1]['points'], 3)
+        self.assertIn('change', results[4]['errors'])
+
+        self.user1.refresh_from_db()
+        self.assertEqual(self.user1.points, 17)
+        self.assertEqual(verify_buckets(), [])
 
+    def test_out_of_range_items(self):
+        """Test ids and changes beyond the column range are invalid, not a failed batch"""
+        items = [
+            {'id': self.user1.pk, 'change': 10**20},
+            {'id': 10**20, 'change': 1},
+            {'id': self.user2.pk, 'change': 2},
+        ]
+        response = self.client.post(self.url, data=json.dumps(items), content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([r['status'] for r in results], ['invalid', 'invalid', 'ok'])
+        self.assertIn('change', results[0]['errors'])
+        self.assertIn('id', results[1]['errors'])
+        self.assertEqual(results[2]['points'], 7)
+        self.assertEqual(User.objects.get(pk=self.user1.pk).points, 10)
+
+    def test_ndjson(self):
+        """Test newline-delimited JSON bodies are accepted"""
+        body = '\n'.join(json.dumps({'id': self.user2.pk, 'change': 1}) for _ in range(5)) + '\n'
+        response = self.client.post(self.url, data=body, content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user2.refresh_from_db()
+        self.assertEqual(self.user2.points, 10)
+
+    def test_ndjson_parse_error(self):
+        """Test a malformed NDJSON line is rejected"""
+        response = self.client.post(self.url, data='{"id": 1, "change": 1}\nnot json\n', content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(User.objects.get(pk=self.user1.pk).points, 10)
+
+    def test_not_a_list(self):
+        """Test a body that is not a list is rejected"""
+        response = self.client.post(self.url, data=json.dumps({'id': 1, 'change': 1}), content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BULK_SCORE_BATCH_SIZE=2)
+    def test_one_update_per_batch(self):
+        """Test each batch of users is applied with a single UPDATE"""
+        users = [User.objects.create(name=f"Batch {i}", age=30, address="3 Bulk Rd", points=0) for i in range(3)]
+        items = [{'id': user.pk, 'change': 1} for user in users + [self.user1, self.user2]]
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, data=json.dumps(items), content_type='application/json')
+
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "api_user"')]
+        self.assertEqual(len(updates), 3)
+
+
+@override_settings(LEADERBOARD_CACHE_ENABLED=True)
+class ResponseCacheTests(TestCase):
+    """Test cases for the versioned leaderboard response cache"""
 
-class UpdateWinnersTests(TestCase):
-    """Test cases for the update_winners endpoint"""
-    
     def setUp(self):
         """Set up test data and client"""
         self.client = APIClient()
-        
-        # Create test users with same points (for tie scenario)
-        self.user1 = User.objects.create(
-            name="Update Winner User 1",
-            age=30,
-            address="123 Update St",
-            points=10
+        reset_stats()
+        self.user = User.objects.create(name="Cached User", age=30, address="1 Cache Ct", points=10)
+        self.url = reverse('api:user-list')
+
+    def test_second_read_is_a_hit(self):
+        """Test a repeated read is served without queries"""
+        first = self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(self.url)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(len(queries.captured_queries), 0)
+
+        stats = self.client.get(reverse('api:cache-stats')).data
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_ratio'], 0.5)
+        self.assertIsNotNone(stats['mean_age_seconds'])
+
+    def test_update_score_invalidates(self):
+        """Test a score change is visible on the next read"""
+        self.client.get(self.url)
+        self.client.patch(
+            reverse('api:user-update-score', kwargs={'pk': self.user.pk}),
+            data=json.dumps({'change': 5}),
+            content_type='application/json'
         )
-        
-        self.user2 = User.objects.create(
-            name="Update Winner User 2",
-            age=25,
-            address="456 Update Ave",
-            points=10
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['results'][0]['points'], 15)
+
+    def test_user_crud_invalidates(self):
+        """Test creating and deleting users invalidates cached pages"""
+        self.client.get(self.url)
+        self.client.post(self.url, {'name': "New User", 'age': 20, 'address': "2 Cache Ct", 'points': 50}, format='json')
+        self.assertEqual(len(self.client.get(self.url).data['results']), 2)
+
+        self.client.delete(reverse('api:user-detail', kwargs={'pk': self.user.pk}))
+        self.assertEqual(len(self.client.get(self.url).data['results']), 1)
+
+    def test_grouped_by_score_invalidates(self):
+        """Test grouped_by_score reflects a score change"""
+        url = reverse('api:user-grouped-by-score')
+        self.assertIn(10, self.client.get(url).data)
+        self.client.patch(
+            reverse('api:user-update-score', kwargs={'pk': self.user.pk}),
+            data=json.dumps({'change': 1}),
+            content_type='application/json'
         )
-    
-    def test_update_winners_tie(self):
-        """Test update_winners with a tie scenario"""
-        response = self.client.post(reverse('api:update-winners'))
-        
+
+        data = self.client.get(url).data
+        self.assertNotIn(10, data)
+        self.assertIn(11, data)
+
+    def test_if_none_match(self):
+        """Test a matching ETag gets a 304 until the leaderboard changes"""
+        url = reverse('api:winner-list')
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        self.client.post(reverse('api:update-winners'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data['status'], 'tie')
-        self.assertEqual(Winner.objects.count(), 0)  # No winner should be created
-    
-    def test_update_winners_success(self):
-        """Test update_winners with a clear winner"""
-        # Update one user to have higher points
-        self.user1.points = 15
-        self.user1.save()
-        
-        response = self.client.post(reverse('api:update-winners'))
-        
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertEqual(response.data['status'], 'success')
-        self.assertEqual(Winner.objects.count(), 1)
-        
-        # Check the winner details
-        winner = Winner.objects.first()
-        self.assertEqual(winner.user, self.user1)
-        self.assertEqual(winner.points_at_win, 15) 
\ No newline at end of file
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(self.client.get(reverse('api:cache-stats')).data['not_modified'], 1)
+
+    @override_settings(LEADERBOARD_CACHE_ENABLED=False)
+    def test_disabled(self):
+        """Test every read runs the queries when the cache is off"""
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+
+        self.assertNotIn('ETag', response)
+        self.assertGreater(len(queries.captured_queries), 0)
+
+
+@override_settings(LEADERBOARD_CACHE_ENABLED=False)
+class FastSerializationTests(TestCase):
+    """Test the read-optimized list path matches the DRF serializers byte for byte"""
+
+    def setUp(self):
+        """Set up test data and client"""
+        self.client = APIClient()
+        self.users = [
+            User.objects.create(name="Zoë \u2028 Ünïcode", age=31, address="1 \"Quoted\"\nLine", points=40),
+            User.objects.create(name="Plain", age=22, address="2 Plain St", points=40),
+            User.objects.create(name="Low", age=50, address="3 Low Rd", points=-3),
+        ]
+        for user in self.users[:2]:
+            Winner.objects.create(user=user, points_at_win=user.points)
+
+    def _expected(self, serializer, queryset, accepted_media_type=None):
+        data = {'next': None, 'previous': None, 'results': serializer(queryset, many=True).data}
+        return JSONRenderer().render(data, accepted_media_type, {})
+
+    def test_users_list_bytes(self):
+        """Test the users list renders exactly like UserSerializer + JSONRenderer"""
+        response = self.client.get(reverse('api:user-list'), HTTP_ACCEPT='application/json')
+
+        self.assertEqual(response.content, self._expected(UserSerializer, User.objects.order_by('-points', 'id')))
+        self.assertIn(b'\\u2028', response.content)
+
+    def test_winners_list_bytes(self):
+        """Test the winners list renders exactly like WinnerSerializer + JSONRenderer"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api:winner-list'), HTTP_ACCEPT='application/json')
+
+        expected = self._expected(WinnerSerializer, Winner.objects.order_by('-timestamp', 'id'))
+        self.assertEqual(response.content, expected)
+        # One joined query per table, the short page runs on into the archive
+        self.assertEqual(len(queries.captured_queries), 2)
+
+    def test_renderer_fallbacks(self):
+        """Test pretty printing and a missing orjson produce JSONRenderer output"""
+        data = UserSerializer(User.objects.order_by('id'), many=True).data
+        media_type = 'application/json; indent=2'
+        self.assertEqual(
+            FastJSONRenderer().render(data, media_type, {}),
+            JSONRenderer().render(data, media_type, {})
+        )
+        with mock.patch('api.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class SparseFieldsTests(TestCase):
+    """Test ?fields= narrows the users and winners lists, SQL and JSON"""
+
+    def setUp(self):
+        """Set up test data and client"""
+        self.client = APIClient()
+        self.users = [
+            User.objects.create(name=f"Sparse User {i}", age=40 + i, address=f"{i} Sparse St", points=points)
+            for i, points in enumerate([30, 20, 20, 10])
+        ]
+        self.winner = Winner.objects.create(user=self.users[0], points_at_win=30, user_name=self.users[0].name)
+
+    def test_users_list_fields(self):
+        """Test the users list selects and returns only the requested fields"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api:user-list'), {'fields': 'name,id,points'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0], {'id': self.users[0].pk, 'name': "Sparse User 0", 'points': 30})
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('"address"', sql)
+        self.assertNotIn('"age"', sql)
+
+    def test_users_cursor_without_ordering_fields(self):
+        """Test the cursor pages on when the ordering fields are left out"""
+        first = self.client.get(reverse('api:user-list'), {'fields': 'name', 'page_size': 2})
+        self.assertEqual(first.data['results'], [{'name': "Sparse User 0"}, {'name': "Sparse User 1"}])
+
+        second = self.client.get(first.data['next'])
+        self.assertEqual(second.data['results'], [{'name': "Sparse User 2"}, {'name': "Sparse User 3"}])
+
+    def test_unknown_field(self):
+        """Test an unknown field is a 400 naming it"""
+        for name in ('api:user-list', 'api:winner-list'):
+            response = self.client.get(reverse(name), {'fields': 'id,password'})
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('password', str(response.data['fields']))
+
+    def test_user_retrieve_fields(self):
+        """Test the user detail honours ?fields= and 404s on a missing user"""
+        response = self.client.get(reverse('api:user-detail', args=[self.users[1].pk]), {'fields': 'age,address'})
+        self.assertEqual(response.data, {'age': 41, 'address': "1 Sparse St"})
+
+        response = self.client.get(reverse('api:user-detail', args=[self.users[1].pk]))
+        self.assertEqual(response.data, UserSerializer(self.users[1]).data)
+
+        response = self.client.get(reverse('api:user-detail', args=[999999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_winners_fields_without_user(self):
+        """Test winner fields alone never join api_user"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api:winner-list'), {'fields': 'id,points_at_win'})
+
+        self.assertEqual(response.data['results'], [{'id': self.winner.pk, 'points_at_win': 30}])
+        self.assertFalse(any('JOIN' in query['sql'] for query in queries.captured_queries))
+
+    def test_winners_nested_user_fields(self):
+        """Test user.<field> returns a partial nested user"""
+        response = self.client.get(reverse('api:winner-list'), {'fields': 'user.name,timestamp'})
+
+        row = response.data['results'][0]
+        self.assertEqual(row['user'], {'name': "Sparse User 0"})
+        self.assertEqual(set(row), {'user', 'timestamp'})
+
+
+@override_settings(LEADERBOARD_CACHE_ENABLED=False)
+class AsyncViewTests(TestCase):
+    """Test the async views answer exactly like the DRF views they replace"""
+
+    def setUp(self):
+        """Set up test data and clients"""
+        self.client = APIClient()
+        self.factory = AsyncRequestFactory()
+        self.users = [
+            User.objects.create(name=f"Async User {i}", age=20 + i, address="1 Await Ave", points=points)
+            for i, points in enumerate([10, 30, 10])
+        ]
+        rebuild_buckets()
+
+    async def _call(self, view, method, path, data=None, **kwargs):
+        request = getattr(self.factory, method)(path, data=data, content_type='application/json')
+        response = await view(request, **kwargs)
+        response.render()
+        return response
+
+    async def test_user_list(self):
+        """Test the users list, first page and cursor page"""
+        response = await self._call(async_views.user_list, 'get', '/api/users/?page_size=2')
+        expected = await sync_to_async(self.client.get)('/api/users/?page_size=2', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.content, expected.content)
+
+        cursor = expected.data['next'].split('cursor=')[1]
+        response = await self._call(async_views.user_list, 'get', f'/api/users/?page_size=2&cursor={cursor}')
+        self.assertEqual([row['id'] for row in json.loads(response.content)['results']], [self.users[2].pk])
+
+    async def test_user_list_legacy_pages(self):
+        """Test ?page= mode pages the users by points too"""
+        response = await self._call(async_views.user_list, 'get', '/api/users/?page=1')
+        expected = await sync_to_async(self.client.get)('/api/users/?page=1', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual([row['points'] for row in json.loads(response.content)['results']], [30, 10, 10])
+
+    async def test_user_list_fields(self):
+        """Test the async users list honours ?fields="""
+        response = await self._call(async_views.user_list, 'get', '/api/users/?fields=id,points')
+        expected = await sync_to_async(self.client.get)('/api/users/?fields=id,points', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(set(json.loads(response.content)['results'][0]), {'id', 'points'})
+
+    async def test_user_list_post_falls_back(self):
+        """Test creating a user through the async route uses the sync viewset"""
+        data = json.dumps({'name': "Created", 'age': 40, 'address': "2 Await Ave", 'points': 0})
+        response = await self._call(async_views.user_list, 'post', '/api/users/', data)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(await User.objects.filter(name="Created").aexists())
+
+    async def test_grouped_by_score(self):
+        """Test grouped_by_score, including a bad parameter"""
+        for query in ('', '?names_limit=1', '?min_score=abc'):
+            response = await self._call(async_views.grouped_by_score, 'get', f'/api/users/grouped_by_score/{query}')
+            expected = await sync_to_async(self.client.get)(
+                f'/api/users/grouped_by_score/{query}', HTTP_ACCEPT='application/json'
+            )
+            self.assertEqual((response.status_code, response.content), (expected.status_code, expected.content))
+
+    async def test_update_score(self):
+        """Test score changes, validation errors, unknown users and wrong methods"""
+        pk = self.users[0].pk
+        path = f'/api/users/{pk}/update_score/'
+        response = await self._call(async_views.update_score, 'patch', path, json.dumps({'change': 5}), pk=pk)
+        self.assertEqual(json.loads(response.content)['points'], 15)
+        self.assertEqual((await User.objects.aget(pk=pk)).points, 15)
+
+        response = await self._call(async_views.update_score, 'patch', path, json.dumps({'change': 'x'}), pk=pk)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('validation_errors', json.loads(response.content))
+
+        response = await self._call(async_views.update_score, 'patch', path, '{', pk=pk)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = await self._call(async_views.update_score, 'patch', path, json.dumps({'change': 1}), pk=999999)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(json.loads(response.content), {'detail': 'Not found.'})
+
+        response = await self._call(async_views.update_score, 'get', path, pk=pk)
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    @override_settings(LEADERBOARD_CACHE_ENABLED=True)
+    async def test_user_list_cached(self):
+        """Test the async users list is cached and revalidated by ETag"""
+        first = await self._call(async_views.user_list, 'get', '/api/users/')
+        request = self.factory.get('/api/users/', headers={'If-None-Match': first['ETag']})
+        second = await async_views.user_list(request)
+
+        self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_update_winners(self):
+        """Test winner selection through the async view"""
+        response = await self._call(async_views.update_winners, 'post', '/api/update-winners/')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(json.loads(response.content)['winner']['user']['id'], self.users[1].pk)
+
+
+class WindowedLeaderboardTests(TestCase):
+    """Test the daily, weekly and monthly leaderboards"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.users = [
+            User.objects.create(name=f"Window User {i}", age=20 + i, address=f"{i} Window St", points=100)
+            for i in range(4)
+        ]
+        self.today = timezone.localdate()
+
+    def list_url(self, window):
+        return reverse('api:leaderboard-list', kwargs={'window': window})
+
+    def rank_url(self, window, user):
+        return reverse('api:leaderboard-rank', kwargs={'window': window, 'user_id': user.id})
+
+    def test_periods(self):
+        """Test each window's period starts on the day, the Monday and the first"""
+        day = timezone.datetime(2026, 10, 15).date()  # A Thursday
+        self.assertEqual(period_start('daily', day).isoformat(), '2026-10-15')
+        self.assertEqual(period_start('weekly', day).isoformat(), '2026-10-12')
+        self.assertEqual(period_start('monthly', day).isoformat(), '2026-10-01')
+
+    def test_score_changes_feed_every_window(self):
+        """Test update_score and the bulk endpoint add to all open periods"""
+        a, b = self.users[:2]
+        self.client.patch(reverse('api:user-update-score', args=[a.id]), {'change': 5}, format='json')
+        self.client.patch(reverse('api:user-update-score', args=[a.id]), {'change': -2}, format='json')
+        self.client.post(reverse('api:user-bulk-update-scores'), [{'id': b.id, 'change': 7}], format='json')
+
+        for window, start in current_periods().items():
+            scores = dict(
+                WindowScore.objects.filter(window=window, period_start=start).values_list('user_id', 'points')
+            )
+            self.assertEqual(scores, {a.id: 3, b.id: 7})
+        # The all-time points are unaffected by the windows
+        self.assertEqual(User.objects.get(pk=a.id).points, 103)
+
+    def test_list_and_rank(self):
+        """Test a window lists users by points gained in the period and ranks them"""
+        for user, change in zip(self.users, (3, 9, 3, 1)):
+            apply_score_change(user.id, change)
+
+        response = self.client.get(self.list_url('weekly'), {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['window'], 'weekly')
+        self.assertEqual(response.data['period_start'], period_start('weekly', self.today).isoformat())
+        self.assertFalse(response.data['archived'])
+        self.assertEqual(
+            [(row['id'], row['points']) for row in response.data['results']],
+            [(self.users[1].id, 9), (self.users[0].id, 3)],
+        )
+        response = self.client.get(response.data['next'])
+        self.assertEqual(
+            [(row['id'], row['points']) for row in response.data['results']],
+            [(self.users[2].id, 3), (self.users[3].id, 1)],
+        )
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get(self.rank_url('daily', self.users[2]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['points'], response.data['rank']), (3, 3))
+
+    def test_unknown_window_and_bad_period(self):
+        """Test an unknown window is a 404, a malformed period a 400"""
+        self.assertEqual(self.client.get(self.list_url('yearly')).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(self.list_url('daily'), {'period': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.rank_url('daily', self.users[0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rollover_archives_closed_periods(self):
+        """Test the rollover task archives yesterday and leaves today open"""
+        yesterday = self.today - timedelta(days=1)
+        add_window_points({self.users[0].id: 4, self.users[1].id: 6}, day=yesterday)
+        apply_score_change(self.users[2].id, 2)
+
+        with override_settings(WINDOW_ARCHIVE_SIZE=1):
+            result = rollover_windows_task()
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['archived']['daily'], [yesterday.isoformat()])
+        self.assertFalse(WindowScore.objects.filter(window='daily', period_start=yesterday).exists())
+        self.assertTrue(WindowScore.objects.filter(window='daily', period_start=self.today).exists())
+        # Running again archives nothing new
+        self.assertEqual(rollover_windows_task()['archived']['daily'], [])
+
+        response = self.client.get(self.list_url('daily'), {'period': yesterday.isoformat()})
+        self.assertTrue(response.data['archived'])
+        self.assertEqual(response.data['results'], [
+            {'rank': 1, 'id': self.users[1].id, 'name': 'Window User 1', 'points': 6},
+        ])
+        response = self.client.get(self.rank_url('daily', self.users[1]), {'period': yesterday.isoformat()})
+        self.assertEqual((response.data['points'], response.data['rank']), (6, 1))
+
+        # Archived standings survive the user being deleted
+        self.users[1].delete()
+        self.assertEqual(WindowArchive.objects.get(window='daily', period_start=yesterday).name, 'Window User 1')
+
+
+class ScoreEventLogTests(TestCase):
+    """Test the score event log, its compaction and replay_scores"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user1 = User.objects.create(name="Log User 1", age=20, address="1 Log St", points=10)
+        self.user2 = User.objects.create(name="Log User 2", age=30, address="2 Log St", points=5)
+
+    def logged_points(self, user):
+        snapshot = ScoreSnapshot.objects.filter(user=user).values_list('points', flat=True).first() or 0
+        return snapshot + sum(ScoreEvent.objects.filter(user=user).values_list('change', flat=True))
+
+    def test_every_score_change_is_logged(self):
+        """Test creates, edits, update_score and bulk changes all reach the log"""
+        self.client.patch(reverse('api:user-update-score', args=[self.user1.id]), {'change': 3}, format='json')
+        self.client.post(reverse('api:user-bulk-update-scores'), [
+            {'id': self.user1.id, 'change': -1},
+            {'id': self.user2.id, 'change': 4},
+        ], format='json')
+        user2 = User.objects.get(pk=self.user2.id)
+        user2.points = 50
+        user2.save()
+
+        self.assertEqual(
+            list(ScoreEvent.objects.filter(user=self.user1).order_by('id').values_list('change', flat=True)),
+            [10, 3, -1],
+        )
+        for user in User.objects.all():
+            self.assertEqual(self.logged_points(user), user.points)
+
+    def test_compaction_folds_old_events_into_snapshots(self):
+        """Test compaction keeps the logged points and only drops old events"""
+        apply_score_change(self.user1.id, 7)
+        ScoreEvent.objects.update(created_at=timezone.now() - timedelta(days=2))
+        apply_score_change(self.user1.id, 2)
+
+        result = compact_score_events(batch_size=1)
+        self.assertEqual(result, {'events': 3, 'users': 2})
+        self.assertEqual(list(ScoreEvent.objects.values_list('change', flat=True)), [2])
+        snapshot = ScoreSnapshot.objects.get(user=self.user1)
+        self.assertEqual(snapshot.points, 17)
+        self.assertEqual(self.logged_points(self.user1), 19)
+
+        # A second pass, or one through the task, finds nothing old left
+        self.assertEqual(compact_score_events_task()['events'], 0)
+
+    def test_replay_restores_points(self):
+        """Test replay_scores rebuilds drifted points and the derived structures"""
+        apply_score_change(self.user1.id, 5)
+        compact_score_events(before=timezone.now() + timedelta(seconds=1))
+        apply_score_change(self.user2.id, 1)
+        # A bad deploy corrupts the points behind the log's back
+        User.objects.filter(pk=self.user1.id).update(points=999)
+        User.objects.filter(pk=self.user2.id).update(points=-3)
+
+        out, err = io.StringIO(), io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('replay_scores', dry_run=True, stdout=out, stderr=err)
+        self.assertIn(f'user {self.user1.id}: points 999, log has 15', err.getvalue())
+        self.assertEqual(User.objects.get(pk=self.user1.id).points, 999)
+
+        call_command('replay_scores', batch_size=1, stdout=out, stderr=err)
+        self.assertEqual(User.objects.get(pk=self.user1.id).points, 15)
+        self.assertEqual(User.objects.get(pk=self.user2.id).points, 6)
+        self.assertEqual(verify_buckets(), [])
+        self.assertEqual(leaderboard_index.verify(), [])
+        call_command('replay_scores', dry_run=True, stdout=out, stderr=err)
+
+    def test_users_without_history(self):
+        """Test bulk inserted users get a baseline snapshot and are not zeroed"""
+        User.objects.bulk_create([User(name="Seeded", age=40, address="3 Log St", points=42)])
+        seeded = User.objects.get(name="Seeded")
+
+        out = io.StringIO()
+        call_command('replay_scores', stdout=out)
+        self.assertIn('1 have no score history', out.getvalue())
+        self.assertEqual(User.objects.get(pk=seeded.pk).points, 42)
+
+        self.assertEqual(snapshot_unlogged_users(), 1)
+        self.assertEqual(snapshot_unlogged_users(), 0)
+        self.assertEqual(self.logged_points(seeded), 42)
+
+
+class MetricsTests(TestCase):
+    """Test the instrumentation middleware and the /metrics endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.delete(metrics.WORKERS_KEY)
+        metrics.registry.reset()
+        for i in range(3):
+            User.objects.create(name=f"Metrics User {i}", age=30, address=f"{i} Metrics St", points=i)
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    @override_settings(METRICS_SAMPLE_RATE=1.0, LEADERBOARD_CACHE_ENABLED=False)
+    def test_sampled_request(self):
+        """Test a sampled request records its view, queries, database and render time"""
+        self.client.get(reverse('api:user-list'))
+        body = self.scrape()
+        self.assertIn('leaderboard_requests_total{view="api:user-list",method="GET",status="200"} 1\n', body)
+        self.assertIn('leaderboard_requests_sampled_total{view="api:user-list"} 1\n', body)
+        self.assertIn('leaderboard_request_db_queries_bucket{view="api:user-list",le="1"} 1\n', body)
+        self.assertIn('leaderboard_request_db_queries_bucket{view="api:user-list",le="0"} 0\n', body)
+        self.assertIn('leaderboard_request_render_duration_seconds_count{view="api:user-list"} 1\n', body)
+        self.assertIn('leaderboard_request_db_duration_seconds_count{view="api:user-list"} 1\n', body)
+        self.assertIn('# TYPE leaderboard_request_duration_seconds histogram\n', body)
+
+    @override_settings(METRICS_SAMPLE_RATE=0.0)
+    def test_unsampled_request(self):
+        """Test an unsampled request only counts towards the request metrics"""
+        self.client.get(reverse('api:user-detail', args=[User.objects.first().id]))
+        self.client.get('/api/no-such-endpoint/')
+        body = self.scrape()
+        self.assertIn('leaderboard_request_duration_seconds_count{view="api:user-detail"} 1\n', body)
+        self.assertIn('leaderboard_requests_total{view="<unresolved>",method="GET",status="404"} 1\n', body)
+        self.assertNotIn('leaderboard_requests_sampled_total{', body)
+        self.assertNotIn('leaderboard_request_db_queries_bucket{', body)
+
+    @override_settings(METRICS_N_PLUS_ONE_THRESHOLD=3)
+    def test_n_plus_one_flagged(self):
+        """Test a statement repeated in one request is flagged as N+1"""
+        request = APIRequestFactory().get('/api/winners/')
+        request.resolver_match = resolve('/api/winners/')
+        sample = metrics.Sample()
+        sample.queries = 4
+        sample.statements = {'SELECT "api_user"."id" FROM "api_user" WHERE "api_user"."id" = %s': 3, 'SELECT 1': 1}
+        response = HttpResponse()
+        with self.assertLogs('api.metrics', 'WARNING') as logs:
+            metrics.record_request(request, response, 0.01, sample)
+        self.assertIn('Possible N+1 in api:winner-list: 3 runs of SELECT "api_user"', logs.output[0])
+        sample.statements = {'SELECT 1': 2}
+        metrics.record_request(request, response, 0.01, sample)
+        self.assertIn('leaderboard_n_plus_one_total{view="api:winner-list"} 1\n', self.scrape())
+
+    @override_settings(METRICS_SAMPLE_RATE=0.0)
+    def test_workers_merged(self):
+        """Test /metrics adds up the metrics published by the other workers"""
+        self.client.get(reverse('api:winner-list'))
+        other = metrics.Registry()
+        other.worker = 'other-host:1'
+        other.inc('leaderboard_requests_total', (('view', 'api:winner-list'), ('method', 'GET'), ('status', 200)), 4)
+        other.observe('leaderboard_request_duration_seconds', (('view', 'api:winner-list'),), 0.002)
+        other.publish()
+        body = self.scrape()
+        self.assertIn('leaderboard_requests_total{view="api:winner-list",method="GET",status="200"} 5\n', body)
+        self.assertIn('leaderboard_request_duration_seconds_count{view="api:winner-list"} 2\n', body)
+
+
+class TaskMetricsTests(TestCase):
+    """Test the winner task's direct service call and the Celery task metrics"""
+
+    task = 'api.tasks.update_winners_task'
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.delete(metrics.WORKERS_KEY)
+        metrics.registry.reset()
+        self.leader = User.objects.create(name="Task Leader", age=30, address="1 Task St", points=20)
+        self.other = User.objects.create(name="Task Other", age=30, address="2 Task St", points=10)
+
+    def scrape(self):
+        return self.client.get(reverse('metrics')).content.decode()
+
+    def test_winner_task_outcomes(self):
+        """Test update_winners_task declares, skips and reports ties without the view"""
+        with mock.patch('api.views.update_winners') as view:
+            result = update_winners_task.apply(headers={'due_at': time.time() - 40}).get()
+            self.assertEqual(result, {'status': 'success', 'winner': "Task Leader", 'points': 20})
+            self.assertEqual(update_winners_task.apply().get()['status'], 'skipped')
+            self.other.points = 20
+            self.other.save()
+            self.assertEqual(update_winners_task.apply().get()['status'], 'tie')
+            with mock.patch('api.tasks.single_flight_winner', side_effect=RuntimeError('database is locked')), \
+                    self.assertLogs('api.tasks', 'ERROR'):
+                self.assertEqual(update_winners_task.apply().get()['status'], 'error')
+        view.assert_not_called()
+        self.assertEqual(Winner.objects.count(), 1)
+
+        body = self.scrape()
+        for outcome in ('success', 'skipped', 'tie', 'error'):
+            self.assertIn(f'leaderboard_task_runs_total{{task="{self.task}",outcome="{outcome}"}} 1\n', body)
+        self.assertIn(f'leaderboard_task_duration_seconds_count{{task="{self.task}"}} 4\n', body)
+        self.assertIn(f'leaderboard_task_queue_lag_seconds_bucket{{task="{self.task}",le="30.0"}} 0\n', body)
+        self.assertIn(f'leaderboard_task_queue_lag_seconds_bucket{{task="{self.task}",le="60.0"}} 1\n', body)
+        self.assertIn(f'leaderboard_task_last_completed_timestamp_seconds{{task="{self.task}"}} ', body)
+
+    def test_published_due_time(self):
+        """Test published tasks are stamped with the time they are due"""
+        headers = {}
+        metrics.task_published(headers=headers)
+        self.assertAlmostEqual(headers['due_at'], time.time(), delta=5)
+        eta = timezone.now() + timedelta(minutes=10)
+        headers = {'eta': eta.isoformat()}
+        metrics.task_published(headers=headers)
+        self.assertAlmostEqual(headers['due_at'], eta.timestamp(), delta=0.001)
+
+    def test_update_winners_view_uses_service(self):
+        """Test the endpoint shapes the single_flight_winner() outcomes"""
+        url = reverse('api:update-winners')
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_201_CREATED)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['winner']['user']['name'], "Task Leader")
+        with mock.patch('api.views.single_flight_winner', return_value=('tie', None)):
+            self.assertEqual(self.client.post(url).data['status'], 'tie')
+
+
+class BenchmarkCommandTests(TransactionTestCase):
+    """Test the benchmark command's saved results and baseline comparison"""
+
+    def run_benchmark(self, **options):
+        stdout = io.StringIO()
+        call_command(
+            'benchmark', 'hot_paths', users=60, iterations=2, deep_page=2, winners=25,
+            stdout=stdout, stderr=io.StringIO(), **options,
+        )
+        return stdout.getvalue()
+
+    def test_results_saved_and_compared(self):
+        """Test a run is saved as JSON, cleaned up and compared with a baseline"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            self.run_benchmark(output=path)
+            with open(path) as f:
+                report = json.load(f)
+            self.assertEqual(User.objects.count(), 0)
+            self.assertEqual(Winner.objects.count(), 0)
+            self.assertEqual(report['environment']['database'], connection.vendor)
+            self.assertEqual(report['options']['users'], 60)
+            names = [result['name'] for result in report['scenarios']['hot_paths']]
+            for name in ('update_score', 'users page 1', 'users page 2', 'grouped_by_score',
+                         'update_winners', 'winners page 1'):
+                self.assertIn(name, names)
+
+            self.assertIn('No case is more than', self.run_benchmark(compare=path, threshold=10000))
+
+            for result in report['scenarios']['hot_paths']:
+                result['p50_ms'] = 0.0001
+            with open(path, 'w') as f:
+                json.dump(report, f)
+            with self.assertRaisesMessage(CommandError, 'slower than the baseline'):
+                self.run_benchmark(compare=path)
+
+    def test_writes_commit_and_existing_rows_kept(self):
+        """Test the write cases commit, touch only seeded users, and the run deletes its rows"""
+        existing = User.objects.create(name="Existing", age=30, address="1 Kept St", points=7)
+        rebuild_buckets()
+        events = list(ScoreEvent.objects.values_list('id', flat=True))
+        executed = []
+        on_commit = transaction.on_commit
+
+        def record(func, *args, **kwargs):
+            def run():
+                executed.append(func)
+                func()
+            return on_commit(run, *args, **kwargs)
+
+        with mock.patch('django.db.transaction.on_commit', side_effect=record):
+            self.run_benchmark()
+
+        # The update_score and update_winners on-commit work ran
+        self.assertGreater(len(executed), 2)
+        self.assertEqual(list(User.objects.values_list('id', 'points')), [(existing.id, 7)])
+        self.assertFalse(Winner.objects.exists())
+        self.assertEqual(list(ScoreEvent.objects.values_list('id', flat=True)), events)
+        self.assertEqual(verify_buckets(), [])
+
+
+class BoardTests(TestCase):
+    """Test the independent per-board leaderboards"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.users = [
+            User.objects.create(name=f"Board User {i}", age=20 + i, address=f"{i} Board St", points=50)
+            for i in range(3)
+        ]
+        self.chess = Leaderboard.objects.create(slug='chess', name='Chess')
+        self.go = Leaderboard.objects.create(slug='go', name='Go')
+
+    def score(self, board, user, change):
+        url = reverse('api:board-update-score', kwargs={'slug': board.slug, 'user_id': user.id})
+        return self.client.patch(url, {'change': change}, format='json')
+
+    def test_boards_are_independent(self):
+        """Test scores and ranks on one board leave the others and User.points alone"""
+        response = self.score(self.chess, self.users[0], 5)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'id': self.users[0].id, 'name': "Board User 0", 'points': 5})
+        self.assertEqual(self.score(self.chess, self.users[0], 2).data['points'], 7)
+        self.score(self.chess, self.users[1], 9)
+        self.score(self.go, self.users[0], 30)
+
+        response = self.client.get(reverse('api:board-users', kwargs={'slug': 'chess'}))
+        self.assertEqual(
+            [(row['id'], row['points']) for row in response.data['results']],
+            [(self.users[1].id, 9), (self.users[0].id, 7)],
+        )
+        response = self.client.get(reverse('api:board-top', kwargs={'slug': 'go'}))
+        self.assertEqual(response.data, [{'id': self.users[0].id, 'name': "Board User 0", 'points': 30, 'rank': 1}])
+        response = self.client.get(
+            reverse('api:board-user-rank', kwargs={'slug': 'chess', 'user_id': self.users[0].id})
+        )
+        self.assertEqual(response.data, {'id': self.users[0].id, 'points': 7, 'rank': 2})
+        self.assertEqual(User.objects.get(pk=self.users[0].id).points, 50)
+
+    def test_not_found(self):
+        """Test unknown boards, users and unranked users are 404s"""
+        self.assertEqual(self.score(Leaderboard(slug='poker'), self.users[0], 1).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.score(self.chess, User(id=999999), 1).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(
+            reverse('api:board-user-rank', kwargs={'slug': 'chess', 'user_id': self.users[2].id})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_board_crud(self):
+        """Test boards are created and listed by slug"""
+        response = self.client.post(reverse('api:board-list'), {'slug': 'darts', 'name': 'Darts'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.get(reverse('api:board-detail', kwargs={'slug': 'darts'}))
+        self.assertEqual(response.data['name'], 'Darts')
+        response = self.client.get(reverse('api:board-list'))
+        self.assertEqual([row['slug'] for row in response.data['results']], ['chess', 'go', 'darts'])
+
+    def test_board_winners(self):
+        """Test a board's winner job, its tie rule and its winners list"""
+        self.score(self.chess, self.users[0], 4)
+        self.score(self.chess, self.users[1], 4)
+        response = self.client.post(reverse('api:board-update-winners', kwargs={'slug': 'chess'}))
+        self.assertEqual(response.data['status'], 'no_winner')
+
+        self.score(self.chess, self.users[1], 1)
+        response = self.client.post(reverse('api:board-update-winners', kwargs={'slug': 'chess'}))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        winner = response.data['winner']
+        self.assertEqual((winner['user'], winner['points_at_win']), (self.users[1].id, 5))
+        self.assertEqual((winner['runner_up_points'], winner['players']), (4, 2))
+
+        response = self.client.get(reverse('api:board-winners', kwargs={'slug': 'chess'}))
+        self.assertEqual([row['user_name'] for row in response.data['results']], ["Board User 1"])
+        response = self.client.get(reverse('api:board-winners', kwargs={'slug': 'go'}))
+        self.assertEqual(response.data['results'], [])
+
+    def test_winner_fan_out(self):
+        """Test update_winners_task queues the boards in batches"""
+        self.score(self.go, self.users[2], 3)
+        with override_settings(BOARD_WINNER_BATCH_SIZE=1), \
+                mock.patch('api.tasks.update_board_winners_task.delay') as delay:
+            update_winners_task()
+        self.assertEqual(delay.call_args_list, [mock.call([self.chess.id]), mock.call([self.go.id])])
+
+        result = update_board_winners_task([self.chess.id, self.go.id])
+        self.assertEqual(result, {'status': 'success', 'boards': 2, 'declared': 1, 'errors': 0})
+        self.assertEqual(BoardWinner.objects.get().board_id, self.go.id)
+
+
+class ScoreBucketTests(TestCase):
+    """Test cases for the incrementally maintained score buckets"""
+
+    def setUp(self):
+        """Set up test data and client"""
+        self.client = APIClient()
+        self.user1 = User.objects.create(name="Bucket User 1", age=20, address="1 Bucket Rd", points=10)
+        self.user2 = User.objects.create(name="Bucket User 2", age=40, address="2 Bucket Rd", points=10)
+
+    def bucket(self, points):
+        return ScoreBucket.objects.filter(points=points).values_list('count', 'age_sum').first()
+
+    def test_create_fills_bucket(self):
+        """Test new users are added to their score bucket"""
+        self.assertEqual(self.bucket(10), (2, 60))
+
+    def test_update_score_moves_user(self):
+        """Test a score change moves the user to the new bucket"""
+        self.client.patch(
+            reverse('api:user-update-score', kwargs={'pk': self.user1.pk}),
+            data=json.dumps({'change': 5}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(self.bucket(10), (1, 40))
+        self.assertEqual(self.bucket(15), (1, 20))
+        self.assertEqual(verify_buckets(), [])
+
+    def test_put_and_delete(self):
+        """Test full updates and deletes keep the buckets consistent"""
+        self.client.put(
+            reverse('api:user-detail', kwargs={'pk': self.user1.pk}),
+            data=json.dumps({'name': 'Bucket User 1', 'age': 30, 'address': '1 Bucket Rd', 'points': 7}),
+            content_type='application/json'
+        )
+        self.assertEqual(self.bucket(7), (1, 30))
+        self.assertEqual(self.bucket(10), (1, 40))
+
+        self.client.delete(reverse('api:user-detail', kwargs={'pk': self.user2.pk}))
+        self.assertEqual(self.bucket(10), (0, 0))
+        self.assertEqual(verify_buckets(), [])
+
+    def test_rebuild_repairs_drift(self):
+        """Test the rebuild replaces buckets that missed a change"""
+        User.objects.filter(pk=self.user2.pk).update(points=3)
+        self.assertNotEqual(verify_buckets(), [])
+
+        self.assertEqual(rebuild_buckets(), 2)
+        self.assertEqual(verify_buckets(), [])
+
+
+class ConcurrentScoreUpdateTests(TransactionTestCase):
+    """Fire many parallel score updates and check that none are lost"""
+
+    WORKERS = 8
+    INCREMENTS = 2000
+
+    def setUp(self):
+        self.user = User.objects.create(name="Hot User", age=30, address="1 Busy St", points=0)
+
+    def _increment(self, change):
+        client = APIClient()
+        try:
+            for _ in range(3):
+                response = client.patch(
+                    reverse('api:user-update-score', kwargs={'pk': self.user.pk}),
+                    data=json.dumps({'change': change}),
+                    content_type='application/json'
+                )
+                if response.status_code == status.HTTP_200_OK:
+                    return change
+            return 0
+        finally:
+            connection.close()
+
+    def test_parallel_increments(self):
+        """Test the final total equals the sum of all applied changes"""
+        changes = [1 if i % 4 else -1 for i in range(self.INCREMENTS)]
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            applied = list(pool.map(self._increment, changes))
+
+        self.user.refresh_from_db()
+        self.assertEqual(applied.count(0), 0)
+        self.assertEqual(self.user.points, sum(changes))
+        self.assertEqual(verify_buckets(), [])
+
+
+class SortedKeyListTests(TestCase):
+    """Test cases for the skip list behind the rank index"""
+
+    def test_matches_sorted_list(self):
+        """Test random inserts and removes against a plain sorted list"""
+        rng = random.Random(42)
+        keys = SortedKeyList()
+        expected = []
+        for _ in range(2000):
+            key = (rng.randint(-50, 50), rng.randint(1, 500))
+            if key in expected:
+                keys.remove(key)
+                expected.remove(key)
+            else:
+                keys.insert(key)
+                expected.append(key)
+                expected.sort()
+
+        self.assertEqual(len(keys), len(expected))
+        self.assertEqual(list(keys), expected)
+        for position in rng.sample(range(len(expected)), 50):
+            self.assertEqual(keys[position], expected[position])
+            self.assertEqual(keys.index(expected[position]), position)
+        self.assertEqual(keys.slice(10, 20), expected[10:20])
+
+    def test_missing_key(self):
+        """Test removing or looking up a missing key raises KeyError"""
+        keys = SortedKeyList()
+        keys.insert((1, 1))
+        with self.assertRaises(KeyError):
+            keys.remove((2, 2))
+        with self.assertRaises(KeyError):
+            keys.index((0, 0))
+
+
+class LeaderboardRankTests(TestCase):
+    """Test cases for the rank, top and neighbors endpoints"""
+
+    def setUp(self):
+        """Set up test data and client"""
+        self.client = APIClient()
+        leaderboard_index.reset()
+        self.users = [
+            User.objects.create(name=f"Rank User {i}", age=20 + i, address="1 Rank Rd", points=points)
+            for i, points in enumerate([50, 40, 40, 30, 20, 10])
+        ]
+
+    def test_rank(self):
+        """Test ranks follow points descending with ties broken by id"""
+        response = self.client.get(reverse('api:user-rank', kwargs={'pk': self.users[2].pk}))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['rank'], 3)
+        self.assertEqual(response.data['total'], 6)
+
+    def test_rank_missing_user(self):
+        """Test the rank of an unknown user is a 404"""
+        response = self.client.get(reverse('api:user-rank', kwargs={'pk': 999999}))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_top(self):
+        """Test the top-n endpoint returns users in rank order"""
+        response = self.client.get(reverse('api:user-top'), {'n': 3})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([user['id'] for user in response.data], [u.pk for u in self.users[:3]])
+        self.assertEqual([user['rank'] for user in response.data], [1, 2, 3])
+
+    def test_top_invalid_n(self):
+        """Test a malformed n is rejected"""
+        response = self.client.get(reverse('api:user-top'), {'n': 'many'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_neighbors(self):
+        """Test the users around a player are returned with their ranks"""
+        response = self.client.get(
+            reverse('api:user-neighbors', kwargs={'pk': self.users[3].pk}),
+            {'radius': 1}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['rank'], 4)
+        self.assertEqual([user['id'] for user in response.data['results']], [u.pk for u in self.users[2:5]])
+        self.assertEqual([user['rank'] for user in response.data['results']], [3, 4, 5])
+
+    def test_index_follows_writes(self):
+        """Test score updates, creates and deletes move users in the index"""
+        leaderboard_index.rebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse('api:user-update-score', kwargs={'pk': self.users[5].pk}),
+                data=json.dumps({'change': 100}),
+                content_type='application/json'
+            )
+        self.assertEqual(leaderboard_index.rank(self.users[5].pk), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('api:user-list'),
+                data=json.dumps({'name': 'Late Joiner', 'age': 22, 'address': '2 Rank Rd', 'points': 45}),
+                content_type='application/json'
+            )
+        self.assertEqual(leaderboard_index.rank(response.data['id']), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('api:user-detail', kwargs={'pk': self.users[0].pk}))
+        self.assertIsNone(leaderboard_index.rank(self.users[0].pk))
+        self.assertEqual(leaderboard_index.verify(), [])
+
+    def test_verify_detects_drift(self):
+        """Test the consistency check reports changes the index missed"""
+        leaderboard_index.rebuild()
+        User.objects.filter(pk=self.users[5].pk).update(points=1000)
+
+        self.assertNotEqual(leaderboard_index.verify(), [])
+        leaderboard_index.rebuild()
+        self.assertEqual(leaderboard_index.verify(), [])
+
+
+class RedisLeaderboardTests(RedisTestMixin, TestCase):
+    """Test cases for the Redis sorted set leaderboard"""
+
+    def setUp(self):
+        """Set up test data and client"""
+        super().setUp()
+        self.client = APIClient()
+        self.store = RedisLeaderboard(self.redis)
+        self.users = [
+            User.objects.create(name=f"Redis User {i}", age=20 + i, address="1 Sorted Set", points=points)
+            for i, points in enumerate([5, 30, 30, 10])
+        ]
+
+    def test_list_reads_sorted_set(self):
+        """Test the users list is paged from the sorted set in rank order"""
+        response = self.client.get(reverse('api:user-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(
+            [user['id'] for user in response.data['results']],
+            [self.users[1].pk, self.users[2].pk, self.users[3].pk, self.users[0].pk]
+        )
+        self.assertEqual(self.redis.zcard(self.store.key), 4)
+
+    def test_list_cursor(self):
+        """Test the sorted set pages are linked with cursors, like the keyset pages"""
+        first = self.client.get(reverse('api:user-list'), {'page_size': 3})
+        self.assertNotIn('count', first.data)
+        self.assertIsNone(first.data['previous'])
+
+        second = self.client.get(first.data['next'])
+        self.assertEqual([user['id'] for user in second.data['results']], [self.users[0].pk])
+        self.assertIsNone(second.data['next'])
+
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [user['id'] for user in back.data['results']],
+            [self.users[1].pk, self.users[2].pk, self.users[3].pk]
+        )
+
+    def test_list_rejects_keyset_cursor(self):
+        """Test a cursor of the keyset pagination is a 404, not page 1"""
+        cursor = KeysetPagination.encode_position([30, self.users[1].pk])
+        response = self.client.get(reverse('api:user-list'), {'cursor': cursor})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_legacy_page_numbers(self):
+        """Test ?page= keeps the page-number response with a count"""
+        response = self.client.get(reverse('api:user-list'), {'page': 1})
+
+        self.assertEqual(response.data['count'], 4)
+
+    def test_list_fields(self):
+        """Test ?fields= narrows the rows read for the sorted set page"""
+        response = self.client.get(reverse('api:user-list'), {'fields': 'name'})
+
+        self.assertEqual(
+            response.data['results'],
+            [{'name': f"Redis User {i}"} for i in (1, 2, 3, 0)]
+        )
+
+    def test_overlapping_rebuilds(self):
+        """Test a rebuild started while another fills its set still swaps in every user"""
+        User.objects.bulk_create(
+            User(name=f"Bulk {i}", age=30, address="1 Sorted Set", points=i % 50) for i in range(2500)
+        )
+        zadd = self.redis.zadd
+        nested = []
+
+        def zadd_then_rebuild(key, *args, **kwargs):
+            result = zadd(key, *args, **kwargs)
+            if not nested:
+                # Another worker's rebuild runs between this one's batches
+                nested.append(None)
+                nested[0] = RedisLeaderboard(self.redis).rebuild()
+            return result
+
+        with mock.patch.object(self.redis, 'zadd', side_effect=zadd_then_rebuild):
+            self.assertEqual(self.store.rebuild(), 2504)
+
+        self.assertEqual(nested, [2504])
+        self.assertEqual(self.redis.zcard(self.store.key), 2504)
+        self.assertEqual(self.redis.keys(f'{self.store.key}:rebuild*'), [])
+
+    def test_update_score_increments_sorted_set(self):
+        """Test a score change is applied to the sorted set on commit"""
+        self.store.rebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse('api:user-update-score', kwargs={'pk': self.users[0].pk}),
+                data=json.dumps({'change': 40}),
+                content_type='application/json'
+            )
+
+        response = self.client.get(reverse('api:user-rank', kwargs={'pk': self.users[0].pk}))
+        self.assertEqual(response.data['rank'], 1)
+        self.assertEqual(self.store.top(1), [(self.users[0].pk, 45)])
+        self.assertEqual(self.store.verify(), [])
+
+    def test_writes_skipped_until_built(self):
+        """Test writes never create a partial sorted set"""
+        self.store.increment(self.users[0].pk, 1, 6)
+
+        self.assertFalse(self.redis.exists(self.store.key))
+        self.assertEqual(self.store.count(), 4)
+
+    def test_neighbors(self):
+        """Test the users around a player come from the sorted set"""
+        response = self.client.get(
+            reverse('api:user-neighbors', kwargs={'pk': self.users[2].pk}),
+            {'radius': 1}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['rank'], 2)
+        self.assertEqual(
+            [user['id'] for user in response.data['results']],
+            [self.users[1].pk, self.users[2].pk, self.users[3].pk]
+        )
+
+    def test_reconcile_task_repairs_drift(self):
+        """Test the reconcile task fixes scores and drops deleted users"""
+        self.store.rebuild()
+        User.objects.filter(pk=self.users[3].pk).update(points=99)
+        self.redis.zadd(self.store.key, {'0': 1})
+
+        result = reconcile_leaderboard_task()
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['repaired'], 1)
+        self.assertEqual(result['removed'], 1)
+        self.assertEqual(self.store.verify(), [])
+
+
+@override_settings(SCORE_WRITE_BEHIND=True)
+class WriteBehindScoreTests(RedisTestMixin, TestCase):
+    """Test cases for the write-behind score buffer"""
+
+    def setUp(self):
+        """Set up test data and client"""
+        super().setUp()
+        self.client = APIClient()
+        self.store = RedisLeaderboard(self.redis)
+        self.buffer = ScoreBuffer(self.redis)
+        self.users = [
+            User.objects.create(name=f"Buffered User {i}", age=20 + i, address="1 Buffer Ln", points=points)
+            for i, points in enumerate([10, 20, 5])
+        ]
+        self.store.rebuild()
+
+    def _click(self, user, change):
+        return self.client.patch(
+            reverse('api:user-update-score', kwargs={'pk': user.pk}),
+            data=json.dumps({'change': change}),
+            content_type='application/json'
+        )
+
+    def test_update_score_is_buffered(self):
+        """Test a click returns the projected score without writing the row"""
+        self._click(self.users[0], 1)
+        response = self._click(self.users[0], 15)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['points'], 26)
+        self.assertEqual(User.objects.get(pk=self.users[0].pk).points, 10)
+        self.assertEqual(self.buffer.pending(), {self.users[0].pk: 16})
+
+        detail = self.client.get(reverse('api:user-detail', kwargs={'pk': self.users[0].pk}))
+        self.assertEqual(detail.data['points'], 26)
+        self.assertEqual(self.store.top(1), [(self.users[0].pk, 26)])
+
+    def test_update_score_not_found(self):
+        """Test clicks for missing users are not buffered"""
+        response = self.client.patch(
+            reverse('api:user-update-score', kwargs={'pk': 999999}),
+            data=json.dumps({'change': 1}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.buffer.pending(), {})
+
+    def test_top_and_neighbors_show_projected_points(self):
+        """Test the ranked endpoints show the buffered points they are ordered by"""
+        self._click(self.users[2], 20)
+
+        top = self.client.get(reverse('api:user-top'), {'n': 2})
+        self.assertEqual([(user['id'], user['points']) for user in top.data], [
+            (self.users[2].pk, 25), (self.users[1].pk, 20),
+        ])
+
+        response = self.client.get(reverse('api:user-neighbors', kwargs={'pk': self.users[2].pk}), {'radius': 1})
+        self.assertEqual(response.data['rank'], 1)
+        self.assertEqual([user['points'] for user in response.data['results']], [25, 20])
+
+    def test_flush_applies_buffer_once(self):
+        """Test a flush writes the coalesced changes and empties the buffer"""
+        for _ in range(3):
+            self._click(self.users[2], 10)
+        self._click(self.users[1], -4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = flush_score_buffer_task()
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['users'], 2)
+        self.assertEqual(User.objects.get(pk=self.users[2].pk).points, 35)
+        self.assertEqual(User.objects.get(pk=self.users[1].pk).points, 16)
+        self.assertEqual(self.buffer.pending(), {})
+        self.assertEqual(self.store.verify(), [])
+        self.assertEqual(verify_buckets(), [])
+
+    def test_flush_retries_crashed_claim(self):
+        """Test a claim left by a crashed flush is applied by the next one"""
+        self._click(self.users[0], 7)
+        token = self.buffer.claim()
+        self._click(self.users[0], 1)
+
+        self.assertEqual(self.buffer.pending(), {self.users[0].pk: 8})
+        result = flush_score_buffer()
+
+        self.assertEqual(result['claims'], 2)
+        self.assertEqual(User.objects.get(pk=self.users[0].pk).points, 18)
+        self.assertTrue(ScoreFlush.objects.filter(token=token).exists())
+        self.assertEqual(self.buffer.claims(), [])
+
+    def test_flush_skips_applied_claim(self):
+        """Test a claim that was applied before a crash is only released"""
+        self._click(self.users[0], 7)
+        token = self.buffer.claim()
+        ScoreFlush.objects.create(token=token, users=1)
+
+        result = flush_score_buffer()
+
+        self.assertEqual(result['claims'], 0)
+        self.assertEqual(User.objects.get(pk=self.users[0].pk).points, 10)
+        self.assertEqual(self.buffer.claims(), [])
+
+    def test_applied_claim_not_projected_twice(self):
+        """Test reads between a flush's commit and its release count the change once"""
+        self._click(self.users[0], 7)
+        token = self.buffer.claim()
+        # The flush committed, the claim is not released yet
+        ScoreFlush.objects.create(token=token, users=1)
+        User.objects.filter(pk=self.users[0].pk).update(points=17)
+
+        response = self.client.get(reverse('api:user-detail', kwargs={'pk': self.users[0].pk}))
+
+        self.assertEqual(response.data['points'], 17)
+        self.assertEqual(self.buffer.pending(), {})
+
+    def test_update_winners_sees_buffer(self):
+        """Test winner selection flushes buffered changes first"""
+        self._click(self.users[2], 100)
+
+        response = self.client.post(reverse('api:update-winners'))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['winner']['user']['id'], self.users[2].pk)
+        self.assertEqual(response.data['winner']['points_at_win'], 105)
+
+    def test_reconcile_keeps_buffered_changes(self):
+        """Test reconciling does not undo changes that are not flushed yet"""
+        self._click(self.users[0], 50)
+
+        result = self.store.reconcile()
+
+        self.assertEqual(result['repaired'], 0)
+        self.assertEqual(self.store.top(1), [(self.users[0].pk, 60)])
+
+    def test_disabled_without_setting(self):
+        """Test update_score writes through when write-behind is off"""
+        with override_settings(SCORE_WRITE_BEHIND=False):
+            self._click(self.users[0], 5)
+            self.assertEqual(flush_score_buffer_task(), {'status': 'disabled'})
+
+        self.assertEqual(User.objects.get(pk=self.users[0].pk).points, 15)
+        self.assertEqual(self.buffer.pending(), {})
+
+
+class LeaderboardEventTests(TestCase):
+    """Test cases for the events published to the live stream"""
+
+    def setUp(self):
+        """Set up test data and client"""
+        self.client = APIClient()
+        self.user = User.objects.create(name="Live User", age=30, address="1 Stream St", points=10)
+        self.other = User.objects.create(name="Other User", age=40, address="2 Stream St", points=12)
+        patcher = mock.patch.object(local_broker, 'publish')
+        self.publish = patcher.start()
+        self.addCleanup(patcher.stop)
+        leaderboard_index.reset()
+
+    def _frames(self):
+        return [call.args[0] for call in self.publish.call_args_list]
+
+    def test_update_score_publishes_rank_delta(self):
+        """Test a score change is published as an [id, points, rank] delta"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse('api:user-update-score', kwargs={'pk': self.user.pk}),
+                data=json.dumps({'change': 5}),
+                content_type='application/json'
+            )
+
+        self.assertEqual(self._frames(), [f'event: scores\ndata: [[{self.user.pk},15,1]]\n\n'])
+
+    def test_bulk_update_publishes_one_event(self):
+        """Test a bulk update is published as one event"""
+        items = [{'id': self.user.pk, 'change': 1}, {'id': self.other.pk, 'change': 1}]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('api:user-bulk-update-scores'), data=json.dumps(items), content_type='application/json')
+
+        self.assertEqual(self._frames(), [format_event('scores', [[self.user.pk, 11, 2], [self.other.pk, 13, 1]])])
+
+    def test_user_and_winner_events(self):
+        """Test user edits, deletes and new winners are published"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('api:user-detail', kwargs={'pk': self.user.pk}), {'name': "Renamed"}, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('api:update-winners'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('api:user-detail', kwargs={'pk': self.user.pk}))
+
+        events = [frame.split('\n')[0] for frame in self._frames()]
+        self.assertEqual(events, ['event: user', 'event: winner', 'event: user_deleted'])
+        user = json.loads(self._frames()[0].split('\n')[1][len('data: '):])
+        self.assertEqual((user['name'], user['rank']), ("Renamed", 2))
+
+
+class LeaderboardEventRedisTests(RedisTestMixin, TestCase):
+    """Test events fan out through Redis pub/sub"""
+
+    def test_publish_through_redis(self):
+        """Test events are published on the Redis channel"""
+        user = User.objects.create(name="Fanout User", age=30, address="3 Stream St", points=3)
+        pubsub = self.redis.pubsub()
+        pubsub.subscribe('leaderboard:events')
+        pubsub.get_message(timeout=1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse('api:user-update-score', kwargs={'pk': user.pk}),
+                data=json.dumps({'change': 2}),
+                content_type='application/json'
+            )
+
+        message = pubsub.get_message(timeout=1)
+        self.assertEqual(message['data'], format_event('scores', [[user.pk, 5, 1]]))
+
+
+class LeaderboardStreamTests(SimpleTestCase):
+    """Test the Server-Sent Events endpoint"""
+
+    async def test_stream_delivers_frames(self):
+        """Test a connected client receives published frames"""
+        response = await self.async_client.get(reverse('api:stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = aiter(response.streaming_content)
+
+        self.assertEqual(await anext(content), b'retry: 3000\n\n')
+        frame = format_event('winner', {'id': 1})
+        pending = asyncio.ensure_future(anext(content))
+        await asyncio.sleep(0)
+        local_broker.publish(frame)
+        self.assertEqual(await asyncio.wait_for(pending, 1), frame.encode())
+        await content.aclose()
+
+    @override_settings(LEADERBOARD_STREAM_HEARTBEAT_SECONDS=0)
+    async def test_stream_heartbeat(self):
+        """Test an idle stream sends comment heartbeats"""
+        response = await self.async_client.get(reverse('api:stream'))
+        content = aiter(response.streaming_content)
+        await anext(content)
+
+        self.assertEqual(await asyncio.wait_for(anext(content), 1), b': ping\n\n')
+        await content.aclose()
+
+    def test_stream_not_served_under_wsgi(self):
+        """Test a WSGI worker answers 204 instead of holding the stream"""
+        response = self.client.get(reverse('api:stream'))
+
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+    async def test_page_enables_live_updates_under_asgi(self):
+        """Test the page only opens the stream when served by ASGI"""
+        response = await sync_to_async(self.client.get)(reverse('index'))
+        self.assertContains(response, 'data-live-updates="false"')
+
+        response = await self.async_client.get(reverse('index'))
+        self.assertContains(response, 'data-live-updates="true"')
+
+
+class WinnerViewSetTests(TestCase):
+    """Test cases for the WinnerViewSet"""
+    
+    def setUp(self):
+        """Set up test data and client"""
+        self.client = APIClient()
+        
+        # Create test users
+        self.user1 = User.objects.create(
+            name="Winner Test User 1",
+            age=30,
+            address="123 Winner St",
+            points=20
+        )
+        
+        self.user2 = User.objects.create(
+            name="Winner Test User 2",
+            age=25,
+            address="456 Winner Ave",
+            points=15
+        )
+        
+        # Create test winners
+        self.winner1 = Winner.objects.create(
+            user=self.user1,
+            points_at_win=20,
+            timestamp=timezone.now() - timedelta(minutes=30)
+        )
+        
+        self.winner2 = Winner.objects.create(
+            user=self.user2,
+            points_at_win=15,
+            timestamp=timezone.now() - timedelta(hours=1)
+        )
+    
+    def test_get_all_winners(self):
+        """Test retrieving all winners"""
+        response = self.client.get(reverse('api:winner-list'))
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+        
+        # Get the IDs of the winners in the response
+        winner_ids = [winner['id'] for winner in response.data['results']]
+        
+        # Check that both winners are in the response
+        self.assertIn(self.winner1.id, winner_ids)
+        self.assertIn(self.winner2.id, winner_ids)
+        
+        # Verify the order of winners in the response
+        # Get the timestamps from the response
+        timestamps = [winner['timestamp'] for winner in response.data['results']]
+        
+        # Check that timestamps are in descending order (most recent first)
+        self.assertTrue(timestamps[0] > timestamps[1], 
+                       f"First timestamp {timestamps[0]} should be more recent than second timestamp {timestamps[1]}")
+    
+    def test_get_single_winner(self):
+        """Test retrieving a single winner"""
+        response = self.client.get(reverse('api:winner-detail', kwargs={'pk': self.winner1.pk}))
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user']['name'], self.user1.name)
+        self.assertEqual(response.data['points_at_win'], 20)
+
+
+class WinnerRetentionTests(TestCase):
+    """Test the winner archive, its downsampling and the paging into it"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create(name="Retention User", age=30, address="1 Archive St", points=10)
+        self.now = timezone.datetime(2026, 10, 18, 12, 0, tzinfo=dt_timezone.utc)
+        # Every 20 minutes from 10 days ago 00:00 until 01:40, then one recent winner
+        start = self.now - timedelta(days=10, hours=12)
+        self.old = [self.win(start + timedelta(minutes=20 * i), points=i) for i in range(6)]
+        self.recent = self.win(self.now - timedelta(hours=1), points=100)
+
+    def win(self, timestamp, points):
+        winner = Winner.objects.create(user=self.user, points_at_win=points)
+        Winner.objects.filter(pk=winner.pk).update(timestamp=timestamp)
+        return winner
+
+    def test_downsamples_old_winners(self):
+        """Test old winners are moved out keeping the last winner of each hour"""
+        result = archive_winners(self.now)
+
+        self.assertEqual(result, {'moved': 6, 'archived': 2, 'expired': 0})
+        self.assertEqual(list(Winner.objects.values_list('id', flat=True)), [self.recent.id])
+        self.assertEqual(
+            list(WinnerArchive.objects.order_by('timestamp').values_list('id', 'points_at_win')),
+            [(self.old[2].id, 2), (self.old[5].id, 5)],
+        )
+        self.assertEqual(archive_winners(self.now)['moved'], 0)
+
+    @override_settings(WINNER_ARCHIVE_RESOLUTION_MINUTES=0, WINNER_RETENTION_DAYS=9)
+    def test_no_downsampling_and_expiry(self):
+        """Test resolution 0 archives every winner and retention drops the oldest"""
+        WinnerArchive.objects.create(
+            id=10 ** 9, user=self.user, points_at_win=1, timestamp=self.now - timedelta(days=30),
+        )
+        result = archive_winners(self.now)
+
+        self.assertEqual(result, {'moved': 6, 'archived': 6, 'expired': 7})
+        self.assertFalse(WinnerArchive.objects.exists())
+
+    def test_task(self):
+        """Test the Celery task reports what it moved"""
+        with mock.patch('api.winners.timezone.now', return_value=self.now):
+            result = archive_winners_task()
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['archived'], 2)
+
+    def test_list_pages_into_archive(self):
+        """Test the winners list runs on from the Winner table into the archive and back"""
+        archive_winners(self.now)
+        earlier = self.win(self.now - timedelta(hours=2), points=50)
+        url = reverse('api:winner-list')
+
+        # A page the Winner table fills never reads the archive
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'page_size': 1})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.recent.id])
+
+        response = self.client.get(replace_query_param(response.data['next'], 'page_size', 2))
+        self.assertEqual([row['id'] for row in response.data['results']], [earlier.id, self.old[5].id])
+        self.assertEqual(response.data['results'][0]['user']['name'], "Retention User")
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['id'] for row in response.data['results']], [self.old[2].id])
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([row['id'] for row in response.data['results']], [earlier.id, self.old[5].id])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([row['id'] for row in response.data['results']], [self.recent.id])
+        self.assertIsNone(response.data['previous'])
+
+        response = self.client.get(url, {'page': 1})
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(
+            [row['id'] for row in response.data['results']],
+            [self.recent.id, earlier.id, self.old[5].id, self.old[2].id],
+        )
+
+
+class WinnerSnapshotTests(TestCase):
+    """Test the winner snapshot and the join-free ?view=snapshot feed"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.leader = User.objects.create(name="Snapshot Leader", age=30, address="1 Snap St", points=30)
+        self.runner_up = User.objects.create(name="Snapshot Runner", age=40, address="2 Snap St", points=20)
+        User.objects.create(name="Snapshot Third", age=50, address="3 Snap St", points=5)
+
+    def test_snapshot_taken_at_win(self):
+        """Test update_winners stores the name, runner-up points and player count"""
+        response = self.client.post(reverse('api:update-winners'))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['winner']['user_name'], "Snapshot Leader")
+
+        winner = Winner.objects.get()
+        self.assertEqual(
+            (winner.user_name, winner.points_at_win, winner.runner_up_points, winner.players),
+            ("Snapshot Leader", 30, 20, 3),
+        )
+
+    def test_snapshot_view(self):
+        """Test ?view=snapshot reads only the winner table and keeps win-time values"""
+        self.client.post(reverse('api:update-winners'))
+        self.leader.name = "Renamed Leader"
+        self.leader.points = 99
+        self.leader.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api:winner-list'), {'view': 'snapshot'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(all('JOIN' not in query['sql'] for query in queries.captured_queries))
+        row = response.data['results'][0]
+        self.assertEqual(row['name'], "Snapshot Leader")
+        self.assertEqual(row['user_id'], self.leader.id)
+        self.assertEqual((row['points_at_win'], row['runner_up_points'], row['players']), (30, 20, 3))
+        self.assertNotIn('user', row)
+
+        # The default view still nests the live user
+        response = self.client.get(reverse('api:winner-list'))
+        self.assertEqual(response.data['results'][0]['user']['name'], "Renamed Leader")
+
+    def test_backfill(self):
+        """Test the migration backfills names of existing and archived winners"""
+        winners = [Winner.objects.create(user=self.leader, points_at_win=i) for i in range(3)]
+        WinnerArchive.objects.create(
+            id=10 ** 6, user=self.runner_up, points_at_win=1, timestamp=timezone.now() - timedelta(days=30),
+        )
+        migration = importlib.import_module('api.migrations.0009_winner_snapshot')
+        with mock.patch.object(migration, 'BACKFILL_BATCH_SIZE', 2):
+            migration.backfill_user_names(django_apps, None)
+
+        self.assertEqual(
+            set(Winner.objects.filter(pk__in=[w.pk for w in winners]).values_list('user_name', flat=True)),
+            {"Snapshot Leader"},
+        )
+        self.assertEqual(WinnerArchive.objects.get().user_name, "Snapshot Runner")
+
+    def test_archive_keeps_snapshot(self):
+        """Test archived winners carry their snapshot"""
+        self.client.post(reverse('api:update-winners'))
+        Winner.objects.update(timestamp=timezone.now() - timedelta(days=30))
+        archive_winners()
+
+        response = self.client.get(reverse('api:winner-list'), {'view': 'snapshot'})
+        row = response.data['results'][0]
+        self.assertEqual((row['name'], row['runner_up_points'], row['players']), ("Snapshot Leader", 20, 3))
+
+
+class UpdateWinnersTests(TestCase):
+    """Test cases for the update_winners endpoint"""
+    
+    def setUp(self):
+        """Set up test data and client"""
+        self.client = APIClient()
+        
+        # Create test users with same points (for tie scenario)
+        self.user1 = User.objects.create(
+            name="Update Winner User 1",
+            age=30,
+            address="123 Update St",
+            points=10
+        )
+        
+        self.user2 = User.objects.create(
+            name="Update Winner User 2",
+            age=25,
+            address="456 Update Ave",
+            points=10
+        )
+    
+    def test_update_winners_tie(self):
+        """Test update_winners with a tie scenario"""
+        response = self.client.post(reverse('api:update-winners'))
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'tie')
+        self.assertEqual(Winner.objects.count(), 0)  # No winner should be created
+    
+    def test_update_winners_success(self):
+        """Test update_winners with a clear winner"""
+        # Update one user to have higher points
+        self.user1.points = 15
+        self.user1.save()
+        
+        response = self.client.post(reverse('api:update-winners'))
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['status'], 'success')
+        self.assertEqual(Winner.objects.count(), 1)
+        
+        # Check the winner details
+        winner = Winner.objects.first()
+        self.assertEqual(winner.user, self.user1)
+        self.assertEqual(winner.points_at_win, 15)
+
+    def test_update_winners_round_trips(self):
+        """Test selection is one query between the lock and the insert"""
+        self.user1.points = 15
+        self.user1.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('api:update-winners'))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        statements = [q['sql'] for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(len(statements), 3, statements)
+
+    def test_update_winners_no_users(self):
+        """Test no winner is declared when there are no users"""
+        User.objects.all().delete()
+
+        response = self.client.post(reverse('api:update-winners'))
+
+        self.assertEqual(response.data['status'], 'tie')
+        self.assertEqual(Winner.objects.count(), 0)
+
+    def test_update_winners_deduplicates(self):
+        """Test a second call right after a win returns the same winner"""
+        self.user1.points = 15
+        self.user1.save()
+
+        first = self.client.post(reverse('api:update-winners'))
+        second = self.client.post(reverse('api:update-winners'))
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data['winner']['id'], first.data['winner']['id'])
+        self.assertEqual(Winner.objects.count(), 1)
+
+    def test_update_winners_interval_is_global(self):
+        """Test a new leader within the interval gets the previous winner back"""
+        self.user1.points = 15
+        self.user1.save()
+        first = select_winner()[1]
+        self.user2.points = 20
+        self.user2.save()
+
+        self.assertEqual(select_winner(), ('recent', first))
+        self.assertEqual(Winner.objects.count(), 1)
+
+    @override_settings(WINNER_MIN_INTERVAL_SECONDS=0)
+    def test_update_winners_after_interval(self):
+        """Test a new winner row is inserted once the interval has passed"""
+        self.user1.points = 15
+        self.user1.save()
+
+        self.client.post(reverse('api:update-winners'))
+        response = self.client.post(reverse('api:update-winners'))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Winner.objects.count(), 2)
+
+
+class ConcurrentUpdateWinnersTests(RedisTestMixin, TransactionTestCase):
+    """Trigger update_winners from several threads at once"""
+
+    def _trigger(self, _):
+        try:
+            return APIClient().post(reverse('api:update-winners')).status_code
+        finally:
+            connection.close()
+
+    @override_settings(LEADERBOARD_CACHE_ENABLED=True)
+    def test_fifty_triggers_single_flight(self):
+        """Test 50 simultaneous triggers select once, insert once and share the winner"""
+        User.objects.create(name="Leader", age=30, address="1 Top St", points=50)
+        User.objects.create(name="Runner Up", age=30, address="2 Top St", points=40)
+        triggers = 50
+        barrier = threading.Barrier(triggers)
+
+        def trigger(_):
+            barrier.wait()
+            try:
+                response = APIClient().post(reverse('api:update-winners'))
+                return response.status_code, response.data['winner']['id']
+            finally:
+                connection.close()
+
+        with mock.patch('api.winners.select_winner', wraps=select_winner) as select:
+            with ThreadPoolExecutor(max_workers=triggers) as pool:
+                results = list(pool.map(trigger, range(triggers)))
+
+        codes = [code for code, _ in results]
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), 1)
+        self.assertEqual(codes.count(status.HTTP_200_OK), triggers - 1)
+        self.assertEqual(len({winner_id for _, winner_id in results}), 1)
+        self.assertEqual(Winner.objects.count(), 1)
+        self.assertEqual(select.call_count, 1)
+
+    @override_settings(WINNER_LOCK_TTL_SECONDS=1)
+    def test_dead_lock_holder(self):
+        """Test a lock left by a dead caller expires and the selection still runs once"""
+        User.objects.create(name="Leader", age=30, address="1 Top St", points=50)
+        self.redis.set(FLIGHT_KEY, 'dead-worker', ex=1)
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            codes = list(pool.map(self._trigger, range(5)))
+
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), 1)
+        self.assertEqual(Winner.objects.count(), 1)
+
+    @override_settings(LEADERBOARD_CACHE_ENABLED=True)
+    def test_window_reuses_result_until_scores_change(self):
+        """Test later calls in the window share the result until a score changes"""
+        leader = User.objects.create(name="Leader", age=30, address="1 Top St", points=50)
+        User.objects.create(name="Runner Up", age=30, address="2 Top St", points=50)
+
+        with mock.patch('api.winners.select_winner', wraps=select_winner) as select:
+            self.assertEqual(single_flight_winner(), ('tie', None))
+            self.assertEqual(single_flight_winner(), ('tie', None))
+            self.assertEqual(select.call_count, 1)
+            apply_score_change(leader.id, 1)
+            outcome, winner = single_flight_winner()
+        self.assertEqual((outcome, winner.user_id), ('declared', leader.id))
+        self.assertEqual(select.call_count, 2)
+
+    def test_selection_error_runs_once(self):
+        """Test a failing selection raises once instead of running again as a fallback"""
+        for lock_free in (True, False):
+            self.redis.delete(FLIGHT_KEY)
+            if not lock_free:
+                self.redis.set(FLIGHT_KEY, 'dead-worker', ex=1)
+            with mock.patch('api.winners.select_winner', side_effect=RuntimeError('db down')) as select:
+                with self.assertRaises(RuntimeError):
+                    single_flight_winner()
+            self.assertEqual(select.call_count, 1)
+
+    def test_without_redis(self):
+        """Test the selection runs straight on the database lock without Redis"""
+        User.objects.create(name="Leader", age=30, address="1 Top St", points=50)
+
+        with mock.patch('api.redis_store.get_redis', return_value=None):
+            outcome, winner = single_flight_winner()
+            self.assertEqual(single_flight_winner(), ('recent', winner))
+        self.assertEqual(outcome, 'declared')
+
+    def test_concurrent_triggers_insert_once(self):
+        """Test concurrent triggers declare exactly one winner"""
+        User.objects.create(name="Leader", age=30, address="1 Top St", points=50)
+        User.objects.create(name="Runner Up", age=30, address="2 Top St", points=40)
+
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            codes = list(pool.map(self._trigger, range(10)))
+
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), 1)
+        self.assertEqual(codes.count(status.HTTP_200_OK), 9)
+        self.assertEqual(Winner.objects.count(), 1) 
\ No newline at end of file
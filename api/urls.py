@@ -1,14 +1,37 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UserViewSet, WinnerViewSet, update_winners
+from .views import (
+    BoardViewSet, LeaderboardViewSet, UserViewSet, WinnerViewSet, cache_stats, leaderboard_stream, update_winners,
+)
 
 app_name = 'api'
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
 router.register(r'winners', WinnerViewSet)
+router.register(r'boards', BoardViewSet, basename='board')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('update-winners/', update_winners, name='update-winners'),
-]
\ No newline at end of file
+    path('cache-stats/', cache_stats, name='cache-stats'),
+    path('stream/', leaderboard_stream, name='stream'),
+    path('leaderboards/<str:window>/', LeaderboardViewSet.as_view({'get': 'list'}), name='leaderboard-list'),
+    path(
+        'leaderboards/<str:window>/users/<int:user_id>/',
+        LeaderboardViewSet.as_view({'get': 'rank'}),
+        name='leaderboard-rank',
+    ),
+]
+
+if settings.LEADERBOARD_ASYNC_VIEWS:
+    from . import async_views
+
+    # Matched ahead of the router, which keeps serving every other route
+    urlpatterns = [
+        path('users/', async_views.user_list, name='async-user-list'),
+        path('users/grouped_by_score/', async_views.grouped_by_score, name='async-user-grouped-by-score'),
+        path('users/<int:pk>/update_score/', async_views.update_score, name='async-user-update-score'),
+        path('update-winners/', async_views.update_winners, name='async-update-winners'),
+    ] + urlpatterns
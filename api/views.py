@@ -1,90 +1,683 @@
+from datetime import date
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import NotFound, ValidationError as DRFValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
-from django.db.models import Max
-from .models import User, Winner
-from .serializers import UserSerializer, WinnerSerializer, UpdateScoreSerializer
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import render
+from django.views.decorators.http import require_GET
+from django.utils import timezone
+from .aggregates import ConcatNames, split_names
+from .boards import board_rank, board_rows, change_board_score, declare_board_winner
+from .events import event_stream
+from .metrics import registry, render_metrics
+from .models import BoardWinner, Leaderboard, ScoreBucket, User, WindowArchive, WindowScore, Winner, WinnerArchive
+from .pagination import KeysetPagination, RankPagination
+from .parsers import NDJSONParser
+from .ranking import get_rank_store, leaderboard_index
+from .renderers import FastJSONRenderer
+from .response_cache import cache_response, get_stats
+from .scores import apply_score_changes, change_score, coalesce_changes, project_points
+from .serializers import (
+    BoardWinnerSerializer, BulkScoreItemSerializer, LeaderboardSerializer, UserSerializer, WinnerSerializer,
+    CHANGE_MAX, CHANGE_MIN, USER_FIELDS, USER_ID_MAX, WINNER_SPARSE_FIELDS, UpdateScoreSerializer, snapshot_data,
+    snapshot_rows, sparse_rows, user_rows, winner_data, winner_rows,
+)
+from .winners import single_flight_winner
+from .windows import WINDOWS, current_periods, period_end, period_start, window_rank, window_scores
+
+
+def _int_param(request, name, default, minimum=None, maximum=None):
+    """
+    Read an integer query parameter, raising a 400 error if it is malformed.
+    """
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise DRFValidationError({name: 'A valid integer is required.'})
+    if minimum is not None and value < minimum:
+        raise DRFValidationError({name: f'Ensure this value is greater than or equal to {minimum}.'})
+    if maximum is not None and value > maximum:
+        raise DRFValidationError({name: f'Ensure this value is less than or equal to {maximum}.'})
+    return value
+
+
+def sparse_fields(request, allowed):
+    """
+    Read the ?fields= sparse fieldset, a comma-separated subset of
+    `allowed`, raising a 400 error on unknown fields. Returns the fields in
+    `allowed` order, or None when every field is wanted.
+    """
+    value = request.query_params.get('fields')
+    if value in (None, ''):
+        return None
+    fields = {field.strip() for field in value.split(',')} - {''}
+    unknown = fields.difference(allowed)
+    if unknown:
+        raise DRFValidationError({'fields': f"Unknown fields: {', '.join(sorted(unknown))}."})
+    return tuple(field for field in allowed if field in fields) or None
+
+
+def _ranked_users(entries, first_rank):
+    """
+    Serialize (user_id, points) index entries in rank order, with the
+    points projected like the rank store's scores.
+    """
+    users = User.objects.in_bulk([user_id for user_id, _ in entries])
+    project_points(list(users.values()))
+    results = []
+    for rank, (user_id, _) in enumerate(entries, start=first_rank):
+        user = users.get(user_id)
+        if user is not None:
+            results.append(dict(UserSerializer(user).data, rank=rank))
+    return results
+
+
+class RankedUsers:
+    """
+    Lazy, sliceable view of the users in a ranking store, in rank order, as
+    user_rows() dicts. Lets the standard paginator page through the Redis
+    sorted set.
+    """
+
+    def __init__(self, store, fields=None):
+        self.store = store
+        self.fields = fields
+
+    def count(self):
+        return self.store.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = index.stop if index.stop is not None else self.count()
+        entries = self.store.page(start, stop - start)
+        rows = user_rows(User.objects.filter(pk__in=[user_id for user_id, _ in entries]), self.fields)
+        users = {row['id']: row for row in rows}
+        return [users[user_id] for user_id, _ in entries if user_id in users]
+
+
+def ranked_page(store, request, view, fields=None):
+    """
+    Return the users list page read from a ranking store, with the sparse
+    fieldset `fields`, if any.
+    """
+    paginator = RankPagination()
+    page = paginator.paginate_queryset(RankedUsers(store, fields), request, view=view)
+    return paginator.get_paginated_response(sparse_rows(project_points(page), fields)).data
+
+
+def grouped_params(request):
+    return {
+        'min_score': _int_param(request, 'min_score', None),
+        'max_score': _int_param(request, 'max_score', None),
+        'offset': _int_param(request, 'offset', 0, minimum=0),
+        'limit': _int_param(request, 'limit', None, minimum=1),
+        'names_limit': _int_param(request, 'names_limit', None, minimum=0),
+    }
+
+
+def grouped_buckets(params):
+    """
+    Return the (points, count, age_sum) query for the requested score buckets.
+    """
+    buckets = ScoreBucket.objects.filter(count__gt=0).order_by('-points')
+    if params['min_score'] is not None:
+        buckets = buckets.filter(points__gte=params['min_score'])
+    if params['max_score'] is not None:
+        buckets = buckets.filter(points__lte=params['max_score'])
+    offset, limit = params['offset'], params['limit']
+    if limit is not None:
+        buckets = buckets[offset:offset + limit]
+    elif offset:
+        buckets = buckets[offset:]
+    return buckets.values_list('points', 'count', 'age_sum')
+
+
+def grouped_names(params, buckets):
+    """
+    Return the query for the names in `buckets`, or None if none are wanted.
+    """
+    if not buckets or params['names_limit'] == 0:
+        return None
+    users = User.objects.filter(points__in=[points for points, _, _ in buckets])
+    if all(params[name] is None for name in ('min_score', 'max_score', 'limit')) and not params['offset']:
+        # Every bucket is requested, skip the IN list
+        users = User.objects.all()
+    if params['names_limit'] is not None:
+        # Cap each bucket before aggregating, so large buckets only read,
+        # join and send their first names_limit names
+        first = users.annotate(
+            position=Window(RowNumber(), partition_by=F('points'), order_by=F('id').asc()),
+        ).filter(position__lte=params['names_limit'])
+        users = User.objects.filter(pk__in=first.values('pk'))
+    return users.values('points').annotate(names=ConcatNames('name')).order_by()
+
+
+def grouped_data(params, buckets, name_rows):
+    names = {row['points']: split_names(row['names']) for row in name_rows}
+    sorted_groups = {}
+    for points, count, age_sum in buckets:
+        bucket = {
+            "names": names.get(points, []),
+            "average_age": age_sum // count,
+        }
+        if params['names_limit'] is not None:
+            bucket["count"] = count
+        sorted_groups[points] = bucket
+    return sorted_groups
 
 
 class UserViewSet(viewsets.ModelViewSet):
     """
     API endpoint that allows users to be viewed, created, edited, or deleted.
     """
-    queryset = User.objects.all().order_by('-points')
+    queryset = User.objects.all().order_by('-points', 'id')
     serializer_class = UserSerializer
+    pagination_class = KeysetPagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    keyset_ordering = ('-points', 'id')
+
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        """
+        List users by points. Rows are read with .values() and returned as
+        is, they already have the UserSerializer shape. When the Redis
+        leaderboard is enabled the page is read from the shared sorted set
+        instead of sorting api_user; rank offsets are cheap there, so its
+        cursors hold the page's offset. Both take `?cursor=`, `?page_size=`
+        and `?page=` and answer with the same response.
+
+        `?fields=id,name,points` narrows both the SELECT and the rows to
+        those fields.
+        """
+        fields = sparse_fields(request, USER_FIELDS)
+        store = get_rank_store()
+        if store is leaderboard_index:
+            page = self.paginate_queryset(user_rows(self.filter_queryset(self.get_queryset()), fields))
+            return self.get_paginated_response(sparse_rows(project_points(list(page)), fields))
+        return Response(ranked_page(store, request, self, fields))
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Get one user, read with .values() like the list; supports `?fields=`.
+        """
+        fields = sparse_fields(request, USER_FIELDS)
+        row = user_rows(self.get_queryset().filter(pk=self._user_id()), fields).first()
+        if row is None:
+            raise NotFound()
+        return Response(sparse_rows(project_points([row]), fields)[0])
 
     @action(detail=True, methods=['patch'])
     def update_score(self, request, pk=None):
         """
         Update a user's score by adding or subtracting points.
+        The change is applied as a single atomic UPDATE, without reading the row first.
+        In write-behind mode it is buffered in Redis and the projected score returned.
         """
-        user = self.get_object()
         # Explicitly validate input to be an integer using serializer 
         serializer = UpdateScoreSerializer(data=request.data)
         if not serializer.is_valid():
             return Response({
                 "validation_errors": serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
-        change = serializer.data.get('change')
-        user.points += change
-        user.save()
+        user = change_score(self._user_id(), serializer.validated_data['change'])
+        if user is None:
+            raise NotFound()
         return Response(UserSerializer(user).data)
 
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk_update_scores(self, request):
+        """
+        Apply many score changes at once, for game servers.
+
+        Accepts a JSON list, or NDJSON with one object per line, of
+        {"id": ..., "change": ...} items. Changes for the same user are summed
+        and applied with one UPDATE per batch of users. Every item gets an
+        outcome: ok (with the user's new points), not_found or invalid.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            return Response({
+                "validation_errors": {"non_field_errors": ["Expected a list of {id, change} items."]}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.BULK_SCORE_MAX_ITEMS:
+            return Response({
+                "validation_errors": {"non_field_errors": [f"At most {settings.BULK_SCORE_MAX_ITEMS} items per request."]}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        outcomes = []
+        valid = []
+        for index, item in enumerate(items):
+            # Plain integer items skip the serializer, it costs more than the UPDATE
+            if (isinstance(item, dict) and type(item.get('id')) is int and type(item.get('change')) is int
+                    and 1 <= item['id'] <= USER_ID_MAX and CHANGE_MIN <= item['change'] <= CHANGE_MAX):
+                valid.append((index, item['id'], item['change']))
+                outcomes.append(None)
+                continue
+            serializer = BulkScoreItemSerializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data['id'], serializer.validated_data['change']))
+                outcomes.append(None)
+            else:
+                outcomes.append({'index': index, 'status': 'invalid', 'errors': serializer.errors})
+
+        points = apply_score_changes(coalesce_changes((user_id, change) for _, user_id, change in valid))
+        for index, user_id, _ in valid:
+            if user_id in points:
+                outcomes[index] = {'index': index, 'id': user_id, 'status': 'ok', 'points': points[user_id]}
+            else:
+                outcomes[index] = {'index': index, 'id': user_id, 'status': 'not_found'}
+        return Response({
+            'applied': sum(1 for _, user_id, _ in valid if user_id in points),
+            'users': len(points),
+            'results': outcomes,
+        })
+
+    def _user_id(self):
+        try:
+            return User._meta.pk.to_python(self.kwargs['pk'])
+        except ValidationError:
+            raise NotFound()
+
+    @action(detail=True, methods=['get'])
+    def rank(self, request, pk=None):
+        """
+        Get a user's position on the leaderboard from the rank index.
+        """
+        user_id = self._user_id()
+        store = get_rank_store()
+        rank = store.rank(user_id)
+        if rank is None:
+            raise NotFound()
+        return Response({
+            'id': user_id,
+            'rank': rank,
+            'total': store.count(),
+        })
+
+    @action(detail=False, methods=['get'])
+    def top(self, request):
+        """
+        Get the top `n` users (default 10, at most 100) with their rank.
+        """
+        n = _int_param(request, 'n', 10, minimum=1, maximum=100)
+        return Response(_ranked_users(get_rank_store().top(n), 1))
+
+    @action(detail=True, methods=['get'])
+    def neighbors(self, request, pk=None):
+        """
+        Get the users ranked up to `radius` places (default 2, at most 50)
+        above and below a user.
+        """
+        radius = _int_param(request, 'radius', 2, minimum=0, maximum=50)
+        user_id = self._user_id()
+        around = get_rank_store().around(user_id, radius)
+        if around is None:
+            raise NotFound()
+        first_rank, entries = around
+        return Response({
+            'rank': first_rank + [entry[0] for entry in entries].index(user_id),
+            'results': _ranked_users(entries, first_rank),
+        })
+
     @action(detail=False, methods=['get'])
+    @cache_response
     def grouped_by_score(self, request):
         """
         Get users grouped by score with average age.
+
+        Counts and average ages come from the precomputed score buckets; only
+        the names of the buckets being returned are read from api_user.
+        Optional query parameters: `min_score`/`max_score` filter the scores,
+        `limit`/`offset` page through the score buckets (highest first) and
+        `names_limit` caps the names returned per bucket, adding the bucket's
+        `count`.
         """
-        users = User.objects.all()
-        score_groups = {}
-
-        for user in users:
-            score = user.points
-            if score not in score_groups:
-                score_groups[score] = {"names": [], "total_age": 0, "count": 0}
-            
-            score_groups[score]["names"].append(user.name)
-            score_groups[score]["total_age"] += user.age
-            score_groups[score]["count"] += 1
-
-        # Calculate average age and sort by score (highest first)
-        sorted_groups = {
-            score: {
-                "names": data["names"],
-                "average_age": data["total_age"] // data["count"],
-            }
-            for score, data in sorted(score_groups.items(), reverse=True)
-        }
-        return Response(sorted_groups)
+        params = grouped_params(request)
+        buckets = list(grouped_buckets(params))
+        names = grouped_names(params, buckets)
+        return Response(grouped_data(params, buckets, names if names is not None else []))
+
+    def perform_create(self, serializer):
+        # Keep the user row and its score bucket in one transaction
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
 
 
 class WinnerViewSet(viewsets.ModelViewSet):
     """
     API endpoint that allows winners to be viewed, created, edited, or deleted.
     """
-    queryset = Winner.objects.all().order_by('-timestamp')
+    queryset = Winner.objects.select_related('user').order_by('-timestamp', 'id')
     serializer_class = WinnerSerializer
+    pagination_class = KeysetPagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    keyset_ordering = ('-timestamp', 'id')
 
-@api_view(['POST'])
-def update_winners(request):
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        """
+        List winners, newest first, with their user joined into the same
+        query and shaped by winner_data() instead of WinnerSerializer.
+        Pages that run past the Winner table continue into WinnerArchive,
+        which is only queried then.
+
+        `?view=snapshot` serves the compact snapshot taken at win time
+        instead, read from the winner rows alone with no join.
+
+        `?fields=` narrows the SELECT and the output to some of the keys,
+        and of the nested user's as `user.<field>`; api_user is only joined
+        when a user field is asked for.
+        """
+        if request.query_params.get('view') == 'snapshot':
+            page = self.paginator.paginate_querysets([
+                snapshot_rows(Winner.objects.order_by('-timestamp', 'id')),
+                snapshot_rows(WinnerArchive.objects.order_by('-timestamp', 'id')),
+            ], request, view=self)
+            return self.get_paginated_response([snapshot_data(row) for row in page])
+        fields = sparse_fields(request, WINNER_SPARSE_FIELDS)
+        page = self.paginator.paginate_querysets([
+            winner_rows(self.filter_queryset(self.get_queryset()), fields),
+            winner_rows(WinnerArchive.objects.order_by('-timestamp', 'id'), fields),
+        ], request, view=self)
+        return self.get_paginated_response([winner_data(row, fields) for row in page])
+
+class LeaderboardViewSet(viewsets.GenericViewSet):
     """
-    Endpoint can be called by any external Cloud Scheduler to update winner
-    Have added a button on the UI to call this method to manually update winner
+    API endpoint for the daily, weekly and monthly leaderboards, ranking
+    users by the points they gained in one period of the window.
+
+    The open period is paged by keyset over window_score_rank_idx, so a page
+    costs the same however many score changes the period has seen. Closed
+    periods are read from their archived top WINDOW_ARCHIVE_SIZE standings.
+    `?period=YYYY-MM-DD` selects the period containing that day.
+    """
+    queryset = WindowScore.objects.all()
+    pagination_class = KeysetPagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    keyset_ordering = ('-points', 'user_id')
+
+    def _period(self):
+        window = self.kwargs['window']
+        if window not in WINDOWS:
+            raise NotFound()
+        value = self.request.query_params.get('period')
+        if value:
+            try:
+                day = date.fromisoformat(value)
+            except ValueError:
+                raise DRFValidationError({'period': 'Enter a date as YYYY-MM-DD.'})
+        else:
+            day = timezone.localdate()
+        start = period_start(window, day)
+        current = current_periods()[window]
+        return window, start, start < current
+
+    @staticmethod
+    def _header(window, start, archived):
+        return {
+            'window': window,
+            'period_start': start.isoformat(),
+            'period_end': period_end(window, start).isoformat(),
+            'archived': archived,
+        }
+
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        """
+        List the users of a window period by the points gained in it.
+        """
+        window, start, closed = self._period()
+        if closed:
+            archive = list(
+                WindowArchive.objects
+                .filter(window=window, period_start=start)
+                .order_by('rank')
+                .values('rank', 'user_id', 'name', 'points')
+            )
+            if archive:
+                results = [
+                    {'rank': row['rank'], 'id': row['user_id'], 'name': row['name'], 'points': row['points']}
+                    for row in archive
+                ]
+                return Response(dict(self._header(window, start, True), next=None, previous=None, results=results))
+        # An open period, or a closed one the rollover job has not archived yet
+        page = self.paginate_queryset(window_scores(window, start))
+        results = [{'id': row['user_id'], 'name': row['name'], 'points': row['points']} for row in page]
+        data = self.get_paginated_response(results).data
+        return Response(dict(self._header(window, start, False), **data))
+
+    @cache_response
+    def rank(self, request, *args, **kwargs):
+        """
+        Get a user's points and rank in a window period.
+        """
+        window, start, _ = self._period()
+        user_id = kwargs['user_id']
+        ranked = window_rank(window, start, user_id)
+        archived = False
+        if ranked is None:
+            row = (
+                WindowArchive.objects
+                .filter(window=window, period_start=start, user_id=user_id)
+                .values_list('points', 'rank')
+                .first()
+            )
+            if row is None:
+                raise NotFound()
+            ranked, archived = row, True
+        points, rank = ranked
+        return Response(dict(self._header(window, start, archived), id=user_id, points=points, rank=rank))
+
+class BoardViewSet(viewsets.ModelViewSet):
     """
-    max_points = User.objects.aggregate(Max('points'))['points__max']
-    top_users = User.objects.filter(points=max_points)
-    if top_users.count() == 1:
-        top_user = top_users.first()
-        winner = Winner.objects.create(
-            user=top_user,
-            points_at_win=top_user.points
+    API endpoint for the independent leaderboards of a multi-game or
+    multi-tenant deployment, addressed by slug. Each board ranks its own
+    per-board scores; every read is a range of one board's index entries,
+    so it costs the same however many boards and rows there are.
+    """
+    queryset = Leaderboard.objects.order_by('id')
+    serializer_class = LeaderboardSerializer
+    lookup_field = 'slug'
+    pagination_class = KeysetPagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    keyset_orderings = {
+        'users': ('-points', 'user_id'),
+        'winners': ('-timestamp', 'id'),
+    }
+
+    @property
+    def keyset_ordering(self):
+        return self.keyset_orderings.get(self.action, ('id',))
+
+    def _board_id(self):
+        board_id = Leaderboard.objects.filter(slug=self.kwargs['slug']).values_list('id', flat=True).first()
+        if board_id is None:
+            raise NotFound()
+        return board_id
+
+    @action(detail=True, methods=['get'])
+    def users(self, request, slug=None):
+        """
+        List the board's users by their points on the board.
+        """
+        page = self.paginate_queryset(board_rows(self._board_id()))
+        return self.get_paginated_response(
+            [{'id': row['user_id'], 'name': row['name'], 'points': row['points']} for row in page]
         )
+
+    @action(detail=True, methods=['get'])
+    def top(self, request, slug=None):
+        """
+        Get the board's top `n` users (default 10, at most 100) with their rank.
+        """
+        n = _int_param(request, 'n', 10, minimum=1, maximum=100)
+        rows = board_rows(self._board_id()).order_by('-points', 'user_id')[:n]
+        return Response([
+            {'id': row['user_id'], 'name': row['name'], 'points': row['points'], 'rank': rank}
+            for rank, row in enumerate(rows, start=1)
+        ])
+
+    @action(detail=True, methods=['get'], url_path=r'users/(?P<user_id>\d+)/rank')
+    def user_rank(self, request, slug=None, user_id=None):
+        """
+        Get a user's points and rank on the board.
+        """
+        user_id = int(user_id)
+        ranked = board_rank(self._board_id(), user_id)
+        if ranked is None:
+            raise NotFound()
+        points, rank = ranked
+        return Response({'id': user_id, 'points': points, 'rank': rank})
+
+    @action(detail=True, methods=['patch'], url_path=r'users/(?P<user_id>\d+)/update_score')
+    def update_score(self, request, slug=None, user_id=None):
+        """
+        Add or subtract a user's points on the board.
+        """
+        serializer = UpdateScoreSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                "validation_errors": serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        board_id = self._board_id()
+        user = User.objects.filter(pk=int(user_id)).values('id', 'name').first()
+        if user is None:
+            raise NotFound()
+        points = change_board_score(board_id, user['id'], serializer.validated_data['change'])
+        return Response(dict(user, points=points))
+
+    @action(detail=True, methods=['get'])
+    def winners(self, request, slug=None):
+        """
+        List the board's winners, newest first.
+        """
+        winners = BoardWinner.objects.filter(board_id=self._board_id())
+        page = self.paginate_queryset(winners)
+        return self.get_paginated_response(BoardWinnerSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['post'], url_path='update-winners')
+    def update_winners(self, request, slug=None):
+        """
+        Select the board's winner now, as the periodic job does.
+        """
+        winner = declare_board_winner(self._board_id())
+        if winner is None:
+            return Response({
+                'status': 'no_winner',
+                'message': 'No winner declared: a tie, an empty board or a winner declared moments ago'
+            })
         return Response({
             'status': 'success',
-            'winner': WinnerSerializer(winner).data
+            'winner': BoardWinnerSerializer(winner).data
         }, status=status.HTTP_201_CREATED)
-    else:
-        return Response({
+
+
+@api_view(['POST'])
+def update_winners(request):
+    """
+    Endpoint can be called by any external Cloud Scheduler to update winner
+    Have added a button on the UI to call this method to manually update winner
+
+    The selection is done by api.winners.single_flight_winner(), as in
+    update_winners_task, so concurrent triggers run it once and share the
+    result. A winner declared less than WINNER_MIN_INTERVAL_SECONDS ago is
+    returned with a 200 instead of inserting again.
+    """
+    data, status_code = declare_winner()
+    return Response(data, status=status_code)
+
+
+def declare_winner():
+    """
+    Select the winner with single_flight_winner(), returning the (data,
+    status) of the response.
+    """
+    outcome, winner = single_flight_winner()
+    if outcome == 'tie':
+        return {
             'status': 'tie',
             'message': 'No winner declared due to a tie'
-        }, status=status.HTTP_200_OK)
+        }, status.HTTP_200_OK
+    return {
+        'status': 'success',
+        'winner': WinnerSerializer(winner).data
+    }, status.HTTP_201_CREATED if outcome == 'declared' else status.HTTP_200_OK
+
+
+@api_view(['GET'])
+def cache_stats(request):
+    """
+    Response cache metrics: hits, misses, 304s, hit ratio and the mean age
+    of the responses served from the cache.
+    """
+    return Response(get_stats())
+
+
+@require_GET
+def metrics(request):
+    """
+    Prometheus metrics of every worker: requests, latency, and database
+    statements, database time, rendering time and N+1 flags of the sampled
+    requests, per view.
+    """
+    return HttpResponse(
+        render_metrics(registry.collect()), content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+def _live_updates(request):
+    # Only the ASGI application can hold a stream open; under WSGI Django
+    # reads an async streaming body to its end before sending anything
+    return isinstance(request, ASGIRequest)
+
+
+@require_GET
+def index(request):
+    """
+    The leaderboard page. It only subscribes to /api/stream/ when served by
+    the ASGI application, otherwise it reloads the lists after its writes.
+    """
+    return render(request, 'index.html', {'live_updates': _live_updates(request)})
+
+
+@require_GET
+async def leaderboard_stream(request):
+    """
+    Server-Sent Events stream of leaderboard changes: `scores` events with
+    [id, points, rank] deltas, `user` and `user_deleted` events for user
+    edits, and `winner` events. Needs the ASGI application (config/asgi.py);
+    under WSGI it answers 204 No Content, which stops EventSource clients
+    from reconnecting, instead of tying up a worker.
+    """
+    if not _live_updates(request):
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,161 @@
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import WindowArchive, WindowScore
+
+WINDOWS = tuple(window for window, _ in WindowScore.WINDOWS)
+
+# Rows per upsert statement, 4 parameters each
+_UPSERT_BATCH_SIZE = 250
+
+
+def period_start(window, day):
+    """
+    Return the first day of the `window` period containing `day`: the day
+    itself, the Monday of its ISO week or the first of its month.
+    """
+    if window == 'daily':
+        return day
+    if window == 'weekly':
+        return day - timedelta(days=day.weekday())
+    if window == 'monthly':
+        return day.replace(day=1)
+    raise ValueError(f'Unknown window: {window}')
+
+
+def period_end(window, start):
+    """
+    Return the first day after the `window` period starting on `start`.
+    """
+    if window == 'daily':
+        return start + timedelta(days=1)
+    if window == 'weekly':
+        return start + timedelta(days=7)
+    if start.month == 12:
+        return date(start.year + 1, 1, 1)
+    return date(start.year, start.month + 1, 1)
+
+
+def current_periods(day=None):
+    """
+    Return {window: start of its open period} for `day`, today by default,
+    in the TIME_ZONE calendar.
+    """
+    day = day or timezone.localdate()
+    return {window: period_start(window, day) for window in WINDOWS}
+
+
+def add_window_points(deltas, day=None):
+    """
+    Add {user_id: change} to the users' points in the open period of every
+    window. Each row is upserted with the increment done by the database, so
+    concurrent score changes never lose points.
+    """
+    deltas = {user_id: change for user_id, change in deltas.items() if change}
+    if not deltas:
+        return
+    rows = [
+        (window, start, user_id, change)
+        for window, start in current_periods(day).items()
+        for user_id, change in deltas.items()
+    ]
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        # No portable upsert, the F() update is still atomic per row
+        with transaction.atomic():
+            for window, start, user_id, change in rows:
+                score, created = WindowScore.objects.get_or_create(
+                    window=window, period_start=start, user_id=user_id, defaults={'points': change},
+                )
+                if not created:
+                    WindowScore.objects.filter(pk=score.pk).update(points=F('points') + change)
+        return
+
+    qn = connection.ops.quote_name
+    table = qn(WindowScore._meta.db_table)
+    window, start, user, points = (qn(name) for name in ('window', 'period_start', 'user_id', 'points'))
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), _UPSERT_BATCH_SIZE):
+            batch = rows[offset:offset + _UPSERT_BATCH_SIZE]
+            values = ', '.join(['(%s, %s, %s, %s)'] * len(batch))
+            sql = (
+                f'INSERT INTO {table} ({window}, {start}, {user}, {points}) VALUES {values} '
+                f'ON CONFLICT ({window}, {start}, {user}) '
+                f'DO UPDATE SET {points} = {table}.{points} + excluded.{points}'
+            )
+            params = [
+                value
+                for row_window, row_start, user_id, change in batch
+                for value in (row_window, connection.ops.adapt_datefield_value(row_start), user_id, change)
+            ]
+            cursor.execute(sql, params)
+
+
+def window_scores(window, start):
+    """
+    Return the ranked (user_id, name, points) rows of one open period, in
+    the order of the window_score_rank_idx index.
+    """
+    return (
+        WindowScore.objects
+        .filter(window=window, period_start=start)
+        .values('user_id', 'points', name=F('user__name'))
+    )
+
+
+def window_rank(window, start, user_id):
+    """
+    Return (points, rank) of a user in an open period, or None if the user
+    has no score in it. The rank counts the rows ahead in the index.
+    """
+    points = (
+        WindowScore.objects
+        .filter(window=window, period_start=start, user_id=user_id)
+        .values_list('points', flat=True)
+        .first()
+    )
+    if points is None:
+        return None
+    ahead = window_scores(window, start).filter(points__gte=points).exclude(
+        points=points, user_id__gte=user_id,
+    ).count()
+    return points, ahead + 1
+
+
+def archive_period(window, start):
+    """
+    Copy the top WINDOW_ARCHIVE_SIZE users of a closed period into
+    WindowArchive and drop its WindowScore rows. Returns the number of
+    archived rows; safe to rerun after a partial failure.
+    """
+    with transaction.atomic():
+        rows = window_scores(window, start).order_by('-points', 'user_id')[:settings.WINDOW_ARCHIVE_SIZE]
+        archived = WindowArchive.objects.bulk_create([
+            WindowArchive(
+                window=window, period_start=start, rank=rank,
+                user_id=row['user_id'], name=row['name'], points=row['points'],
+            )
+            for rank, row in enumerate(rows, start=1)
+        ], ignore_conflicts=True)
+        WindowScore.objects.filter(window=window, period_start=start).delete()
+    return len(archived)
+
+
+def rollover_windows(day=None):
+    """
+    Archive every period that has closed by `day`, today by default.
+    Returns {window: [closed period starts]}.
+    """
+    closed = {}
+    for window, start in current_periods(day).items():
+        starts = sorted(
+            WindowScore.objects
+            .filter(window=window, period_start__lt=start)
+            .values_list('period_start', flat=True)
+            .distinct()
+        )
+        for old_start in starts:
+            archive_period(window, old_start)
+        closed[window] = starts
+    return closed
@@ -0,0 +1,296 @@
+import logging
+import redis
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import IntegerField, Subquery, Sum, Value
+from django.utils import timezone
+from . import redis_store
+from .models import ScoreBucket, User, Winner, WinnerArchive
+from .response_cache import get_version
+from .scores import flush_score_buffer, write_behind_enabled
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_FIELDS = ('id', 'user_id', 'points_at_win', 'timestamp', 'user_name', 'runner_up_points', 'players')
+
+# Winners moved per transaction when the archive is not downsampled
+_ARCHIVE_BATCH_SIZE = 1000
+
+# Arbitrary application-wide key for the winner selection advisory lock
+WINNER_LOCK_KEY = 7301
+
+# Redis keys of the single-flight lock, holding the token of the selection
+# in flight, of each selection's result and of the result shared for the
+# rest of the WINNER_MIN_INTERVAL_SECONDS window
+FLIGHT_KEY = 'leaderboard:winner:flight'
+RESULT_KEY = 'leaderboard:winner:result'
+WINDOW_KEY = 'leaderboard:winner:window'
+
+# Seconds between checks for the result of the selection in flight
+_FLIGHT_POLL_SECONDS = 0.02
+
+
+def _lock_winner_selection():
+    """
+    Serialize winner selection across processes for the current transaction.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [WINNER_LOCK_KEY])
+        elif connection.vendor == 'sqlite':
+            # A write statement takes SQLite's database write lock up front,
+            # even when it matches no rows
+            table = connection.ops.quote_name(Winner._meta.db_table)
+            cursor.execute(f'UPDATE {table} SET id = id WHERE 1 = 0')
+
+
+def select_winner():
+    """
+    Select and record the winner, for the update-winners endpoints and
+    update_winners_task alike. Returns (outcome, winner):
+
+    - ('declared', the new Winner)
+    - ('recent', the latest Winner) when any winner was declared less than
+      WINNER_MIN_INTERVAL_SECONDS ago, even if another user leads now. It
+      is a global minimum interval between winners, so concurrent triggers
+      never double-insert
+    - ('tie', None) when the top two users have the same points, or there
+      are no users
+
+    The top two users are read with one ordered LIMIT 2 query annotated
+    with the time of the latest win and the player count, and selection and
+    insert run in one transaction under a lock. The winner row keeps a
+    snapshot of the name, the runner-up's points and the player count for
+    the ?view=snapshot winners feed. In write-behind mode the score buffer
+    is flushed first.
+    """
+    if write_behind_enabled():
+        flush_score_buffer()
+    with transaction.atomic():
+        _lock_winner_selection()
+        # The latest win of any user, not only the leader's: the interval
+        # applies between winners
+        last_win = Winner.objects.order_by('-timestamp', 'id').values('timestamp')[:1]
+        # The player count for the snapshot, summed from the score buckets
+        # in the same round trip
+        players = (
+            ScoreBucket.objects.order_by()
+            .annotate(all=Value(1, output_field=IntegerField())).values('all')
+            .annotate(players=Sum('count')).values('players')
+        )
+        top_users = list(
+            User.objects.order_by('-points', 'id')
+            .annotate(last_win=Subquery(last_win), players=Subquery(players))[:2]
+        )
+        if not top_users or (len(top_users) == 2 and top_users[0].points == top_users[1].points):
+            return 'tie', None
+
+        top_user = top_users[0]
+        min_interval = timedelta(seconds=settings.WINNER_MIN_INTERVAL_SECONDS)
+        if top_user.last_win is not None and timezone.now() - top_user.last_win < min_interval:
+            return 'recent', Winner.objects.select_related('user').order_by('-timestamp', 'id').first()
+
+        winner = Winner.objects.create(
+            user=top_user,
+            points_at_win=top_user.points,
+            user_name=top_user.name,
+            runner_up_points=top_users[1].points if len(top_users) == 2 else None,
+            players=top_user.players,
+        )
+    return 'declared', winner
+
+
+def _window_key():
+    """
+    Key of the result shared within the current window, or None when there
+    is no window. It includes the leaderboard version, which every score
+    and winner write bumps, so a result is never reused after a change.
+    """
+    if not settings.WINNER_MIN_INTERVAL_SECONDS or not settings.LEADERBOARD_CACHE_ENABLED:
+        return None
+    return f'{WINDOW_KEY}:{get_version()}'
+
+
+def _dump(result):
+    outcome, winner = result
+    return f"{outcome}:{winner.pk if winner is not None else ''}"
+
+
+def _load(value):
+    """
+    Read a result stored by _dump(), or None if there is none or its winner
+    no longer exists.
+    """
+    if value is None:
+        return None
+    outcome, _, winner_id = value.partition(':')
+    if not winner_id:
+        return outcome, None
+    winner = Winner.objects.select_related('user').filter(pk=winner_id).first()
+    return None if winner is None else (outcome, winner)
+
+
+def _shared(result):
+    # Only the caller that ran the selection reports the winner as new
+    outcome, winner = result
+    return ('recent', winner) if outcome == 'declared' else result
+
+
+def _wait_for_flight(client):
+    """
+    Wait for the selection in flight and return its result, or None if
+    there is none or it failed or expired before finishing.
+    """
+    flight = client.get(FLIGHT_KEY)
+    deadline = time.monotonic() + settings.WINNER_LOCK_TTL_SECONDS
+    while flight is not None and time.monotonic() < deadline:
+        result = client.get(f'{RESULT_KEY}:{flight}')
+        if result is not None:
+            return _load(result)
+        if client.get(FLIGHT_KEY) != flight:
+            # Released without a result: the selection raised
+            return _load(client.get(f'{RESULT_KEY}:{flight}'))
+        time.sleep(_FLIGHT_POLL_SECONDS)
+    return None
+
+
+def _publish_result(client, token, result):
+    try:
+        value = _dump(result)
+        client.set(f'{RESULT_KEY}:{token}', value, ex=settings.WINNER_LOCK_TTL_SECONDS)
+        window_key = _window_key()
+        if window_key is not None:
+            client.set(window_key, value, ex=settings.WINNER_MIN_INTERVAL_SECONDS)
+    except Exception as e:
+        # The winner is recorded, the waiting callers fall back to the database
+        logger.warning(f"Winner single-flight result not shared: {str(e)}")
+
+
+def _release_flight(client, token):
+    """
+    Delete the lock if this caller still holds it, it may have expired and
+    been taken by another caller meanwhile.
+    """
+    try:
+        with client.pipeline() as pipeline:
+            pipeline.watch(FLIGHT_KEY)
+            if pipeline.get(FLIGHT_KEY) == token:
+                pipeline.multi()
+                pipeline.delete(FLIGHT_KEY)
+                pipeline.execute()
+    except redis.WatchError:
+        pass
+    except redis.RedisError as e:
+        logger.warning(f"Winner single-flight lock not released, it expires: {str(e)}")
+
+
+def single_flight_winner():
+    """
+    select_winner() for concurrent triggers: the UI button, the update
+    endpoints and every Celery worker's beat tick.
+
+    One caller takes a lock on the shared Redis (SET NX with a
+    WINNER_LOCK_TTL_SECONDS expiry) and runs the selection. Concurrent
+    callers in any process wait for its result and share it instead of
+    queueing on the database lock, as do later callers within
+    WINNER_MIN_INTERVAL_SECONDS while the leaderboard is unchanged. Shared
+    results report the winner as 'recent'. Without LEADERBOARD_REDIS_URL,
+    when Redis is down, or when the lock holder dies, the callers fall back
+    to select_winner(), whose database lock and minimum interval still
+    insert each winner exactly once.
+    """
+    client = redis_store.get_redis()
+    if client is None:
+        return select_winner()
+    try:
+        window_key = _window_key()
+        if window_key is not None:
+            result = _load(client.get(window_key))
+            if result is not None:
+                return _shared(result)
+
+        token = uuid.uuid4().hex
+        locked = client.set(FLIGHT_KEY, token, nx=True, ex=settings.WINNER_LOCK_TTL_SECONDS)
+        if not locked:
+            result = _wait_for_flight(client)
+            if result is None and window_key is not None:
+                # The flight may have finished before it could be waited on
+                result = _load(client.get(_window_key()))
+            if result is not None:
+                return _shared(result)
+    except Exception as e:
+        logger.warning(f"Winner single-flight unavailable: {str(e)}")
+        locked = False
+    if not locked:
+        # Outside the try, a database error must not run the selection twice
+        return select_winner()
+
+    try:
+        # A flight may have finished between the window check and the lock
+        window_key = _window_key()
+        result = _load(client.get(window_key)) if window_key is not None else None
+        if result is not None:
+            return _shared(result)
+        result = select_winner()
+        _publish_result(client, token, result)
+        return result
+    finally:
+        _release_flight(client, token)
+
+
+def _slice_start(moment, seconds):
+    return datetime.fromtimestamp(int(moment.timestamp()) // seconds * seconds, tz=dt_timezone.utc)
+
+
+def _archive_slice(first, cutoff, resolution):
+    """
+    Move the winners of the downsampling slice starting with `first` to the
+    archive in one transaction, keeping only the slice's last winner.
+    Returns (winners removed, winners archived).
+    """
+    winners = Winner.objects.filter(timestamp__lt=cutoff).order_by('timestamp', 'id')
+    if resolution:
+        end = _slice_start(first.timestamp, resolution) + timedelta(seconds=resolution)
+        rows = list(winners.filter(timestamp__lt=end).values(*ARCHIVED_FIELDS))
+        kept = rows[-1:]
+    else:
+        rows = kept = list(winners.values(*ARCHIVED_FIELDS)[:_ARCHIVE_BATCH_SIZE])
+    WinnerArchive.objects.bulk_create([WinnerArchive(**row) for row in kept], ignore_conflicts=True)
+    Winner.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    return len(rows), len(kept)
+
+
+def archive_winners(now=None):
+    """
+    Apply the winner retention policy: move winners older than
+    WINNER_HOT_DAYS to WinnerArchive, downsampled to the last winner of
+    each WINNER_ARCHIVE_RESOLUTION_MINUTES slice (0 keeps every winner),
+    and drop archived winners older than WINNER_RETENTION_DAYS (0 keeps
+    them forever). Works oldest first, one slice per transaction, so an
+    interrupted run leaves the archive older than the Winner table.
+    Returns {'moved', 'archived', 'expired'} counts.
+    """
+    now = now or timezone.now()
+    resolution = settings.WINNER_ARCHIVE_RESOLUTION_MINUTES * 60
+    cutoff = now - timedelta(days=settings.WINNER_HOT_DAYS)
+    if resolution:
+        # Only whole slices, a slice is never split between the two tables
+        cutoff = _slice_start(cutoff, resolution)
+
+    result = {'moved': 0, 'archived': 0, 'expired': 0}
+    while True:
+        with transaction.atomic():
+            first = Winner.objects.filter(timestamp__lt=cutoff).order_by('timestamp', 'id').first()
+            if first is None:
+                break
+            moved, archived = _archive_slice(first, cutoff, resolution)
+        result['moved'] += moved
+        result['archived'] += archived
+
+    if settings.WINNER_RETENTION_DAYS:
+        expired = WinnerArchive.objects.filter(timestamp__lt=now - timedelta(days=settings.WINNER_RETENTION_DAYS))
+        result['expired'], _ = expired.delete()
+    return result
@@ -2,6 +2,8 @@
 ASGI config for leaderboard project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it (for example ``uvicorn config.asgi:application``) for the live
+leaderboard stream at /api/stream/, which WSGI workers cannot hold open.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -1,6 +1,7 @@
 import os
 from celery import Celery
 from celery.schedules import crontab, timedelta
+from celery.signals import before_task_publish, task_postrun, task_prerun
 
 # Set the default Django settings module
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
@@ -14,10 +15,45 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Auto-discover tasks in all installed apps
 app.autodiscover_tasks()
 
+# Task run time, queue lag and outcome counters for /metrics
+from api.metrics import task_finished, task_published, task_started  # noqa: E402
+
+before_task_publish.connect(task_published)
+task_prerun.connect(task_started)
+task_postrun.connect(task_finished)
+
+# Matches SCORE_FLUSH_INTERVAL_MS in config/settings.py
+FLUSH_INTERVAL_MS = int(os.environ.get('SCORE_FLUSH_INTERVAL_MS', '1000'))
+
 # Define the scheduled tasks
 app.conf.beat_schedule = {
     'update-winners-every-5-minutes': {
         'task': 'api.tasks.update_winners_task',
         'schedule': timedelta(minutes=5),  # Run every 5 minutes
     },
+    'reconcile-leaderboard-every-10-minutes': {
+        'task': 'api.tasks.reconcile_leaderboard_task',
+        'schedule': timedelta(minutes=10),  # No-op unless LEADERBOARD_REDIS_URL is set
+    },
+    'flush-score-buffer': {
+        'task': 'api.tasks.flush_score_buffer_task',
+        # No-op unless SCORE_WRITE_BEHIND is set; runs that queue up behind a
+        # slow flush expire, the next run picks up their changes anyway
+        'schedule': timedelta(milliseconds=FLUSH_INTERVAL_MS),
+        'options': {'expires': FLUSH_INTERVAL_MS / 1000},
+    },
+    'rollover-leaderboard-windows': {
+        'task': 'api.tasks.rollover_windows_task',
+        # Shortly after every hour, so a period closed at midnight (in
+        # CELERY_TIMEZONE) is archived within minutes
+        'schedule': crontab(minute=1),
+    },
+    'compact-score-events-hourly': {
+        'task': 'api.tasks.compact_score_events_task',
+        'schedule': crontab(minute=31),  # Away from the rollover run
+    },
+    'archive-winners-daily': {
+        'task': 'api.tasks.archive_winners_task',
+        'schedule': crontab(hour=3, minute=15),
+    },
 } 
\ No newline at end of file
@@ -25,6 +25,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its wall time covers the other middleware too
+    'api.metrics.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -65,14 +67,40 @@ if os.environ.get('DATABASE_URL'):
             'PASSWORD': os.environ.get('DB_PASSWORD', ''),
             'HOST': os.environ.get('DB_HOST', '127.0.0.1'),
             'PORT': os.environ.get('DB_PORT', '5432'),
+            # Reuse connections across requests instead of reconnecting each time
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
         }
     }
+    # Under ASGI every request runs in a new thread, so persistent
+    # connections are not reused; DB_POOL_SIZE > 0 enables psycopg 3's
+    # connection pool instead (replaces CONN_MAX_AGE)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '0'))
+    if DB_POOL_SIZE:
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': min(2, DB_POOL_SIZE),
+                'max_size': DB_POOL_SIZE,
+                'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+            },
+        }
 else:
     # Running locally, so use SQLite
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Wait for the write lock instead of failing straight away
+                # when several workers update scores at the same time
+                'timeout': 20,
+            },
+            'TEST': {
+                # A shared in-memory database raises "table is locked" under
+                # concurrent writers, so the concurrency tests need a file
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
         }
     }
 
@@ -120,10 +148,94 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
 }
 
+# Cache for leaderboard responses. Local memory is per process, so set
+# CACHE_URL (for example redis://localhost:6379/2) when running several workers
+if os.environ.get('CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
 # Celery settings
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
-CELERY_TIMEZONE = TIME_ZONE 
\ No newline at end of file
+CELERY_TIMEZONE = TIME_ZONE 
+
+# Leaderboard settings
+# 'cursor' pages the users and winners lists by keyset, 'page' restores the
+# legacy page-number pagination (also available per request with ?page=N)
+LEADERBOARD_PAGINATION = os.environ.get('LEADERBOARD_PAGINATION', 'cursor')
+# Redis database holding the shared leaderboard sorted set. Leave unset to
+# rank users with a per-process in-memory index instead.
+LEADERBOARD_REDIS_URL = os.environ.get('LEADERBOARD_REDIS_URL')
+LEADERBOARD_REDIS_KEY = os.environ.get('LEADERBOARD_REDIS_KEY', 'leaderboard:points')
+# A winner declared less than this many seconds ago is returned instead of
+# inserting a duplicate when the scheduler and the UI button fire together
+WINNER_MIN_INTERVAL_SECONDS = int(os.environ.get('WINNER_MIN_INTERVAL_SECONDS', '5'))
+# TTL of the Redis lock held by the one caller selecting the winner, and the
+# longest the concurrent callers wait to share its result
+WINNER_LOCK_TTL_SECONDS = int(os.environ.get('WINNER_LOCK_TTL_SECONDS', '30'))
+# Users updated per UPDATE statement, and items accepted per request, by
+# the bulk score ingestion endpoint
+BULK_SCORE_BATCH_SIZE = int(os.environ.get('BULK_SCORE_BATCH_SIZE', '500'))
+BULK_SCORE_MAX_ITEMS = int(os.environ.get('BULK_SCORE_MAX_ITEMS', '10000'))
+# Write-behind scoring: update_score adds the change to a Redis hash and
+# returns the projected score, flush_score_buffer_task applies the buffered
+# changes in bulk every SCORE_FLUSH_INTERVAL_MS. Needs LEADERBOARD_REDIS_URL.
+SCORE_WRITE_BEHIND = os.environ.get('SCORE_WRITE_BEHIND', 'False') == 'True'
+SCORE_BUFFER_KEY = os.environ.get('SCORE_BUFFER_KEY', 'leaderboard:pending')
+SCORE_FLUSH_INTERVAL_MS = int(os.environ.get('SCORE_FLUSH_INTERVAL_MS', '1000'))
+# Cache serialized users, grouped_by_score and winners responses under a
+# leaderboard version bumped by every score, user and winner write. On by
+# default only with a shared CACHE_URL: a version bump in one process's local
+# memory cache never reaches the other workers' copies of the pages
+LEADERBOARD_CACHE_ENABLED = os.environ.get(
+    'LEADERBOARD_CACHE_ENABLED', 'True' if os.environ.get('CACHE_URL') else 'False'
+) == 'True'
+LEADERBOARD_CACHE_TIMEOUT = int(os.environ.get('LEADERBOARD_CACHE_TIMEOUT', '300'))
+# Redis pub/sub channel fanning leaderboard events out to the /api/stream/
+# Server-Sent Events clients of every worker, and the idle heartbeat interval
+LEADERBOARD_EVENTS_CHANNEL = os.environ.get('LEADERBOARD_EVENTS_CHANNEL', 'leaderboard:events')
+LEADERBOARD_STREAM_HEARTBEAT_SECONDS = int(os.environ.get('LEADERBOARD_STREAM_HEARTBEAT_SECONDS', '15'))
+# Serve the users list, grouped_by_score, update_score and update-winners
+# with the async views in api/async_views.py; for the ASGI server
+LEADERBOARD_ASYNC_VIEWS = os.environ.get('LEADERBOARD_ASYNC_VIEWS', 'False') == 'True'
+# Users kept in the final standings of each closed daily/weekly/monthly
+# leaderboard period when rollover_windows_task archives it
+WINDOW_ARCHIVE_SIZE = int(os.environ.get('WINDOW_ARCHIVE_SIZE', '100'))
+# Score events younger than this stay in the log, older ones are folded into
+# per-user snapshots by compact_score_events_task, this many per transaction
+SCORE_EVENT_RETENTION_HOURS = int(os.environ.get('SCORE_EVENT_RETENTION_HOURS', '24'))
+SCORE_EVENT_COMPACT_BATCH_SIZE = int(os.environ.get('SCORE_EVENT_COMPACT_BATCH_SIZE', '10000'))
+# Winner retention: winners stay in api_winner for WINNER_HOT_DAYS, then
+# archive_winners_task moves the last winner of every
+# WINNER_ARCHIVE_RESOLUTION_MINUTES (0 keeps all) to api_winnerarchive and
+# drops archived winners after WINNER_RETENTION_DAYS (0 keeps them forever)
+WINNER_HOT_DAYS = int(os.environ.get('WINNER_HOT_DAYS', '7'))
+WINNER_ARCHIVE_RESOLUTION_MINUTES = int(os.environ.get('WINNER_ARCHIVE_RESOLUTION_MINUTES', '60'))
+WINNER_RETENTION_DAYS = int(os.environ.get('WINNER_RETENTION_DAYS', '365'))
+# Boards per update_board_winners_task, fanned out by update_winners_task
+BOARD_WINNER_BATCH_SIZE = int(os.environ.get('BOARD_WINNER_BATCH_SIZE', '100'))
+# Request metrics served at /metrics: every request counts towards the
+# request and latency metrics, a METRICS_SAMPLE_RATE share of them is also
+# timed statement by statement. A statement run METRICS_N_PLUS_ONE_THRESHOLD
+# times in one request is flagged as N+1. Each worker publishes its metrics
+# to the cache every METRICS_PUBLISH_SECONDS (Celery workers after every
+# task) for the others to merge; a worker silent for
+# METRICS_WORKER_EXPIRY_SECONDS drops out.
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', '0.1'))
+METRICS_N_PLUS_ONE_THRESHOLD = int(os.environ.get('METRICS_N_PLUS_ONE_THRESHOLD', '10'))
+METRICS_PUBLISH_SECONDS = int(os.environ.get('METRICS_PUBLISH_SECONDS', '15'))
+METRICS_WORKER_EXPIRY_SECONDS = int(os.environ.get('METRICS_WORKER_EXPIRY_SECONDS', '3600'))
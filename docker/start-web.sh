@@ -0,0 +1,11 @@
+#!/bin/sh
+# Start the web server. SERVER_MODE=asgi runs uvicorn workers with the async
+# views (needed for /api/stream/), anything else the synchronous WSGI workers.
+set -e
+
+if [ "$SERVER_MODE" = "asgi" ]; then
+    export LEADERBOARD_ASYNC_VIEWS="${LEADERBOARD_ASYNC_VIEWS:-True}"
+    exec gunicorn --bind 0.0.0.0:8080 --workers="${WEB_WORKERS:-3}" --timeout=120 \
+        --worker-class uvicorn.workers.UvicornWorker config.asgi:application
+fi
+exec gunicorn --bind 0.0.0.0:8080 --workers="${WEB_WORKERS:-3}" --timeout=120 config.wsgi
@@ -2,6 +2,7 @@ document.addEventListener('DOMContentLoaded', function() {
     // Load users on page load
     loadUsers();
     loadWinners();
+    connectLiveUpdates();
     
     // Add event listeners
     document.getElementById('addUserForm').addEventListener('submit', addUser);
@@ -43,9 +44,10 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
-// Load users from API
+// Load users from API, only the fields the list shows; the popover
+// fetches the rest on demand
 function loadUsers() {
-    fetch('/api/users/')
+    fetch('/api/users/?fields=id,name,points')
         .then(response => response.json())
         .then(data => {
             const usersList = document.getElementById('usersList');
@@ -56,21 +58,7 @@ function loadUsers() {
                 userList.className = 'user-list';
                 
                 data.results.forEach(user => {
-                    // Create a safe version of the address for the HTML attribute
-                    const encodedAddress = encodeURIComponent(user.address);
-                    
-                    const userItem = document.createElement('li');
-                    userItem.className = 'user-item';
-                    userItem.innerHTML = `
-                        <div class="user-delete" onclick="deleteUser(${user.id})">[X]</div>
-                        <div class="user-name" onclick="showUserDetailsPopover(event, '${user.name.replace(/'/g, "\\'")}', ${user.age}, '${encodedAddress}', ${user.points})">${user.name}</div>
-                        <div class="user-points">
-                            <div class="point-btn point-btn-subtract" onclick="updateUserPoints(${user.id}, -1)">-</div>
-                            <span>${user.points}</span>
-                            <div class="point-btn point-btn-add" onclick="updateUserPoints(${user.id}, 1)">+</div>
-                        </div>
-                    `;
-                    userList.appendChild(userItem);
+                    userList.appendChild(createUserItem(user));
                 });
                 
                 usersList.appendChild(userList);
@@ -84,6 +72,114 @@ function loadUsers() {
         });
 }
 
+// Build the list item for a user
+function createUserItem(user) {
+    const userItem = document.createElement('li');
+    userItem.className = 'user-item';
+    fillUserItem(userItem, user);
+    return userItem;
+}
+
+// (Re)render a user list item in place
+function fillUserItem(userItem, user) {
+    userItem.dataset.userId = user.id;
+    userItem.dataset.points = user.points;
+    userItem.innerHTML = `
+        <div class="user-delete" onclick="deleteUser(${user.id})">[X]</div>
+        <div class="user-name" onclick="showUserDetailsPopover(event, ${user.id})">${user.name}</div>
+        <div class="user-points">
+            <div class="point-btn point-btn-subtract" onclick="updateUserPoints(${user.id}, -1)">-</div>
+            <span>${user.points}</span>
+            <div class="point-btn point-btn-add" onclick="updateUserPoints(${user.id}, 1)">+</div>
+        </div>
+    `;
+}
+
+// Find the rendered list item for a user, if it is on the current page
+function findUserItem(userId) {
+    return document.querySelector(`.user-item[data-user-id="${userId}"]`);
+}
+
+// Move a user list item to its place in the (points desc, id asc) order
+function placeUserItem(userItem) {
+    const userList = userItem.parentNode;
+    const points = Number(userItem.dataset.points);
+    const userId = Number(userItem.dataset.userId);
+    const next = Array.from(userList.children).find(item => item !== userItem && (
+        Number(item.dataset.points) < points ||
+        (Number(item.dataset.points) === points && Number(item.dataset.userId) > userId)
+    ));
+    userList.insertBefore(userItem, next || null);
+}
+
+// Patch one user's points on the page without re-fetching the list
+function setUserPoints(userId, points) {
+    const userItem = findUserItem(userId);
+    if (!userItem) {
+        return;
+    }
+    userItem.dataset.points = points;
+    userItem.querySelector('.user-points span').textContent = points;
+    placeUserItem(userItem);
+}
+
+// Whether the page gets live updates; the server only streams them under ASGI
+function liveUpdatesEnabled() {
+    return !!window.EventSource && document.body.dataset.liveUpdates === 'true';
+}
+
+// Subscribe to the live leaderboard stream and patch the page on each event
+function connectLiveUpdates() {
+    if (!liveUpdatesEnabled()) {
+        return;
+    }
+    const source = new EventSource('/api/stream/');
+    let connected = false;
+    
+    source.addEventListener('open', function() {
+        // Events sent while disconnected are lost, reload once on reconnect
+        if (connected) {
+            loadUsers();
+            loadWinners();
+        }
+        connected = true;
+    });
+    
+    // [[id, points, rank], ...]
+    source.addEventListener('scores', function(event) {
+        JSON.parse(event.data).forEach(([userId, points]) => setUserPoints(userId, points));
+    });
+    
+    source.addEventListener('user', function(event) {
+        const user = JSON.parse(event.data);
+        const userItem = findUserItem(user.id);
+        if (userItem) {
+            fillUserItem(userItem, user);
+            placeUserItem(userItem);
+        } else {
+            // New users can land anywhere in the ranking
+            loadUsers();
+        }
+    });
+    
+    source.addEventListener('user_deleted', function(event) {
+        const userItem = findUserItem(JSON.parse(event.data).id);
+        if (userItem) {
+            userItem.remove();
+        }
+    });
+    
+    source.addEventListener('winner', function(event) {
+        const winner = JSON.parse(event.data);
+        const tbody = document.getElementById('winnersTableBody');
+        if (!tbody) {
+            loadWinners();
+            return;
+        }
+        tbody.insertBefore(createWinnerRow(winner), tbody.firstChild);
+    });
+}
+
 // Load winners from API
 function loadWinners() {
     fetch('/api/winners/')
@@ -110,13 +206,7 @@ function loadWinners() {
                 
                 // Display winners (API returns them ordered by timestamp, most recent first)
                 data.results.forEach(winner => {
-                    const tr = document.createElement('tr');
-                    tr.innerHTML = `
-                        <td>${winner.user.name}</td>
-                        <td>${winner.points_at_win}</td>
-                        <td>${new Date(winner.timestamp).toLocaleString()}</td>
-                    `;
-                    tbody.appendChild(tr);
+                    tbody.appendChild(createWinnerRow(winner));
                 });
             } else {
                 winnersList.innerHTML = '<p>No winners found.</p>';
@@ -128,6 +218,17 @@ function loadWinners() {
         });
 }
 
+// Build the table row for a winner
+function createWinnerRow(winner) {
+    const tr = document.createElement('tr');
+    tr.innerHTML = `
+        <td>${winner.user.name}</td>
+        <td>${winner.points_at_win}</td>
+        <td>${new Date(winner.timestamp).toLocaleString()}</td>
+    `;
+    return tr;
+}
+
 // Add a new user
 function addUser(event) {
     event.preventDefault();
@@ -152,7 +253,10 @@ function addUser(event) {
     .then(data => {
         document.getElementById('addUserModal').style.display = 'none';
         document.getElementById('addUserForm').reset();
-        loadUsers();
+        // With the live stream the new user arrives as a 'user' event
+        if (!liveUpdatesEnabled()) {
+            loadUsers();
+        }
     })
     .catch(error => {
         console.error('Error adding user:', error);
@@ -168,7 +272,10 @@ function deleteUser(userId) {
         })
         .then(response => {
             if (response.ok) {
-                loadUsers();
+                const userItem = findUserItem(userId);
+                if (userItem) {
+                    userItem.remove();
+                }
             } else {
                 throw new Error('Failed to delete user');
             }
@@ -180,19 +287,18 @@ function deleteUser(userId) {
     }
 }
 
-// Show user details in popover
-function showUserDetailsPopover(event, name, age, encodedAddress, points) {
+// Show user details in popover, fetched when it opens
+function showUserDetailsPopover(event, userId) {
     // Get the popover element
     const popover = document.getElementById('userDetailsPopover');
+    popover.dataset.userId = userId;
     
-    // Decode the address
-    const address = decodeURIComponent(encodedAddress);
-    
-    // Set the content
-    document.getElementById('popoverName').textContent = name;
-    document.getElementById('popoverAge').textContent = age;
-    document.getElementById('popoverPoints').textContent = points;
-    document.getElementById('popoverAddress').textContent = address;
+    // Show what the list already has while the rest loads
+    const userItem = event.target.parentNode;
+    document.getElementById('popoverName').textContent = event.target.textContent;
+    document.getElementById('popoverAge').textContent = '…';
+    document.getElementById('popoverPoints').textContent = userItem.dataset.points;
+    document.getElementById('popoverAddress').textContent = '…';
     
     // Position the popover near the clicked element
     const rect = event.target.getBoundingClientRect();
@@ -204,6 +310,32 @@ function showUserDetailsPopover(event, name, age, encodedAddress, points) {
     // Show the popover
     popover.style.display = 'block';
     
+    fetch(`/api/users/${userId}/`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Failed to load user');
+            }
+            return response.json();
+        })
+        .then(user => {
+            // Ignore the response if another user's popover opened since
+            if (popover.dataset.userId !== String(userId)) {
+                return;
+            }
+            document.getElementById('popoverName').textContent = user.name;
+            document.getElementById('popoverAge').textContent = user.age;
+            // The list item has the live points, kept current by the event stream
+            document.getElementById('popoverPoints').textContent = userItem.dataset.points ?? user.points;
+            document.getElementById('popoverAddress').textContent = user.address;
+        })
+        .catch(error => {
+            console.error('Error loading user details:', error);
+            if (popover.dataset.userId === String(userId)) {
+                document.getElementById('popoverAge').textContent = '-';
+                document.getElementById('popoverAddress').textContent = '-';
+            }
+        });
+    
     // Prevent the event from bubbling up
     event.stopPropagation();
 }
@@ -221,7 +353,7 @@ function updateUserPoints(userId, change) {
     })
     .then(response => response.json())
     .then(data => {
-        loadUsers();
+        setUserPoints(data.id, data.points);
     })
     .catch(error => {
         console.error('Error updating points:', error);
@@ -231,6 +363,9 @@ function updateUserPoints(userId, change) {
 
 // Update winners
 function updateWinners() {
+    // One request at a time, repeated clicks would only share its result
+    const button = document.getElementById('updateWinnersBtn');
+    button.disabled = true;
     fetch('/api/update-winners/', {
         method: 'POST',
     })
@@ -241,10 +376,15 @@ function updateWinners() {
         } else if (data.status === 'tie') {
             alert(data.message);
         }
-        loadWinners();
+        if (!liveUpdatesEnabled()) {
+            loadWinners();
+        }
     })
     .catch(error => {
         console.error('Error updating winners:', error);
         alert('Error updating winners. Please try again.');
+    })
+    .finally(() => {
+        button.disabled = false;
     });
 } 
\ No newline at end of file